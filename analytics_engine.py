@@ -0,0 +1,160 @@
+"""
+KAIROS FLEET ANALYTICS
+Cross-user aggregates for the ADMIN PANEL, read from the fleet_* summary
+tables that the migration 008 triggers keep current on every write to assets,
+liabilities and cashflow. A read touches one row per category / currency /
+cashflow bucket, however many users there are.
+
+    python analytics_engine.py                  # print the fleet summary
+    python analytics_engine.py --base USD
+    python analytics_engine.py --check          # compare summaries with a fresh GROUP BY
+    python analytics_engine.py --rebuild        # recompute summaries from the source tables
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+import cashflow_engine as cfe
+import database_manager as dbm
+import fx_service as fx
+import migrations
+
+# Summary table -> primary key columns
+FLEET_TABLES = {summary: list(keys) for summary, keys, _ in migrations.FLEET_SUMMARIES.values()}
+FLEET_TABLES.update({"fleet_users": ["user_id"], "fleet_counters": ["name"]})
+
+
+def _read(conn, table):
+    return pd.read_sql(f"SELECT * FROM {table}", conn)
+
+
+def fleet_summary(base=fx.PIVOT_CURRENCY):
+    """
+    Fleet-wide totals in `base` (assets converted per currency at the cached
+    FX rates; liabilities and cashflow are recorded in the pivot currency).
+    Returns a dict: currency, users, active_users (holding any asset, liability
+    or cashflow row), aum, cost_basis, unrealized_pnl, liabilities, net_worth,
+    monthly_income, monthly_expense, monthly_payments, avg_debt_rate,
+    missing_fx and the DataFrames by_category, by_currency, by_liability, by_cashflow.
+    """
+    with dbm.db_connection() as conn:
+        assets = _read(conn, "fleet_assets")
+        debts = _read(conn, "fleet_liabilities")
+        flows = _read(conn, "fleet_cashflow")
+        counters = dict(conn.execute("SELECT name, value FROM fleet_counters").fetchall())
+
+    base, factors = fx.get_service().base_factors(assets["currency"].unique(), base, request_missing=False)
+    pivot = factors.get(fx.PIVOT_CURRENCY, 1.0)
+
+    # --- ASSETS ---
+    conv = fx.conversion_factors(assets["currency"], factors)
+    missing_fx = sorted(assets["currency"][np.isnan(conv)].unique())
+    conv = np.nan_to_num(conv)
+    assets = assets.assign(value=assets["market_value"] * conv, priced=assets["priced_value"] * conv, cost=assets["cost_basis"] * conv)
+    aum = float(assets["value"].sum())
+    by_category = (assets.groupby("category", as_index=False)[["positions", "value"]].sum()
+                   .rename(columns={"value": "market_value"})
+                   .sort_values("market_value", ascending=False, ignore_index=True))
+    by_category["weight"] = by_category["market_value"] / aum * 100 if aum > 0 else 0.0
+    by_currency = (assets.groupby("currency", as_index=False)[["positions", "market_value", "value"]].sum()
+                   .rename(columns={"market_value": "native_value", "value": "market_value"})
+                   .sort_values("market_value", ascending=False, ignore_index=True))
+
+    # --- LIABILITIES ---
+    debts = debts.assign(balance=debts["balance"] * pivot, payments=debts["payments"] * pivot,
+                         avg_rate=np.where(debts["balance"] > 0, debts["rate_weighted"] / debts["balance"].where(debts["balance"] > 0, 1.0), 0.0))
+    total_debt = float(debts["balance"].sum())
+    by_liability = debts[["category", "debts", "balance", "payments", "avg_rate"]].sort_values("balance", ascending=False, ignore_index=True)
+
+    # --- CASHFLOW ---
+    monthly = flows["amount"] * flows["frequency"].map(lambda f: cfe.FREQUENCY_TO_MONTHLY.get(f, 1.0)).astype(float) * pivot
+    by_cashflow = (flows.assign(monthly=monthly).groupby(["type", "category"], as_index=False)[["entries", "monthly"]].sum()
+                   .sort_values("monthly", ascending=False, ignore_index=True))
+    income = float(by_cashflow.loc[by_cashflow["type"] == "Income", "monthly"].sum())
+    expense = float(by_cashflow.loc[by_cashflow["type"] == "Expense", "monthly"].sum())
+
+    return {
+        "currency": base,
+        "users": int(counters.get("users", 0)),
+        "active_users": int(counters.get("active_users", 0)),
+        "aum": aum,
+        "cost_basis": float(assets["cost"].sum()),
+        "unrealized_pnl": float(assets["priced"].sum() - assets["cost"].sum()),
+        "liabilities": total_debt,
+        "net_worth": aum - total_debt,
+        "monthly_income": income,
+        "monthly_expense": expense,
+        "monthly_payments": float(debts["payments"].sum()),
+        "avg_debt_rate": float((debts["rate_weighted"].sum() * pivot) / total_debt) if total_debt > 0 else 0.0,
+        "missing_fx": missing_fx,
+        "by_category": by_category,
+        "by_currency": by_currency,
+        "by_liability": by_liability,
+        "by_cashflow": by_cashflow,
+    }
+
+
+def check_summaries(tolerance=1e-6):
+    """
+    Rebuilds the summaries inside a savepoint, compares them with the stored
+    ones and rolls back. Returns {table: rows that differ} (empty when in sync).
+    """
+    drift = {}
+    with dbm.db_connection() as conn:
+        stored = {t: _read(conn, t) for t in FLEET_TABLES}
+        conn.execute("SAVEPOINT fleet_check")
+        try:
+            migrations.rebuild_fleet_summaries(conn)
+            fresh = {t: _read(conn, t) for t in FLEET_TABLES}
+        finally:
+            conn.execute("ROLLBACK TO fleet_check")
+            conn.execute("RELEASE fleet_check")
+    for t, keys in FLEET_TABLES.items():
+        both = stored[t].merge(fresh[t], on=keys, how="outer", suffixes=("_stored", "_fresh"), indicator=True)
+        bad = both["_merge"] != "both"
+        for c in fresh[t].columns.difference(keys):
+            bad |= ~np.isclose(both[f"{c}_stored"].astype(float), both[f"{c}_fresh"].astype(float), rtol=0, atol=tolerance, equal_nan=True)
+        if bad.any():
+            drift[t] = int(bad.sum())
+    return drift
+
+
+def rebuild_summaries():
+    with dbm.db_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            migrations.rebuild_fleet_summaries(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kairos fleet analytics")
+    parser.add_argument("--base", default=fx.PIVOT_CURRENCY)
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+    dbm.init_db()
+
+    if args.rebuild:
+        rebuild_summaries()
+        print("FLEET SUMMARIES REBUILT")
+    if args.check:
+        drift = check_summaries()
+        for table, rows in drift.items():
+            print(f"[DRIFT] {table}: {rows} rows")
+        print("FLEET SUMMARIES OK" if not drift else f"{len(drift)} SUMMARY TABLES OUT OF SYNC")
+        sys.exit(1 if drift else 0)
+
+    s = fleet_summary(args.base)
+    cur = s["currency"]
+    print(f"USERS {s['users']} | ACTIVE {s['active_users']}")
+    print(f"AUM {cur} {s['aum']:,.2f} | DEBT {cur} {s['liabilities']:,.2f} | NET WORTH {cur} {s['net_worth']:,.2f}")
+    print(f"MONTHLY INCOME {cur} {s['monthly_income']:,.2f} | EXPENSE {cur} {s['monthly_expense']:,.2f}")
+    print(s["by_category"].to_string(index=False))
+    if s["missing_fx"]:
+        print(f"NO FX RATE FOR {', '.join(s['missing_fx'])}: EXCLUDED FROM AUM")
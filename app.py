@@ -1,24 +1,29 @@
 
+import os
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import time
 import numpy as np
-import bcrypt # Still needed for admin reset? No, dbm handles that. Wait, Admin Panel UI does manual bcrypt.
-# Actually `dbm.admin_reset_password` takes Hashed. So UI needs bcrypt to hash "Reset123!".
-# Or I can move that logic to `auth_manager`.
-# `auth.hash_password(text)`.
-# For now I keep bcrypt here for the admin panel specific manual reset logic, or I should really put `hash_password` in auth.
 
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import database_manager as dbm
 import forecast_engine as fe
 import report_engine as re
 from report_engine import PDFReport
 import ui_components as ui
+import analytics_engine as an
 import auth_manager as auth
+import cache_manager
+import cashflow_engine as cfe
+import debt_engine as de
+import fx_service as fx
+import metrics_engine as me
+import networth_engine as ne
+import portfolio_engine as pe
+import startup
 
 # --- CONFIGURAZIONE ---
 st.set_page_config(
@@ -30,34 +35,84 @@ st.set_page_config(
 
 TEMPLATE_DIR = "templates"
 
-def load_css(file_name):
+@st.cache_resource(show_spinner=False)
+def read_static(file_name):
     try:
         with open(f"{TEMPLATE_DIR}/{file_name}", "r") as f:
-            st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-    except:
-        pass
-
-# --- CALCOLO METRICHE ---
-def calculate_metrics_full(user_id):
-    df_a = dbm.load_data("assets", user_id)
-    df_l = dbm.load_data("liabilities", user_id)
-    df_c = dbm.load_data("cashflow", user_id)
-    
-    tot_a = (df_a['quantity'] * df_a['current_price']).sum() if not df_a.empty else 0.0
-    tot_l = df_l['remaining_balance'].sum() if not df_l.empty else 0.0
-    nw = tot_a - tot_l
-    
-    inc, exp, passive = 0.0, 0.0, 0.0
-    if not df_c.empty:
-        def m(r): return r['amount']/12 if r['frequency']=='Yearly' else r['amount']
-        df_c['m'] = df_c.apply(m, axis=1)
-        inc = df_c[df_c['type']=='Income']['m'].sum()
-        exp = df_c[df_c['type']=='Expense']['m'].sum()
-        passive = df_c[(df_c['type']=='Income') & (df_c['category'].isin(['Dividends','Rent','Passive','Interests']))]['m'].sum()
-    
-    freedom = (passive / exp * 100) if exp > 0 else 0.0
-    
-    return {"net_worth": nw, "assets": tot_a, "liabilities": tot_l, "cashflow": inc - exp, "freedom_index": freedom}
+            return f.read()
+    except OSError:
+        return ""
+
+def load_css(file_name):
+    css = read_static(file_name)
+    if css:
+        st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
+
+@st.cache_resource(show_spinner=False)
+def startup_stage():
+    # Schema, migrations, admin bootstrap and price worker: once per process, not per rerun
+    startup.run()
+
+MC_PATHS = int(os.getenv("KAIROS_MC_PATHS", "10000"))
+MC_WORKERS = int(os.getenv("KAIROS_MC_WORKERS", "1"))
+
+# Tables each page needs on top of the metrics core (assets, liabilities, cashflow)
+CORE_TABLES = ("assets", "liabilities", "cashflow")
+FORECAST_MODEL_LABELS = {"ols": "LINEAR REGRESSION", "holt": "HOLT TREND SMOOTHING", "loglinear": "LOG-LINEAR GROWTH"}
+DEFAULT_INFLATION = 2.5
+DEBT_STRATEGY_LABELS = {"minimum": "MINIMUM PAYMENTS", "avalanche": "AVALANCHE (HIGHEST RATE FIRST)",
+                        "snowball": "SNOWBALL (SMALLEST BALANCE FIRST)"}
+ADMIN_PAGE_SIZES = sorted({25, 50, 100, 250, dbm.ADMIN_PAGE_SIZE})
+# VELOCITY chart ranges in days
+VELOCITY_RANGES = {"1M": 30, "6M": 182, "1Y": 365, "5Y": 1826, "10Y": 3652}
+PAGE_TABLES = {
+    "DASHBOARD": ("history_snapshots", "goals"),
+    "CAREER PATH": ("career_skills", "career_wins"),
+    "THE ORACLE": ("history_snapshots",),
+}
+
+def read_report(path, render):
+    # Deferred download: the PDF is read from the cache only on click, re-rendered if another worker evicted it
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        with open(render(), "rb") as f:
+            return f.read()
+
+def save_table(df, table, user_id, derived=()):
+    try:
+        res = dbm.save_editor_changes(df, table, user_id, derived)
+    except Exception as e:
+        st.error(f"{table.upper()} NOT SAVED: {e}")
+        return
+    st.toast(f"{table.upper()} SAVED: +{res['inserted']} / ~{res['updated']} / -{res['deleted']} ROWS", icon="💾")
+    st.rerun()
+
+def page_state(name, filters):
+    """Keyset cursors of a paged admin list (one per visited page); back to page 1 when the filters change."""
+    state = st.session_state.setdefault(f"pager_{name}", {"filters": None, "cursors": [None]})
+    if state["filters"] != filters:
+        state.update(filters=filters, cursors=[None])
+    return state
+
+def page_controls(name, state, next_cursor, shown, total):
+    p1, p2, p3 = st.columns([1, 3, 1])
+    page = len(state["cursors"])
+    if p1.button("◀ PREV", key=f"{name}_prev", disabled=page == 1):
+        state["cursors"].pop()
+        st.rerun()
+    p2.caption(f"PAGE {page} // {shown} SHOWN // {total:,} TOTAL")
+    if p3.button("NEXT ▶", key=f"{name}_next", disabled=next_cursor is None):
+        state["cursors"].append(next_cursor)
+        st.rerun()
+
+def selection_table(df, key, column_config=None):
+    """Read-only table with a SELECT checkbox column. Returns the selected ids."""
+    edited = st.data_editor(df.assign(select=False)[["select"] + list(df.columns)], key=key, hide_index=True,
+                            use_container_width=True, disabled=list(df.columns),
+                            column_config={"select": st.column_config.CheckboxColumn("✔", width="small"), **(column_config or {})})
+    return [int(i) for i in edited.loc[edited["select"], "id"]]
 
 # --- PAGES ---
 
@@ -96,6 +151,7 @@ def login_page():
                         st.session_state.user_id = uid
                         st.session_state.username = u
                         st.session_state.role = role
+                        st.session_state.base_currency = None
                         st.rerun()
                     else:
                         st.error(msg)
@@ -103,13 +159,15 @@ def login_page():
                 nu = st.text_input("NEW CODENAME", key="r_u")
                 np = st.text_input("NEW ACCESS KEY", type="password", key="r_p")
                 if st.button("CREATE IDENTITY", use_container_width=True):
-                    if auth.create_user(nu, np):
-                        st.success("IDENTITY CREATED. WAIT FOR ADMIN APPROVAL.")
+                    created, msg = auth.create_user(nu, np)
+                    if created:
+                        st.success(msg)
+                    else:
+                        st.error(msg)
 
 # --- MAIN APP ---
 def main_app(user_id):
     role = st.session_state.get('role', 'USER')
-    metrics = calculate_metrics_full(user_id)
     
     with st.sidebar:
         st.markdown(f"<div style='text-align:center; margin-bottom:5px; color:#00f0ff; font-family:Rajdhani; font-weight:700;'>OPERATOR: {st.session_state.username.upper()}</div>", unsafe_allow_html=True)
@@ -121,18 +179,39 @@ def main_app(user_id):
             
         mode = st.radio("NAVIGATION", nav_options, label_visibility="collapsed")
         
+        if st.session_state.get('base_currency') is None:
+            st.session_state.base_currency = dbm.get_base_currency(user_id)
+        base = st.selectbox("BASE CURRENCY", fx.CURRENCIES, index=fx.CURRENCIES.index(st.session_state.base_currency)
+                            if st.session_state.base_currency in fx.CURRENCIES else 0)
+        if base != st.session_state.base_currency:
+            dbm.set_base_currency(user_id, base)
+            st.session_state.base_currency = base
+        
         st.markdown("---")
         if st.button("🔒 TERMINATE SESSION"):
             st.session_state.user_id = None
             st.session_state.role = None
+            st.session_state.base_currency = None
             st.rerun()
 
+    # One read transaction per rerun, shared by every section of the page.
+    # Unchanged data is served from the per-user cache without touching SQLite.
+    snapshot = dbm.load_user_snapshot(user_id, CORE_TABLES + PAGE_TABLES.get(mode, ()))
+    # Every figure below is in the user's base currency; cache keys follow the FX rate version
+    fxs = fx.get_service()
+    base, fx_factors = fxs.base_factors(snapshot["assets"]["currency"].dropna().unique(), st.session_state.base_currency)
+    fx_key = f"{base}:{fxs.version}"
+    sym = fx.symbol(base)
+    portfolio = cache_manager.results.get_or_compute(user_id, f"portfolio:{fx_key}", lambda: pe.analyze_portfolio(snapshot["assets"], fx_factors))
+    metrics = cache_manager.results.get_or_compute(user_id, f"metrics:{fx_key}", lambda: me.compute_metrics(snapshot, portfolio, fx_factors, base))
+    if metrics["missing_fx"]:
+        st.warning(f"NO FX RATE FOR {', '.join(metrics['missing_fx'])}: THOSE POSITIONS ARE EXCLUDED FROM TOTALS.")
 
 
 
     if mode == "DASHBOARD":
         st.title("COMMAND CENTER")
-        ui.render_hud(metrics)
+        ui.render_hud(metrics, sym)
         
         if metrics['assets'] == 0 and metrics['liabilities'] == 0:
             st.info("⚠️ SYSTEM EMPTY. INITIALIZE ASSETS IN PORTFOLIO TO BEGIN.")
@@ -140,10 +219,9 @@ def main_app(user_id):
         c1, c2 = st.columns([2, 1])
         with c1:
             st.markdown("### 🗺️ ASSET MAP")
-            df_a = dbm.load_data("assets", user_id)
+            df_a = portfolio["positions"]
             if not df_a.empty:
-                df_a['total_value'] = df_a['quantity'] * df_a['current_price']
-                fig = px.sunburst(df_a, path=['category', 'name'], values='total_value',
+                fig = px.sunburst(df_a, path=['category', 'name'], values='market_value',
                                  color='category', color_discrete_sequence=['#00f0ff', '#bc13fe', '#00ff41', '#ff0055', '#ffffff'])
                 fig.update_layout(margin=dict(t=0, l=0, r=0, b=0), paper_bgcolor='rgba(0,0,0,0)', font=dict(color='white'))
                 fig.update_traces(textinfo="label+percent entry")
@@ -153,15 +231,29 @@ def main_app(user_id):
 
         with c2:
             st.markdown("### 📈 VELOCITY")
-            hist = dbm.load_data("history_snapshots", user_id)
-            if not hist.empty:
-                st.area_chart(hist.set_index('date')['net_worth'], color="#bc13fe")
+            span = st.radio("RANGE", list(VELOCITY_RANGES), index=2, horizontal=True, label_visibility="collapsed")
+            end = datetime.now()
+            series = ne.cached_networth(user_id, snapshot["assets"], snapshot["liabilities"],
+                                        end - timedelta(days=VELOCITY_RANGES[span]), end, fx_factors, fx_key)
+            if metrics['assets'] or metrics['liabilities']:
+                fig_v = go.Figure(go.Scatter(x=series['date'], y=series['net_worth'], fill='tozeroy', mode='lines',
+                                             line=dict(color='#bc13fe'), name='Reconstructed'))
+                # Recorded snapshots (stored in the pivot currency) on top of the rebuilt series
+                hist = snapshot["history_snapshots"]
+                if not hist.empty:
+                    hist = hist[pd.to_datetime(hist['date']) >= series['date'].iloc[0]]
+                    fig_v.add_trace(go.Scatter(x=pd.to_datetime(hist['date']), y=hist['net_worth'] * fx_factors[fx.PIVOT_CURRENCY],
+                                               mode='markers', marker=dict(color='#00f0ff', size=5), name='Recorded'))
+                fig_v.update_layout(margin=dict(t=10, l=0, r=0, b=0), height=300, paper_bgcolor='rgba(0,0,0,0)',
+                                    plot_bgcolor='rgba(0,0,0,0)', font_color='white', showlegend=False,
+                                    yaxis_title=f"Net Worth ({sym})")
+                st.plotly_chart(fig_v, use_container_width=True)
             else:
                 st.markdown("<div style='padding:50px; text-align:center; border:1px dashed #333; color:#555;'>AWAITING SNAPSHOTS</div>", unsafe_allow_html=True)
 
         st.markdown("---")
         st.markdown("### 🎯 SMART FINANCIAL TARGETS")
-        df_goals = dbm.load_data("goals", user_id)
+        df_goals = snapshot["goals"]
         
         c_g1, c_g2 = st.columns([1, 1])
         with c_g1:
@@ -188,113 +280,140 @@ def main_app(user_id):
                      "current_amount": st.column_config.NumberColumn("Current (€)", format="%.0f"),
                      "deadline": st.column_config.DateColumn("Deadline")
                  })
-                 if st.button("SAVE GOALS"): dbm.save_editor_changes(ed_g, "goals", user_id); st.rerun()
+                 if st.button("SAVE GOALS"): save_table(ed_g, "goals", user_id)
 
         st.markdown("---")
         st.subheader("🖨️ MONTHLY CLOSING")
         st.markdown("Generate your official financial statement for the current period.")
+        if re.font_warning():
+            st.warning(f"⚠️ {re.font_warning()}")
         
+        # Generate PDF (same snapshot as the dashboard above) into the shared report cache
+        username = st.session_state.username
+        render_report = lambda: re.cached_report(username, metrics, snapshot["assets"],
+                                                 snapshot["liabilities"], snapshot["cashflow"], period=datetime.now().strftime('%Y-%m'),
+                                                 fx_factors=fx_factors)
         if st.button("GENERATE FINANCIAL STATEMENT"):
              with st.spinner('Generating Financial Statement...'):
-                 # Load Data for Report
-                 r_df_a = dbm.load_data("assets", user_id)
-                 r_df_l = dbm.load_data("liabilities", user_id)
-                 r_df_c = dbm.load_data("cashflow", user_id)
-                 
-                 # Generate PDF
-                 pdf_bytes = re.generate_report(user_id, st.session_state.username, metrics, r_df_a, r_df_l, r_df_c)
-                 st.session_state['last_report_bytes'] = pdf_bytes
+                 st.session_state['last_report_path'] = render_report()
              
              st.toast("Report Generated Successfully", icon="🖨️")
 
-        if 'last_report_bytes' in st.session_state:
+        if 'last_report_path' in st.session_state:
+             report_path = st.session_state['last_report_path']
              st.download_button(
                  "⬇️ DOWNLOAD REPORT", 
-                 data=st.session_state['last_report_bytes'], 
+                 data=lambda: read_report(report_path, render_report), 
                  file_name=f"Kairos_Report_{datetime.now().strftime('%Y-%m')}.pdf", 
                  mime="application/pdf"
              )
 
     elif mode == "ADMIN PANEL":
         st.title("🛡️ SECURITY OPERATIONS CENTER")
+        cs = cache_manager.results.stats()
+        st.caption(f"RESULT CACHE: {cs['entries']} entries | {cs['bytes'] / 1e6:.1f}/{cs['max_bytes'] / 1e6:.0f} MB | HIT RATE {cs['hit_rate']*100:.1f}% ({cs['hits']} hits / {cs['misses']} misses)")
+        rs = cache_manager.reports.stats()
+        st.caption(f"REPORT CACHE: {rs['entries']} PDFs | {rs['bytes'] / 1e6:.1f}/{rs['max_bytes'] / 1e6:.0f} MB | HIT RATE {rs['hit_rate']*100:.1f}% ({rs['hits']} hits / {rs['misses']} misses / {rs['evictions']} evicted)")
         
-        t1, t2 = st.tabs(["SECURITY QUEUE", "USER MANAGEMENT"])
+        t1, t2, t3 = st.tabs(["SECURITY QUEUE", "USER MANAGEMENT", "FLEET ANALYTICS"])
         
         with t1:
             st.markdown("#### 🚨 IP APPROVAL QUEUE")
-            pend_df = dbm.get_pending_ips()
-            
-            if not pend_df.empty:
+            # One page of the queue per rerun: widgets are bounded by the page size
+            if dbm.count_pending_ips():
                 if st.button("✅ APPROVE ALL PENDING REQUESTS", type="primary", use_container_width=True):
                     dbm.approve_all_pending_ips()
                     st.success("ALL PENDING CONNECTIONS APPROVED")
                     time.sleep(1)
                     st.rerun()
-                
-                st.markdown("---")
-                col_spec = [2, 2, 2, 1, 1]
-                h1, h2, h3, h4, h5 = st.columns(col_spec)
-                h1.markdown("**OPERATOR**"); h2.markdown("**IP ADDRESS**"); h3.markdown("**TIMESTAMP**")
-                
-                for idx, row in pend_df.iterrows():
-                    c1, c2, c3, c4, c5 = st.columns(col_spec)
-                    c1.write(f"{row['username']}")
-                    c2.code(f"{row['ip_address']}")
-                    c3.write(f"{row['last_used']}")
-                    
-                    if c4.button("ALLOW", key=f"ok_{row['id']}"):
-                         dbm.update_ip_approval(row['id'], 'APPROVED')
-                         st.success(f"AUTHORIZED: {row['username']}")
-                         time.sleep(0.5)
-                         st.rerun()
-                         
-                    if c5.button("BLOCK", key=f"no_{row['id']}"):
-                         dbm.update_ip_approval(row['id'], 'REJECTED')
-                         st.error(f"BLOCKED: {row['username']}")
-                         time.sleep(0.5)
-                         st.rerun()
-                    st.markdown("---")
+
+                q1, q2 = st.columns([3, 1])
+                ip_search = q1.text_input("SEARCH IP PREFIX", key="ip_search").strip()
+                ip_rows = q2.selectbox("ROWS", ADMIN_PAGE_SIZES, index=ADMIN_PAGE_SIZES.index(dbm.ADMIN_PAGE_SIZE), key="ip_rows")
+                pager = page_state("ips", (ip_search, ip_rows))
+                pend_df, next_ip = dbm.page_pending_ips(ip_search, pager["cursors"][-1], ip_rows)
+                selected = selection_table(pend_df, f"ips_{len(pager['cursors'])}_{ip_search}_{ip_rows}",
+                                           {"id": None, "username": "OPERATOR", "ip_address": "IP ADDRESS",
+                                            "device_name": "DEVICE", "last_used": "TIMESTAMP"})
+                b1, b2 = st.columns(2)
+                if b1.button(f"ALLOW SELECTED ({len(selected)})", disabled=not selected, use_container_width=True):
+                    dbm.set_ip_status_bulk(selected, 'APPROVED')
+                    st.toast(f"AUTHORIZED: {len(selected)} DEVICES", icon="✅")
+                    st.rerun()
+                if b2.button(f"BLOCK SELECTED ({len(selected)})", disabled=not selected, use_container_width=True):
+                    dbm.set_ip_status_bulk(selected, 'REJECTED')
+                    st.toast(f"BLOCKED: {len(selected)} DEVICES", icon="⛔")
+                    st.rerun()
+                page_controls("ips", pager, next_ip, len(pend_df), dbm.count_pending_ips(ip_search))
             else:
                 st.success("✅ NO SECURITY THREATS DETECTED. SYSTEM SECURE.")
 
         with t2:
             st.markdown("#### 👥 OPERATOR DATABASE")
-            users_df = dbm.get_all_users_view()
-            
+            u1, u2, u3, u4 = st.columns([3, 2, 1, 1])
+            user_search = u1.text_input("SEARCH CODENAME PREFIX", key="user_search").strip()
+            user_sort = u2.selectbox("SORT BY", dbm.USER_SORT_COLUMNS, key="user_sort")
+            user_desc = u3.toggle("DESC", key="user_desc")
+            user_rows = u4.selectbox("ROWS", ADMIN_PAGE_SIZES, index=ADMIN_PAGE_SIZES.index(dbm.ADMIN_PAGE_SIZE), key="user_rows")
+            pager = page_state("users", (user_search, user_sort, user_desc, user_rows))
+            users_df, next_user = dbm.page_users(user_search, user_sort, user_desc, pager["cursors"][-1], user_rows)
+
             if not users_df.empty:
-                uc1, uc2, uc3, uc4, uc5, uc6 = st.columns([0.5, 2, 1, 2, 1.5, 1.5])
-                uc1.markdown("**ID**"); uc2.markdown("**CODENAME**"); uc3.markdown("**ROLE**"); uc4.markdown("**CREATED**"); uc5.markdown("**ACTION**"); uc6.markdown("**DANGER**")
-                st.markdown("---")
-                
-                for idx, row in users_df.iterrows():
-                    r1, r2, r3, r4, r5, r6 = st.columns([0.5, 2, 1, 2, 1.5, 1.5])
-                    r1.write(str(row['id']))
-                    r2.write(row['username'])
-                    r3.write(row['role'])
-                    r4.write(str(row['created_at'])[:19]) 
-                    
-                    if r5.button("RE-KEY", key=f"rst_{row['id']}"):
-                        new_pass = "Reset123!"
-                        hashed = bcrypt.hashpw(new_pass.encode('utf-8'), bcrypt.gensalt())
-                        dbm.admin_reset_password(row['id'], hashed)
-                        st.toast(f"KEY RESET: {row['username']} -> {new_pass}", icon="🔑")
-                    
-                    if r6.button("PURGE", key=f"del_{row['id']}"):
-                         if row['username'] == st.session_state.get('username'):
-                             st.error("SAFEGUARD: CANNOT PURGE SELF")
-                         else:
-                             dbm.admin_delete_user(row['id'])
-                             st.toast(f"TERMINATED: {row['username']}", icon="💀")
-                             time.sleep(1)
-                             st.rerun()
-                    st.divider()
+                selected = selection_table(users_df, f"users_{len(pager['cursors'])}_{pager['filters']}",
+                                           {"id": "ID", "username": "CODENAME", "role": "ROLE", "created_at": "CREATED"})
+                b1, b2, b3 = st.columns([1, 1, 1])
+                if b1.button(f"RE-KEY SELECTED ({len(selected)})", disabled=not selected, use_container_width=True):
+                    new_pass = "Reset123!"
+                    try:
+                        auth.reset_passwords(selected, new_pass)
+                        st.toast(f"KEY RESET: {len(selected)} OPERATORS -> {new_pass}", icon="🔑")
+                    except auth.HashingBusy:
+                        st.error("AUTH SERVICE BUSY. NO KEYS WERE RESET, RETRY SHORTLY")
+                confirm = b3.checkbox("CONFIRM PURGE", key=f"purge_ok_{len(selected)}")
+                if b2.button(f"PURGE SELECTED ({len(selected)})", disabled=not (selected and confirm), use_container_width=True):
+                    if user_id in selected:
+                        st.error("SAFEGUARD: CANNOT PURGE SELF")
+                    else:
+                        dbm.admin_delete_users(selected)
+                        st.toast(f"TERMINATED: {len(selected)} OPERATORS", icon="💀")
+                        time.sleep(1)
+                        st.rerun()
+            else:
+                st.info("NO OPERATORS MATCH THE SEARCH.")
+            page_controls("users", pager, next_user, len(users_df), dbm.count_users(user_search))
+
+        with t3:
+            # Summary tables kept current by triggers: no per-user reads
+            fleet = an.fleet_summary(base)
+            if fleet["missing_fx"]:
+                st.warning(f"NO FX RATE FOR {', '.join(fleet['missing_fx'])}: EXCLUDED FROM AUM.")
+            f1, f2, f3, f4 = st.columns(4)
+            f1.metric("OPERATORS", f"{fleet['users']:,}", f"{fleet['active_users']:,} ACTIVE")
+            f2.metric("ASSETS UNDER MANAGEMENT", f"{sym} {fleet['aum']:,.0f}", f"P&L {sym} {fleet['unrealized_pnl']:,.0f}")
+            f3.metric("FLEET DEBT", f"{sym} {fleet['liabilities']:,.0f}", f"AVG RATE {fleet['avg_debt_rate']:.2f}%", delta_color="off")
+            f4.metric("FLEET NET CASHFLOW", f"{sym} {fleet['monthly_income'] - fleet['monthly_expense']:,.0f}/mo")
+
+            fc1, fc2 = st.columns(2)
+            with fc1:
+                st.markdown("#### 🧭 CATEGORY EXPOSURE")
+                if not fleet["by_category"].empty:
+                    fig_f = px.bar(fleet["by_category"], x="category", y="market_value", color="category",
+                                   labels={"market_value": f"Market Value ({sym})", "category": ""})
+                    fig_f.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font_color="white", showlegend=False)
+                    st.plotly_chart(fig_f, use_container_width=True)
+                st.dataframe(fleet["by_currency"], use_container_width=True, hide_index=True)
+            with fc2:
+                st.markdown("#### 💳 DEBT LOAD")
+                st.dataframe(fleet["by_liability"], use_container_width=True, hide_index=True)
+                st.markdown("#### 💸 CASHFLOW MIX (MONTHLY)")
+                st.dataframe(fleet["by_cashflow"], use_container_width=True, hide_index=True)
 
     elif mode == "CAREER PATH":
         st.title("🧬 CAREER RPG")
         c1, c2 = st.columns([2, 1])
         with c1:
             st.markdown("### ACTIVE SKILL TREE")
-            df_s = dbm.load_data("career_skills", user_id)
+            df_s = snapshot["career_skills"]
             if not df_s.empty:
                 html_grid = '<div class="skill-grid">'
                 for _, row in df_s.iterrows():
@@ -354,7 +473,7 @@ def main_app(user_id):
                     dbm.log_victory(user_id, d, i)
                     st.rerun()
             st.markdown("---")
-            df_w = dbm.load_data("career_wins", user_id)
+            df_w = snapshot["career_wins"]
             if not df_w.empty:
                 df_w = df_w.sort_values('date', ascending=False)
                 for _, row in df_w.iterrows():
@@ -367,30 +486,54 @@ def main_app(user_id):
                     """, unsafe_allow_html=True)
             with st.expander("EDIT SKILLS"):
                 ed = st.data_editor(df_s, num_rows="dynamic", key="s_ed", use_container_width=True, column_config={"user_id":None, "current_level": st.column_config.NumberColumn(min_value=0, max_value=100)})
-                if st.button("SAVE SKILLS"): dbm.save_editor_changes(ed, "career_skills", user_id); st.rerun()
+                if st.button("SAVE SKILLS"): save_table(ed, "career_skills", user_id)
 
     elif mode == "THE ORACLE":
         st.title("🔮 THE ORACLE 3.0 // AI FORECAST")
         
         # --- AI LAYER ---
-        hist_df = dbm.load_data("history_snapshots", user_id)
-        preds, slope = fe.predict_future_nw(hist_df)
+        # Last year of daily net worth rebuilt from price history, already in the base currency
+        end = datetime.now()
+        hist_df = ne.cached_networth(user_id, snapshot["assets"], snapshot["liabilities"],
+                                     end - timedelta(days=VELOCITY_RANGES["1Y"]), end, fx_factors, fx_key)
+        pivot = fx_factors.get(fx.PIVOT_CURRENCY, 1.0) if fx_factors is not None else 1.0
+        # Models are fitted on the recorded snapshots (pivot currency, completed days only: today's
+        # row is still being upserted), so the cached fit only ever gains points and updates in place.
+        # Without two snapshots yet, the reconstructed year stands in (uncached).
+        snaps = snapshot["history_snapshots"]
+        snaps = snaps[snaps["date"] < end.strftime("%Y-%m-%d")]
+        if len(snaps) >= 2:
+            fc = fe.forecast_nw(snaps, (6, 12, 24), key=f"snapshots:{user_id}", scale=pivot)
+        else:
+            fc = fe.forecast_nw(hist_df, (6, 12, 24))
+        slope = fc["slope"] if fc else 0
         
         target_nw = 1000000
         monthly_save = metrics['cashflow'] if metrics['cashflow'] > 0 else 0
-        months_to_freedom = fe.calculate_time_to_target(metrics['net_worth'], monthly_save, target_nw)
+        # Assets compound at the portfolio's expected return; debts follow their amortization schedule
+        mu, sigma = fe.portfolio_return_params(snapshot["assets"])
+        bal, pay, rate = fe.stack_liabilities([snapshot["liabilities"]])
+        debts = (bal * pivot, pay * pivot, rate)
+        months_to_freedom = float(fe.solve_time_to_target(metrics['assets'], monthly_save, target_nw, mu * 100,
+                                                          DEFAULT_INFLATION, liabilities=debts)[0])
         traj_msg = fe.analyze_trajectory(hist_df)
         
-        pred_6m = f"€ {preds[6]:,.2f}" if preds[6] else "INSUFFICIENT DATA"
-        pred_12m = f"€ {preds[12]:,.2f}" if preds[12] else "INSUFFICIENT DATA"
-        freedom_date = "NEVER (INCREASE CASHFLOW)"
-        if months_to_freedom != float('inf') and months_to_freedom > 0:
-            fd = datetime.now() + pd.DateOffset(months=int(months_to_freedom))
-            freedom_date = fd.strftime("%B %Y").upper()
-        elif months_to_freedom == 0:
-            freedom_date = "ACHIEVED"
-
-        ui.render_oracle_terminal(slope, traj_msg, pred_6m, pred_12m, target_nw, monthly_save, freedom_date)
+        def fmt_pred(i):
+            if fc is None:
+                return "INSUFFICIENT DATA"
+            return f"{sym} {fc['mean'][i]:,.2f} <span style='color:#555'>[95%: {fc['lower'][i]:,.0f} .. {fc['upper'][i]:,.0f}]</span>"
+        pred_6m, pred_12m = fmt_pred(0), fmt_pred(1)
+        def freedom_label(m):
+            if m == 0:
+                return "ACHIEVED"
+            if not np.isfinite(m):
+                return "NEVER (INCREASE CASHFLOW)"
+            return (datetime.now() + pd.DateOffset(months=int(np.ceil(m)))).strftime("%B %Y").upper()
+        freedom_date = freedom_label(months_to_freedom)
+
+        ui.render_oracle_terminal(slope, traj_msg, pred_6m, pred_12m, target_nw, monthly_save, freedom_date, sym,
+                                  model=FORECAST_MODEL_LABELS[fc["model"]] if fc else None,
+                                  assumptions=f"μ {mu*100:.1f}% // INFLATION {DEFAULT_INFLATION:.1f}% // DEBT AMORTIZED")
         
         st.subheader("📐 SCENARIO SIMULATOR")
         with st.container():
@@ -399,68 +542,121 @@ def main_app(user_id):
             with c1:
                 base_rate = st.slider("BASE ANNUAL RETURN (%)", 1.0, 15.0, 7.0, 0.5)
             with c2:
-                inflation = st.slider("INFLATION RATE (%)", 0.0, 10.0, 2.5, 0.5)
+                inflation = st.slider("INFLATION RATE (%)", 0.0, 10.0, DEFAULT_INFLATION, 0.5)
             with c3:
                 years = st.slider("TIMEFRAME (YEARS)", 5, 40, 15)
             st.markdown("---")
-            monthly_contrib = st.slider("MONTHLY CONTRIBUTION (€)", 0, 5000, int(metrics['cashflow']) if metrics['cashflow'] > 0 else 500, 100)
+            monthly_contrib = st.slider(f"MONTHLY CONTRIBUTION ({sym})", 0, 5000, int(metrics['cashflow']) if metrics['cashflow'] > 0 else 500, 100)
             st.markdown('</div>', unsafe_allow_html=True)
 
         months = years * 12
         start_nw = metrics['net_worth']
+
+        # --- DEBT PAYOFF ---
+        # Extra payments come out of the monthly contribution; the projection
+        # subtracts the payoff schedule instead of compounding debt like an asset
+        df_l = snapshot["liabilities"]
+        strategy, extra = "minimum", 0
+        debt_path = np.zeros(max(months, de.SCHEDULE_MONTHS) + 1)
+        if not df_l.empty:
+            st.subheader("💳 DEBT PAYOFF")
+            d1, d2 = st.columns(2)
+            strategy = d1.selectbox("STRATEGY", de.DEBT_STRATEGIES, index=1, format_func=DEBT_STRATEGY_LABELS.get)
+            extra = d2.slider(f"EXTRA PAYMENT ({sym}/mo)", 0, 5000, 0, 50, disabled=strategy == "minimum")
+            if strategy == "minimum":
+                extra = 0
+            horizon = max(months, de.SCHEDULE_MONTHS)
+            plans = {s: de.cached_plan(user_id, df_l, s, extra if s != "minimum" else 0, horizon, fx_key, pivot)
+                     for s in de.DEBT_STRATEGIES}
+            plan = plans[strategy]
+            debt_path = plan["balances"].sum(axis=0)
+            m1, m2, m3 = st.columns(3)
+            m1.metric("DEBT-FREE", de.month_label(plan["debt_free_month"]))
+            m2.metric("INTEREST TO PAYOFF", f"{sym} {plan['total_interest']:,.0f}")
+            m3.metric("INTEREST SAVED VS MINIMUM", f"{sym} {plans['minimum']['total_interest'] - plan['total_interest']:,.0f}")
+            debt_end = int(min(plan["debt_free_month"], horizon))
+            fig_d = go.Figure()
+            for s in de.DEBT_STRATEGIES:
+                fig_d.add_trace(go.Scatter(y=plans[s]["balances"].sum(axis=0)[:debt_end + 1], name=DEBT_STRATEGY_LABELS[s],
+                                           line=dict(width=3 if s == strategy else 1)))
+            fig_d.update_layout(paper_bgcolor='rgba(0,0,0,0)', font_color="white", hovermode="x unified",
+                                xaxis_title="Months", yaxis_title=f"Total Debt ({sym})")
+            st.plotly_chart(fig_d, use_container_width=True)
+            st.dataframe(plan["debts"][["name", "balance", "rate", "payment", "payoff_date", "interest"]],
+                         use_container_width=True, hide_index=True)
+
         rates = {"PESSIMISTIC (Bear)": base_rate - 3.0, "REALISTIC (Base)": base_rate, "OPTIMISTIC (Bull)": base_rate + 3.0}
-        chart_data = pd.DataFrame(index=range(months+1))
-        
-        for name, r in rates.items():
-            real_rate = (r - inflation) / 100
-            monthly_rate = real_rate / 12
-            values = [start_nw]
-            curr = start_nw
-            for m in range(months):
-                curr = curr * (1 + monthly_rate) + monthly_contrib
-                values.append(curr)
-            chart_data[name] = values
+        deflator = (1 + inflation / 1200) ** np.arange(months + 1)
+        curves = (fe.project_wealth(metrics['assets'], monthly_contrib - extra, list(rates.values()), inflation, months)
+                  - debt_path[:months + 1] / deflator)
+        chart_data = pd.DataFrame(curves.T, columns=list(rates.keys()))
             
         st.markdown("### WEALTH PROJECTION (INFLATION ADJUSTED)")
-        fig = px.line(chart_data, labels={"index": "Months", "value": "Real Wealth (€)"})
+        fig = px.line(chart_data, labels={"index": "Months", "value": f"Real Wealth ({sym})"})
         fig.update_layout(paper_bgcolor='rgba(0,0,0,0)', font_color="white", hovermode="x unified")
         fig.update_traces(line_color='#ff0055', selector=dict(name="PESSIMISTIC (Bear)"))
         fig.update_traces(line_color='#00f0ff', selector=dict(name="REALISTIC (Base)"))
         fig.update_traces(line_color='#00ff41', selector=dict(name="OPTIMISTIC (Bull)"))
         st.plotly_chart(fig, use_container_width=True)
         final_val = chart_data["REALISTIC (Base)"].iloc[-1]
-        st.metric("PROJECTED REAL WEALTH (BASE)", f"€ {final_val:,.2f}", f"Target: {years} Years")
+        st.metric("PROJECTED REAL WEALTH (BASE)", f"{sym} {final_val:,.2f}", f"Target: {years} Years")
+
+        # Freedom date of every scenario in one solver call
+        scenario_months = fe.solve_time_to_target(metrics['assets'], monthly_contrib - extra, target_nw,
+                                                  np.array(list(rates.values())), inflation, debt_schedule=debt_path)
+        for col, name, m in zip(st.columns(len(rates)), rates, scenario_months):
+            col.metric(f"FREEDOM DATE // {name}", freedom_label(m))
+
+        # --- MONTE CARLO LAYER ---
+        step = 1 if months <= 120 else 12
+        mc_key = f"montecarlo:{base}:{start_nw:.2f}:{monthly_contrib}:{inflation}:{months}"
+        mc = cache_manager.results.get_or_compute(user_id, mc_key, lambda: fe.simulate_wealth_paths(
+            start_nw, monthly_contrib, mu, sigma, months, n_paths=MC_PATHS, inflation=inflation,
+            target=target_nw, seed=42, workers=MC_WORKERS, step=step))
+
+        st.markdown(f"### 🎲 MONTE CARLO ({MC_PATHS:,} PATHS // μ {mu*100:.1f}% σ {sigma*100:.1f}%)")
+        x = mc['months']
+        fig_mc = go.Figure()
+        fig_mc.add_trace(go.Scatter(x=x, y=mc['p95'], name="P95", line=dict(color='#00ff41', width=1)))
+        fig_mc.add_trace(go.Scatter(x=x, y=mc['p5'], name="P5", line=dict(color='#ff0055', width=1), fill='tonexty', fillcolor='rgba(0, 240, 255, 0.1)'))
+        fig_mc.add_trace(go.Scatter(x=x, y=mc['p50'], name="P50", line=dict(color='#00f0ff', width=3)))
+        fig_mc.update_layout(paper_bgcolor='rgba(0,0,0,0)', font_color="white", hovermode="x unified", xaxis_title="Months", yaxis_title=f"Real Wealth ({sym})")
+        st.plotly_chart(fig_mc, use_container_width=True)
+        st.metric(f"PROBABILITY OF {sym} {target_nw:,.0f} WITHIN {years} YEARS", f"{mc['prob_target']*100:.1f}%")
 
     elif mode == "PORTFOLIO":
         st.title("💎 WEALTH DASHBOARD")
-        df_a = dbm.load_data("assets", user_id)
-        df_l = dbm.load_data("liabilities", user_id)
-        
-        tot_a = 0.0
-        if not df_a.empty:
-            if 'current_price' in df_a.columns and 'quantity' in df_a.columns:
-                 df_a['total_value'] = df_a['quantity'] * df_a['current_price']
-                 tot_a = df_a['total_value'].sum()
-        
-        tot_l = df_l['remaining_balance'].sum() if not df_l.empty else 0.0
-        net_worth = tot_a - tot_l
+        df_a = portfolio["positions"]
+        df_l = snapshot["liabilities"]
+        pf = portfolio["totals"]
         
-        ui.render_portfolio_metrics(tot_a, tot_l, net_worth)
+        ui.render_portfolio_metrics(metrics['assets'], metrics['liabilities'], metrics['net_worth'],
+                                    pf['unrealized_pnl'] if pf['priced_positions'] else None, pf['return_pct'], sym)
         
         if not df_a.empty:
             c1, c2 = st.columns([2, 1])
             with c1:
                 st.markdown("### 🪐 ASSET GALAXY")
-                fig_sun = px.sunburst(df_a, path=['category', 'name'], values='total_value', color='category', color_discrete_sequence=['#00f0ff', '#bc13fe', '#ff0055', '#00ff41', '#ffffff'], template="plotly_dark")
+                fig_sun = px.sunburst(df_a, path=['category', 'name'], values='market_value', color='category', color_discrete_sequence=['#00f0ff', '#bc13fe', '#ff0055', '#00ff41', '#ffffff'], template="plotly_dark")
                 fig_sun.update_layout(margin=dict(t=0, l=0, r=0, b=0), paper_bgcolor='rgba(0,0,0,0)', font=dict(family="JetBrains Mono", size=14))
                 fig_sun.update_traces(marker=dict(line=dict(color='#000000', width=1)))
                 st.plotly_chart(fig_sun, use_container_width=True)
             with c2:
                 st.markdown("### 🧬 ALLOCATION")
-                fig_don = px.pie(df_a, values='total_value', names='category', hole=0.6, color='category', color_discrete_sequence=['#00f0ff', '#bc13fe', '#ff0055', '#00ff41', '#ffffff'], template="plotly_dark")
+                fig_don = px.pie(portfolio["by_category"], values='market_value', names='category', hole=0.6, color='category', color_discrete_sequence=['#00f0ff', '#bc13fe', '#ff0055', '#00ff41', '#ffffff'], template="plotly_dark")
                 fig_don.update_layout(showlegend=False, margin=dict(t=20, l=20, r=20, b=20), paper_bgcolor='rgba(0,0,0,0)', annotations=[dict(text='MIX', x=0.5, y=0.5, font_size=20, showarrow=False, font_color='white')])
                 fig_don.update_traces(textposition='outside', textinfo='percent+label')
                 st.plotly_chart(fig_don, use_container_width=True)
+            st.markdown("### 📊 PERFORMANCE BY CATEGORY")
+            st.dataframe(portfolio["by_category"], hide_index=True, use_container_width=True, column_config={
+                    "category": "Category",
+                    "positions": "Positions",
+                    "market_value": st.column_config.NumberColumn(f"Value ({sym})", format="%.2f"),
+                    "cost_basis": st.column_config.NumberColumn(f"Cost ({sym})", format="%.2f"),
+                    "unrealized_pnl": st.column_config.NumberColumn(f"P&L ({sym})", format="%.2f"),
+                    "return_pct": st.column_config.NumberColumn("Return", format="%.2f%%"),
+                    "weight": st.column_config.ProgressColumn("Weight", format="%.1f%%", min_value=0, max_value=100),
+                })
         else:
              st.info("⚠️ PORTFOLIO EMPTY. ADD ASSETS BELOW TO VISUALIZE.")
 
@@ -468,49 +664,50 @@ def main_app(user_id):
         c_act, _ = st.columns([1, 4])
         with c_act:
              if st.button("🔄 SYNC MARKET PRICES", use_container_width=True):
-                 n = dbm.update_asset_prices(user_id)
-                 if n > 0:
-                     st.toast(f"UPDATED {n} ASSETS FROM MARKET", icon="🚀")
+                 copied, queued = dbm.update_asset_prices(user_id)
+                 if queued:
+                     st.toast(f"{queued} TICKERS QUEUED FOR MARKET SYNC: PRICES UPDATE IN THE BACKGROUND", icon="📡")
+                 if copied:
+                     st.toast(f"UPDATED {copied} TICKERS FROM THE PRICE CACHE", icon="🚀")
                      time.sleep(1)
                      st.rerun()
-                 else:
-                     st.toast("NO UPDATES AVAILABLE OR API LIMIT", icon="💤")
+                 elif not queued:
+                     st.toast("NO TICKERS TO SYNC", icon="💤")
         
         t1, t2 = st.tabs(["📂 ASSET DATA", "📉 LIABILITIES DATA"])
         with t1:
             ed_a = st.data_editor(df_a, num_rows="dynamic", key="ed_a_new", use_container_width=True, column_config={
                     "user_id": None,
-                    "currency": st.column_config.SelectboxColumn("Currency", options=["EUR", "USD", "BTC"]),
-                    "current_price": st.column_config.NumberColumn("Price (€)", format="%.2f"),
+                    "currency": st.column_config.SelectboxColumn("Currency", options=fx.CURRENCIES),
+                    "current_price": st.column_config.NumberColumn("Price (asset ccy)", format="%.2f"),
                     "quantity": st.column_config.NumberColumn("Qty", format="%.4f"),
-                    "total_value": st.column_config.NumberColumn("Total (€)", format="%.2f", disabled=True)
+                    "avg_price": st.column_config.NumberColumn("Avg Cost (asset ccy)", format="%.2f"),
+                    "market_value": st.column_config.NumberColumn(f"Total ({sym})", format="%.2f", disabled=True),
+                    "cost_basis": st.column_config.NumberColumn(f"Cost ({sym})", format="%.2f", disabled=True),
+                    "unrealized_pnl": st.column_config.NumberColumn(f"P&L ({sym})", format="%.2f", disabled=True),
+                    "return_pct": st.column_config.NumberColumn("Return", format="%.2f%%", disabled=True),
+                    "weight": st.column_config.NumberColumn("Weight", format="%.1f%%", disabled=True),
                 })
-            if st.button("SAVE ASSETS DB", type="primary"): dbm.save_editor_changes(ed_a, "assets", user_id); st.rerun()
+            if st.button("SAVE ASSETS DB", type="primary"): save_table(ed_a, "assets", user_id, pe.POSITION_COLUMNS)
         with t2:
             ed_l = st.data_editor(df_l, num_rows="dynamic", key="ed_l_new", use_container_width=True, column_config={"user_id":None})
-            if st.button("SAVE DEBTS DB", type="primary"): dbm.save_editor_changes(ed_l, "liabilities", user_id); st.rerun()
+            if st.button("SAVE DEBTS DB", type="primary"): save_table(ed_l, "liabilities", user_id)
 
     elif mode == "CASHFLOW":
         st.title("💸 CASHFLOW ANALYTICS")
-        df = dbm.load_data("cashflow", user_id)
+        df = snapshot["cashflow"]
         
-        monthly_inc = 0.0
-        monthly_exp = 0.0
-        if not df.empty:
-            calc_df = df.copy()
-            calc_df['monthly_val'] = calc_df.apply(lambda x: x['amount']/12 if x['frequency']=='Yearly' else x['amount'], axis=1)
-            monthly_inc = calc_df[calc_df['type']=='Income']['monthly_val'].sum()
-            monthly_exp = calc_df[calc_df['type']=='Expense']['monthly_val'].sum()
-            net_flow = monthly_inc - monthly_exp
-        else:
-            net_flow = 0.0
-            calc_df = pd.DataFrame()
+        # Cashflow is recorded in the FX pivot currency; figures below are shown in the base currency
+        pivot = fx_factors.get(fx.PIVOT_CURRENCY, 1.0)
+        cf = cfe.summarize_cashflow(df)
+        monthly_inc, monthly_exp, net_flow = cf["income"] * pivot, cf["expense"] * pivot, cf["net"] * pivot
+        calc_df = cf["by_category"].assign(monthly_val=lambda d: d["monthly_val"] * pivot)
 
         c1, c2, c3 = st.columns(3)
-        c1.metric("MONTHLY INCOME", f"€ {monthly_inc:,.2f}")
-        c2.metric("MONTHLY EXPENSES", f"€ {monthly_exp:,.2f}")
+        c1.metric("MONTHLY INCOME", f"{sym} {monthly_inc:,.2f}")
+        c2.metric("MONTHLY EXPENSES", f"{sym} {monthly_exp:,.2f}")
         delta_color = "normal" if net_flow >= 0 else "inverse" 
-        c3.metric("NET CASHFLOW", f"€ {net_flow:,.2f}", f"€ {net_flow:,.2f}", delta_color=delta_color)
+        c3.metric("NET CASHFLOW", f"{sym} {net_flow:,.2f}", f"{sym} {net_flow:,.2f}", delta_color=delta_color)
         
         if not calc_df.empty:
             st.markdown("---")
@@ -526,9 +723,9 @@ def main_app(user_id):
                 st.markdown("### 📉 SPENDING DRAIN")
                 exp_only = calc_df[calc_df['type']=='Expense']
                 if not exp_only.empty:
-                    exp_cat = exp_only.groupby('category')['monthly_val'].sum().reset_index().sort_values('monthly_val', ascending=True)
+                    exp_cat = exp_only.sort_values('monthly_val', ascending=True)
                     fig_br = px.bar(exp_cat, x='monthly_val', y='category', orientation='h', title="", color_discrete_sequence=['#ff0055'])
-                    fig_br.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font_color='white', xaxis_title="Monthly €", yaxis_title="", height=300)
+                    fig_br.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font_color='white', xaxis_title=f"Monthly {sym}", yaxis_title="", height=300)
                     st.plotly_chart(fig_br, use_container_width=True)
                 else:
                     st.info("NO EXPENSES TRACKED.")
@@ -538,14 +735,13 @@ def main_app(user_id):
             ed = st.data_editor(df, num_rows="dynamic", key="ed_c", use_container_width=True, column_config={
                 "user_id": None,
                 "type": st.column_config.SelectboxColumn("Type", options=["Income", "Expense"]),
-                "frequency": st.column_config.SelectboxColumn("Freq", options=["Monthly", "Yearly", "One-Time"]),
-                "amount": st.column_config.NumberColumn("Amount (€)", format="%.2f")
+                "frequency": st.column_config.SelectboxColumn("Freq", options=cfe.FREQUENCIES),
+                "amount": st.column_config.NumberColumn(f"Amount ({fx.symbol(fx.PIVOT_CURRENCY)})", format="%.2f")
             })
-            if st.button("SAVE CASHFLOW", type="primary"): dbm.save_editor_changes(ed, "cashflow", user_id); st.rerun()
+            if st.button("SAVE CASHFLOW", type="primary"): save_table(ed, "cashflow", user_id)
 
 if __name__ == "__main__":
-    dbm.init_db()
-    dbm.migrate_db()
+    startup_stage()
     load_css("style.css")
     if 'user_id' not in st.session_state or not st.session_state.user_id:
         login_page()
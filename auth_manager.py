@@ -1,7 +1,87 @@
 
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
 import streamlit as st
 import bcrypt
 import database_manager as dbm
+from rate_limiter import KeyedRateLimiter
+
+# --- HASHING CONFIG ---
+BCRYPT_ROUNDS = int(os.getenv("KAIROS_BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("KAIROS_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE = int(os.getenv("KAIROS_HASH_QUEUE", "64"))
+HASH_TIMEOUT = float(os.getenv("KAIROS_HASH_TIMEOUT", "10"))
+
+# --- LOGIN RATE LIMITS (burst, then one attempt every N seconds) ---
+LOGIN_USER_BURST = int(os.getenv("KAIROS_LOGIN_USER_BURST", "5"))
+LOGIN_USER_EVERY = float(os.getenv("KAIROS_LOGIN_USER_EVERY", "30"))
+LOGIN_IP_BURST = int(os.getenv("KAIROS_LOGIN_IP_BURST", "20"))
+LOGIN_IP_EVERY = float(os.getenv("KAIROS_LOGIN_IP_EVERY", "6"))
+
+
+class HashingBusy(Exception):
+    """The hashing queue is full or a hash did not finish in time."""
+
+
+class HashingService:
+    """
+    Runs bcrypt on a bounded thread pool (bcrypt releases the GIL).
+    At most `queue_size` jobs may be pending; beyond that callers get
+    HashingBusy immediately instead of piling up on the server threads.
+    """
+
+    def __init__(self, workers=HASH_WORKERS, queue_size=HASH_QUEUE, timeout=HASH_TIMEOUT, rounds=BCRYPT_ROUNDS):
+        self.rounds = rounds
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kairos-bcrypt")
+        self._slots = threading.BoundedSemaphore(queue_size)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy("HASH QUEUE FULL")
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HashingBusy("HASH TIMEOUT")
+
+    def hash(self, password):
+        return self._run(lambda p: bcrypt.hashpw(p.encode('utf-8'), bcrypt.gensalt(self.rounds)), password)
+
+    def verify(self, password, hashed):
+        return self._run(lambda p, h: bcrypt.checkpw(p.encode('utf-8'), h), password, hashed)
+
+    def needs_rehash(self, hashed):
+        # $2b$12$... -> cost factor between the 2nd and 3rd '$'
+        try:
+            return int(hashed.split(b"$")[2]) != self.rounds
+        except (IndexError, ValueError, AttributeError):
+            return True
+
+
+hasher = HashingService()
+user_limiter = KeyedRateLimiter(1 / LOGIN_USER_EVERY, LOGIN_USER_BURST)
+ip_limiter = KeyedRateLimiter(1 / LOGIN_IP_EVERY, LOGIN_IP_BURST)
+
+# Verified against when the username does not exist, so timing does not leak it.
+# Made on first use: importing the module does no bcrypt work.
+_dummy_hash = None
+
+def _dummy():
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hasher.hash("kairos-dummy")
+    return _dummy_hash
+
+def hash_password(password):
+    return hasher.hash(password)
+
+def reset_passwords(user_ids, password):
+    """Sets `password` for every listed user, each with its own salt. Raises HashingBusy before writing anything."""
+    dbm.admin_reset_passwords({int(i): hasher.hash(password) for i in user_ids})
 
 # --- SECURITY UTILS ---
 def get_client_ip():
@@ -47,12 +127,37 @@ def check_access(user_id):
         else:
             return False, "DEVICE LIMIT REACHED"
 
-def authenticate_user(username, password):
+def login_allowed(username, ip):
+    """Token-bucket check per username and per IP. Returns (allowed, retry_after_seconds)."""
+    if not ip_limiter.try_acquire(ip):
+        return False, ip_limiter.retry_after(ip)
+    if not user_limiter.try_acquire(username.lower()):
+        return False, user_limiter.retry_after(username.lower())
+    return True, 0.0
+
+def verify_credentials(username, password):
+    """Returns (user_id, role) or (None, None). Rehashes transparently when the work factor changed."""
     row = dbm.get_user_credentials(username)
+    if not row:
+        hasher.verify(password, _dummy())
+        return None, None
+    user_id, stored, role = row
+    if not hasher.verify(password, stored):
+        return None, None
+    if hasher.needs_rehash(stored):
+        dbm.update_password_hash(user_id, hasher.hash(password))
+    return user_id, role
+
+def authenticate_user(username, password):
+    allowed, retry_after = login_allowed(username, get_client_ip())
+    if not allowed:
+        return None, None, f"TOO MANY ATTEMPTS. RETRY IN {int(retry_after) + 1}s"
+    try:
+        user_id, role = verify_credentials(username, password)
+    except HashingBusy:
+        return None, None, "AUTH SERVICE BUSY. RETRY SHORTLY"
     
-    if row and bcrypt.checkpw(password.encode('utf-8'), row[1]):
-        user_id = row[0]
-        role = row[2]
+    if user_id:
         # Strict IP Check
         allowed, msg = check_access(user_id)
         if allowed:
@@ -71,8 +176,9 @@ def authenticate_user(username, password):
         return None, None, "Invalid Credentials"
 
 def create_user(username, password):
-    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    """Returns (created, message)."""
     try:
+        hashed = hash_password(password)
         # 1. Register User
         user_id = dbm.register_user(username, hashed)
         
@@ -80,7 +186,9 @@ def create_user(username, password):
         current_ip = get_client_ip()
         dbm.register_ip(user_id, current_ip, status='PENDING')
         
-        return True
+        return True, "IDENTITY CREATED. WAIT FOR ADMIN APPROVAL."
+    except HashingBusy:
+        return False, "AUTH SERVICE BUSY. RETRY SHORTLY"
     except Exception as e:
         print(f"Error creating user: {e}")
-        return False
+        return False, "IDENTITY CREATION FAILED"
@@ -0,0 +1,191 @@
+"""
+KAIROS MONTHLY CLOSING
+Renders the financial statement of every user into one directory.
+
+    python batch_reports.py                       # current month -> reports/<YYYY-MM>/
+    python batch_reports.py --period 2026-09 --workers 8
+    python batch_reports.py --out /srv/closing --users 12,15
+
+Users are streamed from the database and rendered on a process pool.
+Every finished report is appended to manifest.jsonl in the output
+directory; re-running the same command skips users already recorded as
+"ok" whose file still exists, so a crashed run resumes where it stopped.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+
+import database_manager as dbm
+import fx_service as fx
+import metrics_engine as me
+import report_engine
+
+
+MANIFEST_FILE = "manifest.jsonl"
+REPORT_TABLES = ("assets", "liabilities", "cashflow")
+USER_FETCH_SIZE = 500
+
+
+def iter_users(user_ids=None, fetch_size=USER_FETCH_SIZE):
+    """Yields (user_id, username) in id order without loading the whole table."""
+    sql = "SELECT id, username FROM users"
+    params = ()
+    if user_ids:
+        sql += f" WHERE id IN ({','.join('?' * len(user_ids))})"
+        params = tuple(user_ids)
+    with dbm.db_connection() as conn:
+        cur = conn.execute(sql + " ORDER BY id", params)
+        while True:
+            rows = cur.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield from rows
+
+
+def report_filename(period, user_id, username):
+    safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", str(username))[:40]
+    return f"Kairos_{period}_{user_id:06d}_{safe}.pdf"
+
+
+# --- MANIFEST ---
+def load_manifest(out_dir):
+    """Returns {user_id: record} of the latest record per user."""
+    done = {}
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # torn last line after a crash
+            done[rec["user_id"]] = rec
+    return done
+
+
+def completed_users(out_dir):
+    return {uid for uid, rec in load_manifest(out_dir).items()
+            if rec.get("status") == "ok" and os.path.exists(os.path.join(out_dir, rec["file"]))}
+
+
+def append_manifest(fh, record):
+    fh.write(json.dumps(record) + "\n")
+    fh.flush()
+    os.fsync(fh.fileno())
+
+
+# --- WORKER ---
+class _HashingSink:
+    """File wrapper that hashes and counts what the PDF writer streams through it."""
+
+    def __init__(self, f):
+        self.f = f
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.f.write(data)
+
+
+def render_user(user_id, username, period, out_dir):
+    """Runs in a pool process. Returns the manifest record."""
+    t0 = time.perf_counter()
+    name = report_filename(period, user_id, username)
+    record = {"user_id": user_id, "username": username, "period": period, "file": name}
+    try:
+        snapshot = dbm.load_user_snapshot(user_id, REPORT_TABLES, use_cache=False)
+        # In the user's base currency; rates come from the fx_rates table, never fetched per user
+        base, fx_factors = fx.get_service().base_factors(snapshot["assets"]["currency"].dropna().unique(),
+                                                         dbm.get_base_currency(user_id), request_missing=False)
+        metrics = me.compute_metrics(snapshot, fx_factors=fx_factors, currency=base)
+        # Streamed page by page into a temp file, then renamed: a crash never leaves a truncated PDF
+        tmp = os.path.join(out_dir, name + ".tmp")
+        with open(tmp, "wb") as f:
+            sink = _HashingSink(f)
+            pages = report_engine.stream_report(sink, username, metrics, snapshot["assets"], snapshot["liabilities"],
+                                                snapshot["cashflow"], period=period, fx_factors=fx_factors)
+        os.replace(tmp, os.path.join(out_dir, name))
+        record.update(status="ok", pages=pages, bytes=sink.size, sha256=sink.sha256.hexdigest(),
+                      net_worth=round(float(metrics["net_worth"]), 2), currency=base)
+    except Exception as e:
+        record.update(status="error", error=f"{type(e).__name__}: {e}")
+    record.update(seconds=round(time.perf_counter() - t0, 4), generated_at=datetime.now().isoformat(timespec="seconds"))
+    return record
+
+
+# --- DRIVER ---
+def run_closing(out_dir, period, workers=None, user_ids=None, max_in_flight=None, log=print):
+    """Renders every pending user's report. Returns a summary dict."""
+    os.makedirs(out_dir, exist_ok=True)
+    with dbm.db_connection() as conn:
+        dbm.migrations.run_migrations(conn)
+    # Rates are refreshed once up front; workers only read the fx_rates table
+    fxs = fx.get_service()
+    fxs.refresh(fxs.currencies_in_use())
+    skip = completed_users(out_dir)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 4
+
+    stats = {"ok": 0, "error": 0, "skipped": 0, "pages": 0, "bytes": 0}
+    t0 = time.perf_counter()
+    with open(os.path.join(out_dir, MANIFEST_FILE), "a") as manifest, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+
+        def collect(futures):
+            for fut in futures:
+                rec = fut.result()
+                append_manifest(manifest, rec)
+                stats[rec["status"]] += 1
+                if rec["status"] == "ok":
+                    stats["pages"] += rec["pages"]
+                    stats["bytes"] += rec["bytes"]
+                else:
+                    log(f"[FAILED] user {rec['user_id']} ({rec['username']}): {rec['error']}")
+                done = stats["ok"] + stats["error"]
+                if done % 50 == 0:
+                    elapsed = time.perf_counter() - t0
+                    log(f"{done} reports, {stats['pages'] / elapsed:.1f} pages/s")
+
+        # Bounded submission: users stream in as results drain out
+        for user_id, username in iter_users(user_ids):
+            if user_id in skip:
+                stats["skipped"] += 1
+                continue
+            if len(pending) >= max_in_flight:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+            pending.add(pool.submit(render_user, user_id, username, period, out_dir))
+        collect(wait(pending)[0])
+
+    elapsed = time.perf_counter() - t0
+    stats.update(seconds=elapsed, pages_per_sec=stats["pages"] / elapsed if elapsed else 0.0,
+                 reports_per_sec=(stats["ok"] + stats["error"]) / elapsed if elapsed else 0.0)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kairos monthly closing: batch PDF statements for every user")
+    parser.add_argument("--period", default=datetime.now().strftime("%Y-%m"), help="closing period label (YYYY-MM)")
+    parser.add_argument("--out", default=None, help="output directory (default reports/<period>)")
+    parser.add_argument("--workers", type=int, default=0, help="0 = cpu_count")
+    parser.add_argument("--users", default="", help="comma separated user ids (default: everyone)")
+    args = parser.parse_args()
+
+    out_dir = args.out or os.path.join("reports", args.period)
+    user_ids = [int(u) for u in args.users.split(",") if u.strip()]
+    print(f"MONTHLY CLOSING {args.period} -> {out_dir} (DB: {dbm.DB_FILE})")
+    s = run_closing(out_dir, args.period, workers=args.workers or None, user_ids=user_ids or None)
+    print(f"DONE: {s['ok']} ok, {s['error']} failed, {s['skipped']} already closed | "
+          f"{s['pages']} pages in {s['seconds']:.1f} s = {s['pages_per_sec']:.1f} pages/s "
+          f"({s['reports_per_sec']:.1f} reports/s, {s['bytes'] / 1e6:.1f} MB)")
+    sys.exit(1 if s["error"] else 0)
@@ -0,0 +1,634 @@
+"""
+KAIROS BENCHMARK SUITE
+Run: python benchmarks.py <name> [--options]
+Each benchmark works on a throwaway database, never on kairos.db.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+# Isolated DB before importing the data layer
+_TMP_DIR = tempfile.mkdtemp(prefix="kairos_bench_")
+os.environ.setdefault("DB_PATH", os.path.join(_TMP_DIR, "bench.db"))
+
+import database_manager as dbm
+import forecast_engine as fe
+import cashflow_engine as cfe
+
+
+def _percentiles(samples_s):
+    arr = np.asarray(samples_s) * 1000
+    return {"p50": np.percentile(arr, 50), "p99": np.percentile(arr, 99), "max": arr.max()}
+
+
+def _print_row(label, count, elapsed, lat):
+    print(f"{label:<22} {count / elapsed:>10,.0f} ops/s   p50 {lat['p50']:.3f} ms   p99 {lat['p99']:.3f} ms   max {lat['max']:.3f} ms")
+
+
+# --- DB: LOGIN PATH ---
+def _login_path(username, ip):
+    row = dbm.get_user_credentials(username)
+    uid = row[0]
+    status = dbm.check_ip_status(uid, ip)
+    if status:
+        dbm.update_ip_last_used(uid, ip)
+    else:
+        dbm.count_ips(uid)
+
+
+def _run_login(threads, iterations):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(n):
+        local = []
+        for i in range(iterations):
+            t0 = time.perf_counter()
+            _login_path(f"bench_{(n + i) % 50}", "127.0.0.1")
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    t0 = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return time.perf_counter() - t0, latencies
+
+
+def bench_login(args):
+    dbm.init_db()
+    dbm.migrate_db()
+    for n in range(50):
+        if not dbm.get_user_credentials(f"bench_{n}"):
+            uid = dbm.register_user(f"bench_{n}", b"x")
+            dbm.register_ip(uid, "127.0.0.1", status="APPROVED")
+
+    pooled = dbm._pool
+    # Each login = credentials + one indexed device lookup; last_used is buffered in memory
+    for label, pool in (("UNPOOLED (connect/op)", None), ("POOLED + WAL", pooled)):
+        dbm._pool = pool
+        elapsed, lat = _run_login(args.threads, args.iterations)
+        print(f"[{label}] {args.threads} threads x {args.iterations} logins")
+        _print_row("  logins", len(lat), elapsed, _percentiles(lat))
+    dbm._pool = pooled
+    if pooled is not None:
+        print(f"POOL STATS: {pooled.stats}")
+    print(f"LAST_USED STATS: {dbm._last_used.stats}, {dbm._last_used.pending()} rows buffered")
+    t0 = time.perf_counter()
+    written = dbm.flush_ip_last_used()
+    print(f"FLUSH: {written} rows in {(time.perf_counter() - t0) * 1000:.2f} ms")
+
+
+# --- AUTH: BCRYPT UNDER CONCURRENT LOGINS ---
+def bench_auth(args):
+    import bcrypt
+    import auth_manager as auth
+
+    hashed = bcrypt.hashpw(b"secret", bcrypt.gensalt(auth.BCRYPT_ROUNDS))
+    attempts = args.attempts
+
+    def inline():
+        return bcrypt.checkpw(b"secret", hashed)
+
+    def pooled():
+        try:
+            return auth.hasher.verify("secret", hashed)
+        except auth.HashingBusy:
+            return None
+
+    print(f"bcrypt cost {auth.BCRYPT_ROUNDS}, {attempts} concurrent attempts, "
+          f"pool {auth.HASH_WORKERS} workers / queue {auth.HASH_QUEUE}")
+    for label, fn in (("INLINE bcrypt", inline), ("HashingService", pooled)):
+        latencies, rejected = [], []
+        lock = threading.Lock()
+        start = threading.Barrier(attempts)
+
+        def worker():
+            start.wait()
+            t0 = time.perf_counter()
+            ok = fn()
+            with lock:
+                (rejected if ok is None else latencies).append(time.perf_counter() - t0)
+
+        pool = [threading.Thread(target=worker) for _ in range(attempts)]
+        t0 = time.perf_counter()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.perf_counter() - t0
+        _print_row(label, len(latencies), elapsed, _percentiles(latencies or [0.0]))
+        print(f"  {'rejected (busy)':<20} {len(rejected):>10}")
+
+
+# --- ORACLE: SCENARIO PROJECTION ---
+def bench_projection(args):
+    months = 40 * 12
+    rates = np.linspace(-2.0, 15.0, 100)
+    schedule = np.full(months, 500.0)
+
+    def legacy():
+        for r in rates:
+            monthly_rate = (r - 2.5) / 100 / 12
+            values = [50000.0]
+            curr = 50000.0
+            for _ in range(months):
+                curr = curr * (1 + monthly_rate) + 500.0
+                values.append(curr)
+
+    for label, fn in (("LEGACY LOOP", legacy),
+                      ("project_wealth", lambda: fe.project_wealth(50000.0, schedule, rates, 2.5, months))):
+        fn()
+        samples = []
+        for _ in range(args.iterations):
+            t0 = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - t0)
+        lat = _percentiles(samples)
+        print(f"{label:<22} 100 scenarios x 40y   p50 {lat['p50']:.3f} ms   p99 {lat['p99']:.3f} ms")
+
+
+# --- ORACLE: MONTE CARLO ---
+def bench_montecarlo(args):
+    workers = args.workers or fe.default_workers()
+    for step in (12, 1):
+        for w in sorted({1, workers}):
+            kwargs = dict(n_paths=args.paths, target=1_000_000, seed=7, workers=w, step=step)
+            t0 = time.perf_counter()
+            res = fe.simulate_wealth_paths(50000.0, 500.0, 0.07, 0.15, 480, **kwargs)
+            elapsed = time.perf_counter() - t0
+            print(f"{args.paths:,} paths x 40y  step={step:<2} workers={w:<2} {elapsed:.3f} s   "
+                  f"P50 {res['p50'][-1]:,.0f}   P(1M) {res['prob_target']*100:.1f}%")
+
+
+# --- CASHFLOW NORMALIZATION ---
+def bench_cashflow(args):
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    n = args.rows
+    df = pd.DataFrame({
+        "type": rng.choice(["Income", "Expense"], n),
+        "category": rng.choice(["Salary", "Rent", "Dividends", "Food", "Housing", "Fun"], n),
+        "amount": rng.uniform(10, 5000, n),
+        "frequency": rng.choice(["Monthly", "Yearly", "Weekly", "Quarterly", "One-Time"], n),
+    })
+
+    def legacy():
+        calc = df.copy()
+        calc["m"] = calc.apply(lambda x: x["amount"] / 12 if x["frequency"] == "Yearly" else x["amount"], axis=1)
+        calc[calc["type"] == "Income"]["m"].sum()
+        calc[calc["type"] == "Expense"]["m"].sum()
+        calc[(calc["type"] == "Income") & (calc["category"].isin(list(cfe.PASSIVE_CATEGORIES)))]["m"].sum()
+        calc[calc["type"] == "Expense"].groupby("category")["m"].sum()
+
+    for label, fn in (("LEGACY apply", legacy), ("summarize_cashflow", lambda: cfe.summarize_cashflow(df))):
+        t0 = time.perf_counter()
+        fn()
+        print(f"{label:<22} {n:,} rows   {time.perf_counter() - t0:.3f} s")
+
+
+# --- PORTFOLIO ANALYTICS ---
+def bench_portfolio(args):
+    import pandas as pd
+    import portfolio_engine as pe
+
+    rng = np.random.default_rng(0)
+    n = args.positions
+    df = pd.DataFrame({
+        "id": np.arange(n), "name": [f"P{i}" for i in range(n)],
+        "category": rng.choice(["Stocks", "ETF", "Crypto", "Cash", "Real Estate", "Bonds"], n),
+        "quantity": rng.uniform(1, 100, n), "current_price": rng.uniform(1, 500, n),
+        "avg_price": np.where(rng.random(n) < 0.1, np.nan, rng.uniform(1, 500, n)),
+    })
+    pe.analyze_portfolio(df)
+    samples = []
+    for _ in range(args.iterations):
+        t0 = time.perf_counter()
+        pe.analyze_portfolio(df)
+        samples.append(time.perf_counter() - t0)
+    lat = _percentiles(samples)
+    print(f"analyze_portfolio      {n:,} positions   p50 {lat['p50']:.2f} ms   p99 {lat['p99']:.2f} ms")
+
+
+# --- FX: CONVERSION BEFORE AGGREGATION ---
+def bench_fx(args):
+    import pandas as pd
+    import fx_service as fx
+    import portfolio_engine as pe
+
+    rng = np.random.default_rng(0)
+    n = args.positions
+    df = pd.DataFrame({
+        "category": rng.choice(["Stocks", "ETF", "Crypto", "Cash"], n),
+        "currency": rng.choice(["EUR", "USD", "GBP", "CHF", "BTC", "usd ", None], n),
+        "quantity": rng.uniform(1, 100, n), "current_price": rng.uniform(1, 500, n),
+        "avg_price": rng.uniform(1, 500, n),
+    })
+    rates = {"EUR": 1.0, "USD": 0.92, "GBP": 1.17, "CHF": 1.05, "BTC": 58000.0}
+    factors = {c: r / rates["USD"] for c, r in rates.items()}
+
+    def per_row():
+        return sum(q * p * factors.get(c.strip().upper() if isinstance(c, str) else "EUR", 0.0)
+                   for q, p, c in zip(df["quantity"], df["current_price"], df["currency"]))
+
+    def vectorized():
+        return float((df["quantity"].to_numpy() * df["current_price"].to_numpy()
+                      * fx.conversion_factors(df["currency"], factors)).sum())
+
+    for label, fn in (("per-row lookup", per_row), ("vectorized join", vectorized),
+                      ("analyze_portfolio+fx", lambda: pe.analyze_portfolio(df, factors))):
+        fn()
+        samples = []
+        for _ in range(max(1, args.iterations // 50)):
+            t0 = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - t0)
+        lat = _percentiles(samples)
+        print(f"{label:<22} {n:,} positions   p50 {lat['p50']:.2f} ms   p99 {lat['p99']:.2f} ms")
+
+
+# --- PRICE HISTORY: BACKFILL AND RANGE READS ---
+def bench_history(args):
+    import pandas as pd
+    import price_history
+
+    rng = np.random.default_rng(0)
+    n_tickers, days = max(1, args.positions // 1000), pd.bdate_range("2015-01-01", periods=2520)
+    tickers = [f"T{i:04d}" for i in range(n_tickers)]
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (n_tickers, len(days))), axis=1))
+    feed = pd.DataFrame({"ticker": np.repeat(tickers, len(days)), "date": np.tile(days.strftime("%Y-%m-%d"), n_tickers),
+                         "close": closes.ravel(), "split": np.nan})
+    path = os.path.join(_TMP_DIR, "history.parquet")
+    feed.to_parquet(path)
+    with dbm.db_connection() as conn:
+        dbm.migrations.run_migrations(conn)
+
+    service = price_history.PriceHistoryService(price_history.FileHistoryProvider(path), batches_per_sec=1000)
+    t0 = time.perf_counter()
+    rows = service.backfill(tickers, days[0], days[-1])
+    elapsed = time.perf_counter() - t0
+    print(f"backfill               {rows:,} rows ({n_tickers} tickers x {len(days)} days) in {elapsed:.2f} s = {rows / elapsed:,.0f} rows/s")
+    t0 = time.perf_counter()
+    service.backfill(tickers, days[0], days[-1])
+    print(f"re-backfill (covered)  {(time.perf_counter() - t0) * 1000:.1f} ms, {service.stats['batches']} provider requests in total")
+
+    for label, span in (("matrix 1y", 252), ("matrix 10y", len(days))):
+        samples = []
+        for _ in range(max(1, args.iterations // 50)):
+            t0 = time.perf_counter()
+            _, dates, values = service.matrix(tickers, days[-span], days[-1])
+            samples.append(time.perf_counter() - t0)
+        lat = _percentiles(samples)
+        print(f"{label:<22} {values.shape[0]} x {values.shape[1]}   p50 {lat['p50']:.1f} ms   p99 {lat['p99']:.1f} ms")
+
+
+# --- FORECAST: FULL FIT VS INCREMENTAL UPDATE ---
+def bench_forecast(args):
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    n = 3650
+    df = pd.DataFrame({"date": pd.date_range("2016-01-01", periods=n + args.iterations),
+                       "net_worth": 1e5 + np.cumsum(rng.normal(30, 400, n + args.iterations))})
+    samples = []
+    for i in range(20):
+        t0 = time.perf_counter()
+        fe.forecast_nw(df.iloc[:n])
+        samples.append(time.perf_counter() - t0)
+    lat = _percentiles(samples)
+    print(f"full fit + backtest    {n:,} days   p50 {lat['p50']:.2f} ms   p99 {lat['p99']:.2f} ms")
+
+    fe.forecast_nw(df.iloc[:n], key="bench")
+    samples = []
+    for i in range(1, args.iterations):
+        t0 = time.perf_counter()
+        fc = fe.forecast_nw(df.iloc[:n + i], key="bench")
+        samples.append(time.perf_counter() - t0)
+    lat = _percentiles(samples)
+    print(f"incremental (+1 day)   {len(samples)} updates   p50 {lat['p50']:.2f} ms   p99 {lat['p99']:.2f} ms   (model: {fc['model']})")
+
+
+
+# --- TIME TO TARGET ---
+def bench_time_to_target(args):
+    import pandas as pd
+
+    # One call for a whole fleet of users with up to 4 debts each vs a per-user loop
+    rng = np.random.default_rng(0)
+    n_users = 10000
+    assets = rng.uniform(0, 5e5, n_users)
+    contrib = rng.uniform(0, 4000, n_users)
+    ret = rng.uniform(2, 9, n_users)
+    frames = [pd.DataFrame({"remaining_balance": rng.uniform(0, 3e5, k), "monthly_payment": rng.uniform(200, 2000, k),
+                            "interest_rate": rng.uniform(0, 8, k)}) for k in rng.integers(0, 5, n_users)]
+    debts = fe.stack_liabilities(frames)
+
+    t0 = time.perf_counter()
+    closed = fe.solve_time_to_target(assets, contrib, 1e6, ret, 2.5)
+    t_closed = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    solved = fe.solve_time_to_target(assets, contrib, 1e6, ret, 2.5, liabilities=debts)
+    t_bisect = time.perf_counter() - t0
+
+    loop_n = min(n_users, args.iterations)
+    t0 = time.perf_counter()
+    for i in range(loop_n):
+        fe.solve_time_to_target(assets[i], contrib[i], 1e6, ret[i], 2.5, liabilities=tuple(d[i] for d in debts))
+    t_loop = (time.perf_counter() - t0) / loop_n * n_users
+
+    print(f"closed form (no debts)  {n_users:,} users   {t_closed*1000:.2f} ms   ({np.isfinite(closed).mean()*100:.0f}% reach target)")
+    print(f"scan + bisection, debts {n_users:,} users   {t_bisect*1000:.2f} ms")
+    print(f"per-user loop           {n_users:,} users   {t_loop*1000:.2f} ms (extrapolated from {loop_n})   speedup {t_loop/t_bisect:.0f}x")
+
+    grid = fe.solve_time_to_target(assets[0], np.arange(0, 5001, 100)[:, None, None], 1e6,
+                                   np.arange(0, 12.5, 0.5)[None, :, None], np.arange(0, 5.5, 0.5)[None, None, :])
+    print(f"what-if grid            {grid.size:,} combinations in one call")
+
+
+
+# --- DEBT PAYOFF ---
+def bench_debts(args):
+    import debt_engine as de
+
+    # 30-year schedules for a few hundred debts, plus an extra-payment what-if grid
+    rng = np.random.default_rng(0)
+    n = 300
+    bal = rng.uniform(1e3, 3e5, n)
+    pay = bal * rng.uniform(0.005, 0.03, n)
+    rate = rng.uniform(0, 20, n)
+    for strategy in de.DEBT_STRATEGIES:
+        samples = []
+        for _ in range(20):
+            t0 = time.perf_counter()
+            plan = de.payoff_schedule(bal, pay, rate, strategy, extra=500)
+            samples.append(time.perf_counter() - t0)
+        lat = _percentiles(samples)
+        print(f"{strategy:<10} {n} debts x {de.SCHEDULE_MONTHS} months   p50 {lat['p50']:.2f} ms   p99 {lat['p99']:.2f} ms"
+              f"   (debt-free month {plan['debt_free_month']:.0f}, interest {plan['total_interest']:,.0f})")
+    extras = np.arange(0, 5001, 250)
+    t0 = time.perf_counter()
+    grid = de.payoff_schedule(bal, pay, rate, "avalanche", extra=extras)
+    print(f"avalanche  {len(extras)} extra-payment what-ifs in one call   {(time.perf_counter() - t0)*1000:.2f} ms"
+          f"   (interest {grid['total_interest'][0]:,.0f} -> {grid['total_interest'][-1]:,.0f})")
+
+
+
+# --- FLEET ANALYTICS ---
+def bench_fleet(args):
+    import analytics_engine as an
+    import migrations
+
+    # Synthetic fleet written through the summary triggers
+    rng = np.random.default_rng(0)
+    n_users = args.users
+    with dbm.db_connection() as conn:
+        dbm.migrations.run_migrations(conn)
+        first = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM users").fetchone()[0]
+        uids = list(range(first, first + n_users))
+        conn.executemany("INSERT INTO users (id, username, role) VALUES (?, ?, 'USER')", [(u, f"fleet{u}") for u in uids])
+        owners = np.repeat(uids, 20)
+        rows = [(int(u), f"A{i}", str(c), str(cur), float(q), float(p), float(p)) for i, (u, c, cur, q, p) in enumerate(zip(
+            owners, rng.choice(["Stocks", "ETF", "Crypto", "Cash", "Bonds"], len(owners)), rng.choice(["EUR", "USD"], len(owners)),
+            rng.uniform(1, 100, len(owners)), rng.uniform(1, 500, len(owners))))]
+        t0 = time.perf_counter()
+        conn.executemany("INSERT INTO assets (user_id, name, category, currency, quantity, current_price, avg_price) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        t_insert = time.perf_counter() - t0
+        conn.executemany("INSERT INTO liabilities (user_id, name, category, remaining_balance, monthly_payment, interest_rate) VALUES (?, 'L', 'Loan', ?, ?, ?)",
+                         [(u, float(b), float(b) / 200, 4.0) for u, b in zip(uids, rng.uniform(0, 2e5, n_users))])
+        conn.executemany("INSERT INTO cashflow (user_id, type, category, name, amount, frequency) VALUES (?, ?, 'Salary', 'x', ?, 'Monthly')",
+                         [(u, t, float(a)) for u in uids for t, a in (("Income", 3000), ("Expense", 2000))])
+        conn.commit()
+    print(f"insert with triggers   {len(rows):,} asset rows   {t_insert*1000:.0f} ms   ({len(rows) / t_insert:,.0f} rows/s)")
+
+    sample = uids[:min(n_users, 200)]
+    t0 = time.perf_counter()
+    for u in sample:
+        dbm.load_data("assets", u)
+        dbm.load_data("liabilities", u)
+        dbm.load_data("cashflow", u)
+    t_loop = (time.perf_counter() - t0) / len(sample) * n_users
+    with dbm.db_connection() as conn:
+        t0 = time.perf_counter()
+        migrations.rebuild_fleet_summaries(conn)
+        conn.rollback()
+        t_group = time.perf_counter() - t0
+    samples = []
+    for _ in range(20):
+        t0 = time.perf_counter()
+        s = an.fleet_summary()
+        samples.append(time.perf_counter() - t0)
+    lat = _percentiles(samples)
+    print(f"per-user load_data     {n_users:,} users   {t_loop*1000:.0f} ms (extrapolated from {len(sample)})")
+    print(f"GROUP BY rebuild       {n_users:,} users   {t_group*1000:.0f} ms")
+    print(f"summary tables         {s['users']:,} users   p50 {lat['p50']:.2f} ms   p99 {lat['p99']:.2f} ms")
+
+
+
+# --- ADMIN LISTS ---
+def bench_admin_pages(args):
+    with dbm.db_connection() as conn:
+        dbm.migrations.run_migrations(conn)
+        first = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM users").fetchone()[0]
+        conn.executemany("INSERT INTO users (id, username, role, created_at) VALUES (?, ?, 'USER', ?)",
+                         [(first + i, f"op{first + i:07d}", f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}") for i in range(args.users)])
+        conn.commit()
+    total = dbm.count_users()
+
+    t0 = time.perf_counter()
+    dbm.get_all_users_view()
+    t_full = time.perf_counter() - t0
+    print(f"full list (old view)    {total:,} users   {t_full*1000:.1f} ms")
+
+    for sort in dbm.USER_SORT_COLUMNS:
+        samples, cursor, pages = [], None, 0
+        while pages < args.iterations:
+            t0 = time.perf_counter()
+            _, cursor = dbm.page_users(sort=sort, descending=True, after=cursor)
+            samples.append(time.perf_counter() - t0)
+            pages += 1
+            if cursor is None:
+                break
+        lat = _percentiles(samples)
+        print(f"keyset page by {sort:<10} {pages} pages of {dbm.ADMIN_PAGE_SIZE}   p50 {lat['p50']:.2f} ms   p99 {lat['p99']:.2f} ms   max {lat['max']:.2f} ms")
+
+
+# --- NET WORTH RECONSTRUCTION ---
+def bench_networth(args):
+    import pandas as pd
+    import cache_manager
+    import networth_engine as ne
+    import price_history
+
+    # 500 positions over 250 tickers, 10 years of daily closes
+    rng = np.random.default_rng(0)
+    n_pos, n_tickers = 500, 250
+    days = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=2610)
+    tickers = [f"T{i:04d}" for i in range(n_tickers)]
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (n_tickers, len(days))), axis=1))
+    path = os.path.join(_TMP_DIR, "networth_history.parquet")
+    pd.DataFrame({"ticker": np.repeat(tickers, len(days)), "date": np.tile(days.strftime("%Y-%m-%d"), n_tickers),
+                  "close": closes.ravel()}).to_parquet(path)
+    with dbm.db_connection() as conn:
+        dbm.migrations.run_migrations(conn)
+    service = price_history.get_service()
+    service.provider = price_history.FileHistoryProvider(path)
+    service.limiter.rate = 1000
+    service.backfill(tickers, days[0], days[-1])
+
+    df_a = pd.DataFrame({"ticker": rng.choice(tickers, n_pos), "quantity": rng.uniform(1, 100, n_pos),
+                         "current_price": rng.uniform(1, 500, n_pos), "currency": "EUR"})
+    df_l = pd.DataFrame({"remaining_balance": rng.uniform(1e3, 3e5, 5), "monthly_payment": rng.uniform(100, 2000, 5),
+                         "interest_rate": rng.uniform(0, 8, 5)})
+    end = pd.Timestamp.now()
+    start = end - pd.Timedelta(days=3652)
+
+    t0 = time.perf_counter()
+    series = ne.reconstruct_networth(df_a, df_l, start, end)
+    cold = time.perf_counter() - t0
+    print(f"reconstruct (cold)     {len(series):,} days x {n_pos} positions in {cold * 1000:.0f} ms")
+    ne.cached_networth(1, df_a, df_l, start, end)
+    samples = []
+    for _ in range(args.iterations):
+        t0 = time.perf_counter()
+        ne.cached_networth(1, df_a, df_l, start, end)
+        samples.append(time.perf_counter() - t0)
+    lat = _percentiles(samples)
+    print(f"cached_networth (hit)  p50 {lat['p50']:.3f} ms   p99 {lat['p99']:.3f} ms   {cache_manager.results.stats()['hit_rate']:.0%} hits")
+
+
+# --- REPORTS: RENDER VS CACHE ---
+def bench_report(args):
+    import pandas as pd
+    import cache_manager
+    import metrics_engine as me
+    import report_engine
+
+    rng = np.random.default_rng(0)
+    n = max(10, args.rows // 1000)
+    df_a = pd.DataFrame({"id": np.arange(n), "name": [f"A{i}" for i in range(n)],
+                         "category": rng.choice(["Stocks", "ETF", "Crypto", "Cash"], n),
+                         "quantity": rng.uniform(1, 100, n), "current_price": rng.uniform(1, 500, n)})
+    df_l = pd.DataFrame({"id": [1], "remaining_balance": [100000.0]})
+    df_c = pd.DataFrame({"id": np.arange(n), "type": rng.choice(["Income", "Expense"], n),
+                         "category": rng.choice(["Salary", "Rent", "Dividends", "Food"], n),
+                         "amount": rng.uniform(10, 5000, n), "frequency": "Monthly"})
+    metrics = me.compute_metrics({"assets": df_a, "liabilities": df_l, "cashflow": df_c})
+    cache_manager.reports.directory = os.path.join(_TMP_DIR, "report_cache")
+
+    def timed(fn):
+        samples = []
+        for _ in range(args.iterations):
+            t0 = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - t0)
+        return _percentiles(samples)
+
+    cases = (
+        ("render (no cache)", lambda: report_engine.render_report("bench", metrics, df_a.copy(), df_l.copy(), df_c.copy())),
+        ("fingerprint only", lambda: cache_manager.fingerprint((df_a, df_l, df_c), "bench")),
+        ("cached_report (hit)", lambda: report_engine.cached_report("bench", metrics, df_a, df_l, df_c)),
+    )
+    print(f"{n} assets / {n} cashflow rows, {args.iterations} iterations")
+    for label, fn in cases:
+        lat = timed(fn)
+        print(f"{label:<22} p50 {lat['p50']:.3f} ms   p99 {lat['p99']:.3f} ms")
+    print(f"REPORT CACHE STATS: {cache_manager.reports.stats()}")
+
+
+# --- REPORTS: PEAK MEMORY ON A LARGE HOLDINGS APPENDIX ---
+def _rss_kb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * (os.sysconf("SC_PAGE_SIZE") // 1024)
+
+
+def _report_memory_case(mode, rows, out_path, queue):
+    import resource
+    import pandas as pd
+    import report_engine
+
+    df_a = pd.DataFrame({"name": [f"Position {i}" for i in range(rows)], "category": "ETF", "ticker": "VWCE",
+                         "quantity": np.arange(rows, dtype=float), "current_price": 101.25})
+    df_l = pd.DataFrame({"remaining_balance": [0.0]})
+    df_c = pd.DataFrame(columns=["type", "category", "amount", "frequency"])
+    metrics = {"net_worth": 1.0, "liabilities": 0.0, "freedom_index": 0.0}
+    base = _rss_kb()
+    t0 = time.perf_counter()
+    if mode == "in-memory":
+        # The pre-streaming path: whole document as a str, then encoded
+        pdf = report_engine.PDFReport()
+        pdf.cover_page("bench", 1.0)
+        pdf.financial_page(metrics, df_c, df_a, df_l)
+        pdf.strategy_page(0.0)
+        pdf.holdings_appendix(df_a)
+        data = pdf.output(dest='S').encode('latin-1')
+        with open(out_path, "wb") as f:
+            f.write(data)
+        pages = pdf.page_no()
+    else:
+        with open(out_path, "wb") as f:
+            pages = report_engine.stream_report(f, "bench", metrics, df_a, df_l, df_c)
+    elapsed = time.perf_counter() - t0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((pages, elapsed, peak - base, os.path.getsize(out_path)))
+
+
+def bench_report_memory(args):
+    import multiprocessing as mp
+
+    ctx = mp.get_context("spawn")  # fresh interpreter per case: ru_maxrss is per process
+    rows = args.appendix_rows
+    for mode in ("in-memory", "streaming"):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_report_memory_case, args=(mode, rows, os.path.join(_TMP_DIR, f"{mode}.pdf"), queue))
+        proc.start()
+        pages, elapsed, peak_kb, size = queue.get()
+        proc.join()
+        print(f"{mode:<10} {rows:,} rows  {pages} pages  {elapsed:.2f} s  {pages / elapsed:,.0f} pages/s   "
+              f"peak RSS +{peak_kb / 1024:.1f} MB over baseline   file {size / 1e6:.2f} MB")
+
+
+BENCHMARKS = {
+    "login": bench_login,
+    "auth": bench_auth,
+    "projection": bench_projection,
+    "montecarlo": bench_montecarlo,
+    "cashflow": bench_cashflow,
+    "portfolio": bench_portfolio,
+    "fx": bench_fx,
+    "history": bench_history,
+    "networth": bench_networth,
+    "forecast": bench_forecast,
+    "time-to-target": bench_time_to_target,
+    "debts": bench_debts,
+    "fleet": bench_fleet,
+    "admin-pages": bench_admin_pages,
+    "report": bench_report,
+    "report-memory": bench_report_memory,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kairos performance benchmarks")
+    parser.add_argument("name", choices=sorted(BENCHMARKS))
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--attempts", type=int, default=100)
+    parser.add_argument("--paths", type=int, default=100_000)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--positions", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--appendix-rows", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=0, help="0 = cpu_count - 1")
+    args = parser.parse_args()
+    print(f"DB: {dbm.DB_FILE}")
+    BENCHMARKS[args.name](args)
+    sys.exit(0)
@@ -0,0 +1,308 @@
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+CACHE_MAX_MB = float(os.getenv("KAIROS_CACHE_MAX_MB", "256"))
+REPORT_CACHE_MAX_MB = float(os.getenv("KAIROS_REPORT_CACHE_MAX_MB", "128"))
+# Next to the database by default so every worker on the host shares it
+REPORT_CACHE_DIR = os.getenv("KAIROS_REPORT_CACHE_DIR",
+                             os.path.join(os.path.dirname(os.getenv("DB_PATH", "kairos.db")) or ".", "report_cache"))
+
+_MISSING = object()
+
+
+def estimate_size(value):
+    """Approximate memory footprint in bytes of a cached value."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    nbytes = getattr(value, "nbytes", None)
+    if nbytes is not None:
+        return int(nbytes)
+    return sys.getsizeof(value)
+
+
+def _copy(value):
+    # Cached frames are shared between sessions: callers always get their own copy
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+class ResultCache:
+    """
+    Per-user LRU cache keyed by (user_id, name, data_version).
+    The version is users.data_version, which SQLite triggers bump inside every
+    write transaction (any process). Each rerun reads it once and calls
+    sync(user_id, version); a new version drops the user's older entries.
+    bump(user_id) drops them right away in the writing process and sets a local
+    version (negative) that the next sync always replaces.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (user_id, name, version) -> (value, size)
+        self._versions = {}
+        self._local = 0  # local bump tokens count down and never match a stored version
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def version(self, user_id):
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def bump(self, user_id):
+        with self._lock:
+            self._local -= 1
+            return self._set_version(user_id, self._local)
+
+    def sync(self, user_id, version):
+        """Adopts the stored data version of the user; returns it."""
+        with self._lock:
+            if self._versions.get(user_id, 0) != version:
+                self._set_version(user_id, version)
+            return version
+
+    def _set_version(self, user_id, version):
+        self._versions[user_id] = version
+        for key in [k for k in self._entries if k[0] == user_id]:
+            self._drop(key)
+        return version
+
+    def get(self, user_id, name, default=None):
+        with self._lock:
+            key = (user_id, name, self._versions.get(user_id, 0))
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return _copy(entry[0])
+
+    def put(self, user_id, name, value, version=None):
+        """Stores value for the given version (defaults to the current one)."""
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            current = self._versions.get(user_id, 0)
+            if version is not None and version != current:
+                return  # A write landed while the value was being computed
+            key = (user_id, name, current)
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (_copy(value), size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_or_compute(self, user_id, name, compute):
+        value = self.get(user_id, name, _MISSING)
+        if value is not _MISSING:
+            return value
+        version = self.version(user_id)
+        value = compute()
+        self.put(user_id, name, value, version=version)
+        return value
+
+    def _drop(self, key):
+        _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+def fingerprint(frames, *extra):
+    """
+    Content hash of DataFrames (plus any extra key parts), independent of row
+    order when an `id` column exists. Same data -> same key in every process.
+    """
+    h = hashlib.sha256()
+    for df in frames:
+        if df is None:
+            h.update(b"<none>")
+            continue
+        if "id" in df.columns:
+            df = df.sort_values("id", kind="stable")
+        h.update(repr([(c, str(t)) for c, t in df.dtypes.items()]).encode())
+        h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    for part in extra:
+        h.update(b"|" + str(part).encode())
+    return h.hexdigest()
+
+
+class DiskCache:
+    """
+    Byte blobs on disk keyed by a fingerprint, shared by sessions and workers.
+    Files are written atomically; a hit refreshes the mtime and the oldest
+    files are evicted once the directory exceeds `max_bytes` (the file just
+    written is always kept). Large values are handed out as paths, never read
+    back into memory. Counters are per process.
+    """
+
+    def __init__(self, directory, max_bytes, suffix=".bin"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def locate(self, key):
+        """Path of the cached file (its mtime refreshed), or None on a miss."""
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def get(self, key):
+        """Cached bytes, or None. Reads the whole file: use locate() for large values."""
+        path = self.locate(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None  # evicted by another worker in between
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._path(key))
+            self._evict()
+        except OSError as e:
+            print(f"Disk cache write failed: {e}")
+
+    def get_or_compute(self, key, compute):
+        data = self.get(key)
+        if data is None:
+            data = compute()
+            self.put(key, data)
+        return data
+
+    def get_or_write(self, key, write):
+        """
+        write(f) streams the value into the cache file on a miss. Returns the
+        file path; the value itself never passes through memory here.
+        """
+        path = self.locate(key)
+        if path is not None:
+            return path
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                write(f)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self._evict(keep=path)
+        return path
+
+    def _files(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.suffix):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue  # evicted by another worker
+                files.append((st.st_mtime, st.st_size, entry.path))
+        return files
+
+    def _evict(self, keep=None):
+        files = self._files()
+        total = sum(f[1] for f in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+                with self._lock:
+                    self.evictions += 1
+            except OSError:
+                pass
+
+    def clear(self):
+        if os.path.isdir(self.directory):
+            for _, _, path in self._files():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        files = self._files() if os.path.isdir(self.directory) else []
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(files),
+                "bytes": sum(f[1] for f in files),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+results = ResultCache(int(CACHE_MAX_MB * 1024 * 1024))
+reports = DiskCache(REPORT_CACHE_DIR, int(REPORT_CACHE_MAX_MB * 1024 * 1024), suffix=".pdf")
+
+bump_version = results.bump
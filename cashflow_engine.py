@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# One-Time items are spread over this many months
+ONE_TIME_AMORTIZATION_MONTHS = int(os.getenv("KAIROS_ONE_TIME_MONTHS", "12"))
+
+FREQUENCY_TO_MONTHLY = {
+    "Weekly": 52 / 12,
+    "Monthly": 1.0,
+    "Quarterly": 1 / 3,
+    "Yearly": 1 / 12,
+    "One-Time": 1 / ONE_TIME_AMORTIZATION_MONTHS,
+}
+FREQUENCIES = list(FREQUENCY_TO_MONTHLY)
+PASSIVE_CATEGORIES = ('Dividends', 'Rent', 'Passive', 'Interests')
+
+
+def monthly_amounts(df):
+    """
+    Monthly-equivalent amount of every cashflow row, as a float array.
+    Frequencies are matched through their categorical codes (one lookup per
+    distinct value, not per row); unknown or empty frequencies count as Monthly.
+    """
+    if df.empty:
+        return np.zeros(0)
+    freq = df['frequency'].astype('category')
+    factors = np.array([FREQUENCY_TO_MONTHLY.get(str(c).strip(), 1.0) for c in freq.cat.categories] + [1.0])
+    # code -1 (missing) picks the trailing Monthly factor
+    return df['amount'].to_numpy(dtype=float, na_value=0.0) * factors[freq.cat.codes.to_numpy()]
+
+
+def summarize_cashflow(df):
+    """
+    Income / expense / passive aggregates plus a per-category breakdown, in one pass.
+    Returns a dict: income, expense, passive, net, freedom_index and
+    by_category (DataFrame with type, category, monthly_val).
+    """
+    if df is None or df.empty:
+        empty = pd.DataFrame({'type': pd.Series(dtype=object), 'category': pd.Series(dtype=object), 'monthly_val': pd.Series(dtype=float)})
+        return {"income": 0.0, "expense": 0.0, "passive": 0.0, "net": 0.0, "freedom_index": 0.0, "by_category": empty}
+
+    by_cat = (pd.DataFrame({'type': df['type'], 'category': df['category'], 'monthly_val': monthly_amounts(df)})
+              .groupby(['type', 'category'], observed=True, dropna=False)['monthly_val'].sum()
+              .reset_index())
+
+    is_inc = (by_cat['type'] == 'Income').to_numpy()
+    is_exp = (by_cat['type'] == 'Expense').to_numpy()
+    vals = by_cat['monthly_val'].to_numpy()
+    inc = float(vals[is_inc].sum())
+    exp = float(vals[is_exp].sum())
+    passive = float(vals[is_inc & by_cat['category'].isin(PASSIVE_CATEGORIES).to_numpy()].sum())
+    return {
+        "income": inc,
+        "expense": exp,
+        "passive": passive,
+        "net": inc - exp,
+        "freedom_index": (passive / exp * 100) if exp > 0 else 0.0,
+        "by_category": by_cat,
+    }
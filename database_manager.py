@@ -1,15 +1,31 @@
 
+import atexit
 import os
 import sqlite3
+import threading
+import time
 import pandas as pd
 import bcrypt
-import yfinance as yf
-from datetime import datetime
+from datetime import datetime, timedelta
 from contextlib import contextmanager
 
+import cache_manager
+import ip_allowlist
+import migrations
+import queries as q
+
 
 DB_FILE = os.getenv("DB_PATH", "kairos.db")
 
+# Connection Pool Tuning (0 = no pooling, one connection per call like the old behaviour)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "30000"))
+DB_JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE", "WAL")
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(128 * 1024 * 1024)))
+
 # Ensure Database Directory Exists
 db_dir = os.path.dirname(DB_FILE)
 if db_dir and not os.path.exists(db_dir):
@@ -18,43 +34,162 @@ if db_dir and not os.path.exists(db_dir):
     except OSError:
         pass
 
+# --- CONNECTION POOL ---
+def _open_connection(db_file):
+    conn = sqlite3.connect(db_file, timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+    if DB_JOURNAL_MODE:
+        conn.execute(f"PRAGMA journal_mode = {DB_JOURNAL_MODE}")
+    conn.execute(f"PRAGMA synchronous = {DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections.
+    A thread keeps the same connection for nested db_connection() blocks, idle
+    connections are health-checked on checkout and recycled after a fork.
+    """
+
+    def __init__(self, db_file, max_size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        self.db_file = db_file
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = []
+        self._total = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self.stats = {"created": 0, "reused": 0, "discarded": 0, "waits": 0}
+
+    def _check_fork(self):
+        # Connections must never cross a fork (process pools for reports/simulations)
+        if self._pid != os.getpid():
+            self._idle = []
+            self._total = 0
+            self._cond = threading.Condition()
+            self._local = threading.local()
+            self._pid = os.getpid()
+
+    @staticmethod
+    def _is_healthy(conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        self._total -= 1
+        self.stats["discarded"] += 1
+
+    def acquire(self):
+        self._check_fork()
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                while self._idle:
+                    conn = self._idle.pop()
+                    if self._is_healthy(conn):
+                        self.stats["reused"] += 1
+                        return conn
+                    self._discard(conn)
+                if self._total < self.max_size:
+                    self._total += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"DB POOL EXHAUSTED ({self.max_size} connections busy)")
+                self.stats["waits"] += 1
+                self._cond.wait(remaining)
+        try:
+            conn = _open_connection(self.db_file)
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+        self.stats["created"] += 1
+        return conn
+
+    def release(self, conn):
+        # Never hand out a connection with a half-finished transaction
+        healthy = True
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            healthy = False
+        with self._cond:
+            if healthy and self._pid == os.getpid():
+                self._idle.append(conn)
+            else:
+                self._discard(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        self._check_fork()
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self.acquire()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self.release(conn)
+
+    def close_all(self):
+        with self._cond:
+            for conn in self._idle:
+                self._discard(conn)
+            self._idle = []
+
+
+_pool = ConnectionPool(DB_FILE) if DB_POOL_SIZE > 0 else None
+
+
 @contextmanager
 def db_connection():
-    conn = sqlite3.connect(DB_FILE, timeout=30, check_same_thread=False)
-    try:
+    if _pool is None:
+        conn = sqlite3.connect(DB_FILE, timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        try:
+            yield conn
+        finally:
+            conn.close()
+        return
+
+    with _pool.connection() as conn:
         yield conn
-    finally:
-        conn.close()
 
 # --- INITIALIZATION ---
 def init_db():
-    with db_connection() as conn:
-        c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, username TEXT UNIQUE, password_hash BLOB, created_at TIMESTAMP, role TEXT DEFAULT 'USER')''')
-        c.execute('''CREATE TABLE IF NOT EXISTS allowed_ips (id INTEGER PRIMARY KEY, user_id INTEGER, ip_address TEXT, device_name TEXT, status TEXT, last_used TIMESTAMP)''')
-        c.execute('''CREATE TABLE IF NOT EXISTS assets (id INTEGER PRIMARY KEY, user_id INTEGER, name TEXT, category TEXT, ticker TEXT, quantity REAL, avg_price REAL, current_price REAL, currency TEXT DEFAULT 'EUR')''')
-        c.execute('''CREATE TABLE IF NOT EXISTS liabilities (id INTEGER PRIMARY KEY, user_id INTEGER, name TEXT, category TEXT, remaining_balance REAL, monthly_payment REAL, interest_rate REAL)''')
-        c.execute('''CREATE TABLE IF NOT EXISTS cashflow (id INTEGER PRIMARY KEY, user_id INTEGER, type TEXT, category TEXT, name TEXT, amount REAL, frequency TEXT DEFAULT 'Monthly')''')
-        c.execute('''CREATE TABLE IF NOT EXISTS routine (id INTEGER PRIMARY KEY, user_id INTEGER, time_slot TEXT, monday TEXT, tuesday TEXT, wednesday TEXT, thursday TEXT, friday TEXT, saturday TEXT, sunday TEXT)''')
-        c.execute('''CREATE TABLE IF NOT EXISTS history_snapshots (id INTEGER PRIMARY KEY, user_id INTEGER, date TEXT, total_assets REAL, total_liabilities REAL, net_worth REAL)''')
-        c.execute('''CREATE TABLE IF NOT EXISTS career_skills (id INTEGER PRIMARY KEY, user_id INTEGER, skill_name TEXT, current_level INTEGER, target_level INTEGER, category TEXT)''')
-        c.execute('''CREATE TABLE IF NOT EXISTS career_wins (id INTEGER PRIMARY KEY, user_id INTEGER, date TEXT, description TEXT, impact TEXT)''')
-        c.execute('''CREATE TABLE IF NOT EXISTS goals (id INTEGER PRIMARY KEY, user_id INTEGER, name TEXT, target_amount REAL, current_amount REAL, deadline TEXT, status TEXT DEFAULT 'ACTIVE')''')
-        conn.commit()
+    migrate_db()
     
     # Bootstrap Admin
     bootstrap_admin()
 
 def migrate_db():
+    """Brings the schema to the latest version (see migrations.py)."""
     with db_connection() as conn:
-        c = conn.cursor()
-        try:
-            c.execute("ALTER TABLE users ADD COLUMN role TEXT DEFAULT 'USER'")
-        except:
-            pass
-        c.execute('''CREATE TABLE IF NOT EXISTS allowed_ips (id INTEGER PRIMARY KEY, user_id INTEGER, ip_address TEXT, device_name TEXT, status TEXT, last_used TIMESTAMP)''')
-        c.execute('''CREATE TABLE IF NOT EXISTS goals (id INTEGER PRIMARY KEY, user_id INTEGER, name TEXT, target_amount REAL, current_amount REAL, deadline TEXT, status TEXT DEFAULT 'ACTIVE')''')
-        conn.commit()
+        migrations.run_migrations(conn)
 
 def bootstrap_admin():
     """Crea forzatamente l'utente Admin e approva l'IP locale"""
@@ -76,9 +211,15 @@ def bootstrap_admin():
             print(f"ADMIN USER {admin_user} CREATED.")
         else:
             user_id = exists[0]
-            # Assicura che sia Admin e Resetta Password
-            hashed = bcrypt.hashpw(admin_pass.encode('utf-8'), bcrypt.gensalt())
-            c.execute("UPDATE users SET role='ADMIN', password_hash=? WHERE id=?", (hashed, user_id))
+            # Assicura che sia Admin; rehash only if the env password changed
+            c.execute("SELECT role, password_hash FROM users WHERE id = ?", (user_id,))
+            role, stored = c.fetchone()
+            if role != 'ADMIN':
+                c.execute("UPDATE users SET role='ADMIN' WHERE id=?", (user_id,))
+            if not stored or not bcrypt.checkpw(admin_pass.encode('utf-8'), stored):
+                hashed = bcrypt.hashpw(admin_pass.encode('utf-8'), bcrypt.gensalt())
+                c.execute("UPDATE users SET password_hash=? WHERE id=?", (hashed, user_id))
+                print(f"ADMIN USER {admin_user} PASSWORD RESET FROM ENVIRONMENT.")
             conn.commit()
 
         # Whitelist IP Locale
@@ -92,72 +233,244 @@ def bootstrap_admin():
 
 # --- DATA ACCESS ---
 
-def load_data(table, user_id):
+# Per-user tables a snapshot can contain
+USER_TABLES = ("assets", "liabilities", "cashflow", "routine", "history_snapshots",
+               "career_skills", "career_wins", "goals")
+
+_schema_cache = {}
+
+def table_schema(conn, table):
+    """Returns {column: declared_type} for a table (cached per process)."""
+    if table not in _schema_cache:
+        rows = conn.execute(f"PRAGMA table_info({table})").fetchall()
+        _schema_cache[table] = {r[1]: (r[2] or "").upper() for r in rows}
+    return _schema_cache[table]
+
+def _apply_schema_types(df, schema):
+    for col, decl in schema.items():
+        if col not in df.columns:
+            continue
+        if "INT" in decl:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+        elif "REAL" in decl:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    return df
+
+def load_user_snapshot(user_id, tables=USER_TABLES, use_cache=True):
+    """
+    Loads several per-user tables in one connection and one read transaction.
+    Returns {table: DataFrame} typed from the table schema, so every page of a
+    rerun sees the same consistent view of the data.
+    The user's data_version is read in the same transaction and synced into the
+    result cache; tables already cached for that version skip SQLite.
+    """
+    unknown = [t for t in tables if t not in USER_TABLES]
+    if unknown:
+        raise ValueError(f"Unknown user tables: {unknown}")
+
+    snapshot = {}
     with db_connection() as conn:
+        conn.execute("BEGIN")
         try:
-            df = pd.read_sql(f"SELECT * FROM {table} WHERE user_id = ?", conn, params=(user_id,))
-        except:
-            df = pd.DataFrame()
+            if use_cache:
+                row = conn.execute(q.DATA_VERSION, (user_id,)).fetchone()
+                version = cache_manager.results.sync(user_id, row[0] if row else 0)
+                for table in tables:
+                    df = cache_manager.results.get(user_id, table)
+                    if df is not None:
+                        snapshot[table] = df
+            missing = [t for t in tables if t not in snapshot]
+            for table in missing:
+                schema = table_schema(conn, table)
+                df = pd.read_sql(q.USER_ROWS.format(table=table, order=q.USER_ROWS_ORDER.get(table, "")), conn, params=(user_id,))
+                snapshot[table] = _apply_schema_types(df, schema)
+        finally:
+            conn.rollback()
+
+    if use_cache:
+        for table in missing:
+            cache_manager.results.put(user_id, table, snapshot[table], version=version)
+    return snapshot
+
+def load_data(table, user_id):
+    try:
+        return load_user_snapshot(user_id, (table,))[table]
+    except Exception:
+        return pd.DataFrame()
+
+def _sql_value(v):
+    if v is None or (not isinstance(v, (str, bytes)) and pd.isna(v)):
+        return None
+    return v.item() if hasattr(v, "item") else v
+
+def _normalize_for_db(df, schema):
+    """Coerces editor values to what SQLite stores, so unchanged cells compare equal."""
+    df = _apply_schema_types(df.copy(), schema)
+    for col, decl in schema.items():
+        if col in df.columns and "INT" not in decl and "REAL" not in decl and "BLOB" not in decl:
+            df[col] = df[col].astype(object).map(lambda v: None if _sql_value(v) is None else (v if isinstance(v, str) else str(v)))
     return df
 
-def save_editor_changes(df_new, table_name, user_id):
-    if df_new.empty:
-        return
-    df_new['user_id'] = user_id
+def _rows(df, cols):
+    return [tuple(_sql_value(v) for v in row) for row in df[cols].itertuples(index=False, name=None)]
+
+def save_editor_changes(df_new, table_name, user_id, derived=()):
+    """
+    Applies an edited DataFrame as a diff against the stored rows (matched by `id`):
+    new rows are inserted, changed rows updated, missing rows deleted, all in one
+    transaction. `derived` names the columns the caller computed (e.g. market_value):
+    they are dropped quietly; any other column unknown to the table is reported and ignored.
+    An empty frame deletes every stored row. Returns {'inserted': n, 'updated': n,
+    'deleted': n}; a failed save is rolled back and the error re-raised.
+    """
+    if table_name not in USER_TABLES:
+        raise ValueError(f"Unknown user table: {table_name}")
     try:
         with db_connection() as conn:
+            schema = table_schema(conn, table_name)
+            unexpected = [c for c in df_new.columns if c not in schema and c not in derived]
+            if unexpected:
+                print(f"save_editor_changes({table_name}): ignoring unexpected columns {unexpected}")
+            cols = [c for c in df_new.columns if c in schema and c not in ("id", "user_id")]
+
+            new = _normalize_for_db(df_new[[c for c in df_new.columns if c in schema]], schema)
+            new["user_id"] = user_id
+            if "id" not in new.columns:
+                new["id"] = pd.NA
+            old = _normalize_for_db(pd.read_sql(q.USER_ROWS.format(table=table_name, order=""), conn, params=(user_id,)), schema)
+
+            old_ids = set(old["id"].dropna().tolist())
+            is_existing = new["id"].isin(old_ids).fillna(False).astype(bool)
+            to_insert = new[~is_existing]
+            kept = new[is_existing].drop_duplicates("id").set_index("id")
+            deleted_ids = sorted(old_ids - set(kept.index.tolist()))
+
+            # Cell-by-cell comparison of the rows present on both sides
+            changed_ids = []
+            if not kept.empty and cols:
+                before = old.set_index("id").loc[kept.index, cols]
+                after = kept[cols]
+                same = (before == after).fillna(False) | (before.isna() & after.isna())
+                changed_ids = after.index[~same.all(axis=1).to_numpy()].tolist()
+
             conn.execute("BEGIN TRANSACTION")
-            conn.execute(f"DELETE FROM {table_name} WHERE user_id = ?", (user_id,))
-            df_new.to_sql(table_name, conn, if_exists='append', index=False)
+            if deleted_ids:
+                conn.executemany(q.EDITOR_DELETE.format(table=table_name),
+                                 [(_sql_value(i), user_id) for i in deleted_ids])
+            if changed_ids:
+                sets = ", ".join(f"{c} = ?" for c in cols)
+                upd = kept.loc[changed_ids, cols].reset_index()
+                conn.executemany(q.EDITOR_UPDATE.format(table=table_name, sets=sets),
+                                 [r[1:] + (r[0], user_id) for r in _rows(upd, ["id"] + cols)])
+            if not to_insert.empty:
+                ins_cols = ["user_id"] + cols
+                conn.executemany(f"INSERT INTO {table_name} ({', '.join(ins_cols)}) VALUES ({', '.join('?' * len(ins_cols))})",
+                                 _rows(to_insert, ins_cols))
             conn.execute("COMMIT")
+
+        counts = {"inserted": len(to_insert), "updated": len(changed_ids), "deleted": len(deleted_ids)}
+        if any(counts.values()):
+            if table_name in SNAPSHOT_SOURCES:
+                record_snapshot(user_id)
+            cache_manager.bump_version(user_id)
     except Exception as e:
         print(f"Error saving changes: {e}")
+        raise
+    return counts
 
 def update_asset_prices(user_id):
+    """
+    Refreshes the user's prices without a download on the calling thread: quotes
+    still fresh in the shared cache are copied to this user's assets now, stale
+    tickers are queued for the price worker (which fans out to every holder).
+    Returns (tickers copied, tickers queued).
+    """
+    import price_service  # price_service imports this module
+
+    service = price_service.get_service()
+    tickers = service.tracked_tickers(user_id)
+    if not tickers:
+        return 0, 0
+    stale = set(service.stale_tickers(tickers))
+    fresh = [t for t in tickers if t not in stale]
+    service.fan_out(fresh, user_id)
+    return len(fresh), len(service.request_sync(stale))
+
+# --- NET WORTH SNAPSHOTS ---
+# Tables whose writes change net worth
+SNAPSHOT_SOURCES = ("assets", "liabilities")
+SNAPSHOT_DAILY_DAYS = int(os.getenv("KAIROS_SNAPSHOT_DAILY_DAYS", "90"))
+SNAPSHOT_WEEKLY_DAYS = int(os.getenv("KAIROS_SNAPSHOT_WEEKLY_DAYS", "730"))
+
+def record_snapshot(user_id, day=None):
+    """
+    Upserts today's net worth row for the user (at most one row per day).
+    Values are stored in the pivot currency (EUR), converted with the cached FX rates.
+    When a held currency has no rate yet the snapshot is skipped (the day keeps
+    its last complete row) and the rate is queued for the FX worker.
+    The first snapshot of a day also compacts the user's older history.
+    Returns True when a new day row was created.
+    """
+    import fx_service
+
+    day = day or datetime.now().strftime("%Y-%m-%d")
     with db_connection() as conn:
-        df = pd.read_sql("SELECT * FROM assets WHERE user_id = ?", conn, params=(user_id,))
-    
-    if df.empty or 'ticker' not in df.columns:
-        return 0
-    valid_tkr = df[df['ticker'].notna() & (df['ticker'].astype(str).str.strip() != "")]
-    if valid_tkr.empty:
-        return 0
-    
-    tkrs = " ".join(valid_tkr['ticker'].unique())
-    updates = []
-    try:
-        data = yf.download(tkrs, period="1d", group_by='ticker', threads=True)
-        for _, row in valid_tkr.iterrows():
-            t = row['ticker']
-            p = None
-            try:
-                if len(valid_tkr['ticker'].unique()) == 1:
-                    if 'Close' in data.columns:
-                        p = data['Close'].iloc[-1]
-                else:
-                    if t in data.columns.levels[0]:
-                        p = data['Close'][t].iloc[-1]
-                
-                if p is not None and pd.notna(p):
-                    if isinstance(p, pd.Series):
-                        p = p.iloc[0]
-                    updates.append((float(p), row['id'], user_id))
-            except:
-                continue
-            
-        if updates:
-            with db_connection() as conn:
-                conn.executemany("UPDATE assets SET current_price = ? WHERE id = ? AND user_id = ?", updates)
-                conn.commit()
-        return len(updates)
-    except:
-        return 0
+        by_cur = conn.execute(q.SNAPSHOT_ASSETS, (user_id,)).fetchall()
+        rates = fx_service.get_service().rates([c for c, _ in by_cur]) if by_cur else {}
+        missing = sorted(c for c, v in by_cur if c not in rates and v)
+        if missing:
+            # A partial total would be stored as a real drop in net worth
+            print(f"Snapshot skipped for user {user_id}: no FX rate for {', '.join(missing)}")
+            return False
+        tot_a = sum(v * rates[c] for c, v in by_cur if c in rates)
+        tot_l = conn.execute(q.SNAPSHOT_LIABILITIES, (user_id,)).fetchone()[0]
+        is_new = conn.execute(q.SNAPSHOT_DAY, (user_id, day)).fetchone() is None
+        conn.execute('''INSERT INTO history_snapshots (user_id, date, total_assets, total_liabilities, net_worth, granularity)
+                        VALUES (?, ?, ?, ?, ?, 'D')
+                        ON CONFLICT(user_id, date) DO UPDATE SET total_assets = excluded.total_assets,
+                            total_liabilities = excluded.total_liabilities, net_worth = excluded.net_worth''',
+                     (user_id, day, tot_a, tot_l, tot_a - tot_l))
+        conn.commit()
+    if is_new:
+        compact_snapshots(user_id, today=datetime.strptime(day, "%Y-%m-%d"))
+    return is_new
+
+# Period of a snapshot date: its week's Monday (weeks that cross a new year stay whole) and its month's 1st
+WEEK_START_SQL = "date(date, 'weekday 0', '-6 days')"
+MONTH_START_SQL = "date(date, 'start of month')"
+
+def _rollup(conn, user_id, cutoff, period_sql, from_levels, to_level):
+    # Keep the last row of each period (net worth is a stock, not a flow)
+    levels = ",".join("?" * len(from_levels))
+    params = (cutoff, *from_levels) + ((user_id,) if user_id is not None else ())
+    user_filter = " AND user_id = ?" if user_id is not None else ""
+    conn.execute(f'''DELETE FROM history_snapshots WHERE id IN (
+                        SELECT id FROM (
+                            SELECT id, ROW_NUMBER() OVER (PARTITION BY user_id, {period_sql} ORDER BY date DESC) AS rn
+                            FROM history_snapshots WHERE date < ? AND granularity IN ({levels}){user_filter}
+                        ) WHERE rn > 1)''', params)
+    conn.execute(f"UPDATE history_snapshots SET granularity = '{to_level}' WHERE date < ? AND granularity IN ({levels}){user_filter}", params)
+
+def compact_snapshots(user_id=None, today=None, daily_days=SNAPSHOT_DAILY_DAYS, weekly_days=SNAPSHOT_WEEKLY_DAYS):
+    """
+    Rolls daily rows older than `daily_days` into weekly rows and rows older
+    than `weekly_days` into monthly rows. Cutoffs are aligned to week/month
+    starts so a period is never split. user_id=None compacts everyone.
+    """
+    today = today or datetime.now()
+    week_cut = today - timedelta(days=daily_days)
+    week_cut -= timedelta(days=week_cut.weekday())
+    month_cut = (today - timedelta(days=weekly_days)).replace(day=1)
+    with db_connection() as conn:
+        _rollup(conn, user_id, week_cut.strftime("%Y-%m-%d"), WEEK_START_SQL, ("D",), "W")
+        _rollup(conn, user_id, month_cut.strftime("%Y-%m-%d"), MONTH_START_SQL, ("D", "W"), "M")
+        conn.commit()
 
 # --- USER MANAGEMENT HELPERS ---
 def get_user_credentials(username):
     with db_connection() as conn:
         c = conn.cursor()
-        c.execute("SELECT id, password_hash, role FROM users WHERE username = ?", (username,))
+        c.execute(q.USER_CREDENTIALS, (username,))
         row = c.fetchone()
     return row
 
@@ -169,70 +482,193 @@ def register_user(username, hashed_password):
         conn.commit()
     return uid
 
+# --- DEVICE ALLOWLIST (indexed per-user lookups, write-behind last_used) ---
+_last_used = ip_allowlist.LastUsedBuffer()
+
+def flush_ip_last_used():
+    """Writes buffered last_used touches in one transaction. Returns the rows written."""
+    rows = _last_used.drain()
+    if not rows:
+        return 0
+    try:
+        with db_connection() as conn:
+            conn.executemany(q.IP_TOUCH, rows)
+            conn.commit()
+    except Exception:
+        _last_used.requeue(rows)
+        raise
+    _last_used.stats["flushed"] += len(rows)
+    return len(rows)
+
+def start_ip_flusher(interval=ip_allowlist.IP_FLUSH_INTERVAL):
+    _last_used.start(flush_ip_last_used, interval)
+
+atexit.register(lambda: _last_used.pending() and flush_ip_last_used())
+
 def register_ip(user_id, ip_address, status='PENDING'):
     with db_connection() as conn:
-        c = conn.cursor()
-        c.execute("INSERT INTO allowed_ips (user_id, ip_address, device_name, status, last_used) VALUES (?, ?, ?, ?, ?)", 
-                  (user_id, ip_address, "Unknown Device", status, datetime.now()))
+        conn.execute("INSERT INTO allowed_ips (user_id, ip_address, device_name, status, last_used) VALUES (?, ?, ?, ?, ?)", 
+                     (user_id, ip_address, "Unknown Device", status, datetime.now()))
         conn.commit()
 
 def check_ip_status(user_id, ip_address):
+    # Read on every login (idx_allowed_ips_user_ip): approvals, rejections and deleted
+    # users made by any process apply at once
     with db_connection() as conn:
-        c = conn.cursor()
-        c.execute("SELECT status FROM allowed_ips WHERE user_id = ? AND ip_address = ?", (user_id, ip_address))
-        row = c.fetchone()
-    return row
+        row = conn.execute(q.IP_STATUS, (user_id, ip_address)).fetchone()
+    return (row[1],) if row else None
 
 def update_ip_last_used(user_id, ip_address):
-    with db_connection() as conn:
-        conn.execute("UPDATE allowed_ips SET last_used = ? WHERE user_id = ? AND ip_address = ?", (datetime.now(), user_id, ip_address))
-        conn.commit()
+    if ip_allowlist.IP_FLUSH_INTERVAL <= 0:
+        with db_connection() as conn:
+            conn.execute(q.IP_TOUCH, (datetime.now(), user_id, ip_address))
+            conn.commit()
+        return
+    _last_used.touch(user_id, ip_address, datetime.now())
 
 def count_ips(user_id):
     with db_connection() as conn:
-        c = conn.cursor()
-        c.execute("SELECT count(*) FROM allowed_ips WHERE user_id = ?", (user_id,))
-        count = c.fetchone()[0]
-    return count
+        return conn.execute(q.IP_COUNT, (user_id,)).fetchone()[0]
 
 def log_victory(user_id, description, impact):
      with db_connection() as conn:
         conn.execute("INSERT INTO career_wins (user_id, date, description, impact) VALUES (?, ?, ?, ?)", (user_id, datetime.now().strftime("%Y-%m-%d"), description, impact))
         conn.commit()
+     cache_manager.bump_version(user_id)
 
 def get_pending_ips():
     with db_connection() as conn:
-        return pd.read_sql("""
-            SELECT allowed_ips.id, users.username, allowed_ips.ip_address, allowed_ips.device_name, allowed_ips.last_used
-            FROM allowed_ips
-            JOIN users ON allowed_ips.user_id = users.id
-            WHERE allowed_ips.status = 'PENDING'
-        """, conn)
+        return pd.read_sql(q.PENDING_IPS.format(search="", after="", limit=""), conn)
 
 def update_ip_approval(ip_id, status):
-    with db_connection() as conn:
-        conn.execute("UPDATE allowed_ips SET status=? WHERE id=?", (status, ip_id))
-        conn.commit()
+    set_ip_status_bulk([ip_id], status)
 
 def approve_all_pending_ips():
     with db_connection() as conn:
-        conn.execute("UPDATE allowed_ips SET status='APPROVED' WHERE status='PENDING'")
+        conn.execute(q.APPROVE_ALL_PENDING)
         conn.commit()
 
 def get_all_users_view():
     with db_connection() as conn:
         return pd.read_sql("SELECT id, username, role, created_at FROM users ORDER BY id ASC", conn)
 
-def admin_reset_password(user_id, hashed):
+def get_base_currency(user_id):
+    with db_connection() as conn:
+        row = conn.execute(q.BASE_CURRENCY, (user_id,)).fetchone()
+    return (row[0] if row and row[0] else "EUR")
+
+def set_base_currency(user_id, currency):
+    with db_connection() as conn:
+        conn.execute("UPDATE users SET base_currency = ?, data_version = data_version + 1 WHERE id = ?", (currency, user_id))
+        conn.commit()
+    cache_manager.bump_version(user_id)
+
+def update_password_hash(user_id, hashed):
     with db_connection() as conn:
         conn.execute("UPDATE users SET password_hash=? WHERE id=?", (hashed, user_id))
         conn.commit()
 
+def admin_reset_password(user_id, hashed):
+    update_password_hash(user_id, hashed)
+
 def admin_delete_user(user_id):
+    admin_delete_users([user_id])
+
+# --- ADMIN: PAGED LISTS + BULK ACTIONS ---
+# Pages are keyset-paginated on (sort column, id): each page is one index seek of
+# `limit` rows, wherever it sits in the list. Sort columns are indexed (migration 009).
+ADMIN_PAGE_SIZE = int(os.getenv("KAIROS_ADMIN_PAGE_SIZE", "50"))
+USER_SORT_COLUMNS = q.USER_SORT_COLUMNS
+# Tables purged with a user
+USER_OWNED_TABLES = ("allowed_ips", "assets", "liabilities", "cashflow")
+
+def _prefix_range(prefix):
+    # [prefix, prefix + max code point): a range seek on the column's index, unlike LIKE 'x%'
+    return prefix, prefix + "\U0010ffff"
+
+def page_users(search="", sort="id", descending=False, after=None, limit=ADMIN_PAGE_SIZE):
+    """
+    One page of the user list. search is a username prefix (case-sensitive);
+    after is the cursor returned with the previous page (None = first page).
+    Returns (DataFrame with id, username, role, created_at; next cursor or None).
+    """
+    if sort not in USER_SORT_COLUMNS:
+        raise ValueError(f"Unknown sort column: {sort}")
+    search_params = list(_prefix_range(search)) if search else []
+
+    def fetch(conn, step, params, n):
+        return pd.read_sql(q.users_page(sort, descending, step, bool(search)), conn, params=params + search_params + [n])
+
+    with db_connection() as conn:
+        if after is None:
+            df = fetch(conn, "first", [], limit + 1)
+        else:
+            # Rest of the cursor's sort value, then the following values: two index seeks,
+            # so low-cardinality columns (role) never re-read the rows already paged
+            df = fetch(conn, "tie", list(after[1:]) if sort == "id" else list(after), limit + 1)
+            if len(df) <= limit and sort != "id":
+                df = pd.concat([df, fetch(conn, "after", [after[0]], limit + 1 - len(df))], ignore_index=True)
+    cursor = None
+    if len(df) > limit:
+        df = df.iloc[:limit]
+        key = df["sort_key"].iloc[-1]
+        cursor = (key.item() if hasattr(key, "item") else key, int(df["id"].iloc[-1]))
+    return df.drop(columns="sort_key"), cursor
+
+def count_users(search=""):
     with db_connection() as conn:
-         conn.execute("DELETE FROM users WHERE id=?", (user_id,))
-         conn.execute("DELETE FROM allowed_ips WHERE user_id=?", (user_id,))
-         conn.execute("DELETE FROM assets WHERE user_id=?", (user_id,))
-         conn.execute("DELETE FROM liabilities WHERE user_id=?", (user_id,))
-         conn.execute("DELETE FROM cashflow WHERE user_id=?", (user_id,))
-         conn.commit()
+        if search:
+            return conn.execute(q.USERS_COUNT.format(search=q.USERNAME_PREFIX), _prefix_range(search)).fetchone()[0]
+        # Kept by the fleet triggers: no table count
+        row = conn.execute(q.USERS_COUNTER).fetchone()
+        return row[0] if row else conn.execute(q.USERS_COUNT.format(search="")).fetchone()[0]
+
+def page_pending_ips(search="", after=None, limit=ADMIN_PAGE_SIZE):
+    """
+    One page of the security queue in request order. search is an IP prefix;
+    after is the last id of the previous page. Returns (DataFrame, next cursor or None).
+    """
+    params = list(_prefix_range(search)) if search else []
+    if after is not None:
+        params.append(after)
+    with db_connection() as conn:
+        df = pd.read_sql(q.pending_ips_page(bool(search), after is not None), conn, params=params + [limit + 1])
+    cursor = None
+    if len(df) > limit:
+        df = df.iloc[:limit]
+        cursor = int(df["id"].iloc[-1])
+    return df, cursor
+
+def count_pending_ips(search=""):
+    with db_connection() as conn:
+        return conn.execute(q.PENDING_IPS_COUNT.format(search=q.IP_PREFIX if search else ""),
+                            _prefix_range(search) if search else ()).fetchone()[0]
+
+def set_ip_status_bulk(ip_ids, status):
+    """Sets the status of every listed device in one transaction. Returns the rows updated."""
+    ids = [int(i) for i in ip_ids]
+    if not ids:
+        return 0
+    with db_connection() as conn:
+        n = conn.executemany(q.SET_IP_STATUS, [(status, i) for i in ids]).rowcount
+        conn.commit()
+    return n
+
+def admin_reset_passwords(hashes):
+    """Writes each user's new password hash ({user_id: hash}) in one transaction."""
+    with db_connection() as conn:
+        conn.executemany("UPDATE users SET password_hash=? WHERE id=?", [(h, int(i)) for i, h in hashes.items()])
+        conn.commit()
+
+def admin_delete_users(user_ids):
+    """Purges the listed users and their devices, assets, liabilities and cashflow in one transaction."""
+    ids = [(int(i),) for i in user_ids]
+    if not ids:
+        return
+    with db_connection() as conn:
+        conn.executemany("DELETE FROM users WHERE id=?", ids)
+        for table in USER_OWNED_TABLES:
+            conn.executemany(q.DELETE_USER_ROWS.format(table=table), ids)
+        conn.commit()
+    for (i,) in ids:
+        cache_manager.bump_version(i)
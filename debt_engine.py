@@ -0,0 +1,124 @@
+"""
+Payoff schedules for all of a user's liabilities at once: balances, interest and
+payments as debts x months matrices, with avalanche / snowball strategies and
+extra-payment what-ifs.
+"""
+import numpy as np
+import pandas as pd
+
+import cache_manager
+import networth_engine
+
+SCHEDULE_MONTHS = 360
+DEBT_STRATEGIES = ("minimum", "avalanche", "snowball")
+PAID_OFF = 0.005  # balances under half a cent count as repaid
+
+
+def payoff_schedule(balance, payment, annual_rate_pct, strategy="minimum", extra=0.0, months=SCHEDULE_MONTHS):
+    """
+    Month-by-month payoff of every debt. balance/payment/annual_rate_pct have one
+    entry per debt; `extra` is a scalar or one value per what-if scenario, in
+    which case every result gains a leading scenario axis.
+    - minimum: each debt gets its own monthly payment until repaid (closed form,
+      the same amortization as networth_engine); extra is not used
+    - avalanche / snowball: the monthly budget (every payment plus extra) stays
+      the same; what the minimums leave, including payments freed by repaid
+      debts, goes to the highest rate / smallest starting balance first
+    Returns a dict:
+      balances (debts, months + 1), column 0 is today
+      interest, payments (debts, months)
+      payoff_month (debts,): first month at zero, inf if not repaid in `months`
+      total_interest, debt_free_month (inf if not debt-free in `months`)
+    """
+    if strategy not in DEBT_STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy!r}, expected one of {DEBT_STRATEGIES}")
+    b = np.nan_to_num(np.atleast_1d(np.asarray(balance, dtype=float)))
+    p = np.nan_to_num(np.atleast_1d(np.asarray(payment, dtype=float)))
+    r = np.nan_to_num(np.atleast_1d(np.asarray(annual_rate_pct, dtype=float))) / 1200
+    extras = np.atleast_1d(np.asarray(extra, dtype=float))
+    n_scen, n_debts = len(extras), len(b)
+
+    if strategy == "minimum":
+        k = np.arange(months + 1, dtype=float)
+        bal = networth_engine.loan_balance(b[:, None], p[:, None], r[:, None] * 1200, k[None, :])
+        bal[bal < PAID_OFF] = 0.0
+        interest = bal[:, :-1] * r[:, None]
+        balances = np.broadcast_to(bal, (n_scen,) + bal.shape)
+        interest = np.broadcast_to(interest, balances.shape[:-1] + (months,))
+        payments = np.broadcast_to(bal[:, :-1] + interest[0] - bal[:, 1:], interest.shape)
+    else:
+        # Work in priority order so one cumsum spreads the leftover budget down the list
+        order = np.argsort(-r if strategy == "avalanche" else b, kind="stable")
+        b, p, r = b[order], p[order], r[order]
+        budget = p.sum() + extras
+        # Month-major buffers: each step writes one contiguous (scenarios, debts) block
+        bal_m = np.zeros((months + 1, n_scen, n_debts))
+        int_m = np.zeros((months, n_scen, n_debts))
+        pay_m = np.zeros((months, n_scen, n_debts))
+        bal = np.broadcast_to(b, (n_scen, n_debts)).copy()
+        bal[bal < PAID_OFF] = 0.0
+        bal_m[0] = bal
+        for m in range(months):
+            if not bal.any():
+                break
+            interest = bal * r
+            due = bal + interest
+            pay = np.minimum(p, due)
+            rest = due - pay
+            left = budget - pay.sum(axis=-1)
+            pay += np.clip(left[:, None] - (np.cumsum(rest, axis=-1) - rest), 0.0, rest)
+            bal = due - pay
+            bal[bal < PAID_OFF] = 0.0
+            int_m[m], pay_m[m], bal_m[m + 1] = interest, pay, bal
+        inv = np.argsort(order)
+        balances = bal_m.transpose(1, 2, 0)[:, inv]
+        interest = int_m.transpose(1, 2, 0)[:, inv]
+        payments = pay_m.transpose(1, 2, 0)[:, inv]
+
+    repaid = balances == 0
+    payoff = np.where(repaid.any(axis=-1), np.argmax(repaid, axis=-1), np.inf)
+    out = {
+        "balances": balances,
+        "interest": interest,
+        "payments": payments,
+        "payoff_month": payoff,
+        "total_interest": interest.sum(axis=(-2, -1)),
+        "debt_free_month": payoff.max(axis=-1, initial=0.0),
+    }
+    if np.ndim(extra) == 0:
+        out = {k: v[0] for k, v in out.items()}
+    return out
+
+
+def month_label(months, start=None):
+    """'MMM YYYY' of `months` after start (default today), 'NEVER' for inf."""
+    if not np.isfinite(months):
+        return "NEVER"
+    return (pd.Timestamp(start or pd.Timestamp.now()) + pd.DateOffset(months=int(months))).strftime("%b %Y").upper()
+
+
+def debt_plan(df_l, strategy="minimum", extra=0.0, months=SCHEDULE_MONTHS, scale=1.0):
+    """
+    payoff_schedule for a liabilities DataFrame. `scale` converts balances and
+    payments (e.g. the FX factor of the pivot currency); extra is already in
+    the converted currency. Adds a per-debt summary under "debts" with name,
+    category, balance, rate, payment, payoff_month, payoff_date and interest.
+    """
+    df_l = df_l if df_l is not None else pd.DataFrame()
+    num = lambda col: (pd.to_numeric(df_l[col], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+                       if col in df_l.columns else np.zeros(len(df_l)))
+    bal, pay, rate = num("remaining_balance") * scale, num("monthly_payment") * scale, num("interest_rate")
+    plan = payoff_schedule(bal, pay, rate, strategy, extra, months)
+    if np.ndim(extra) == 0:
+        text = lambda col: df_l[col].fillna("").astype(str).to_numpy() if col in df_l.columns else np.full(len(df_l), "")
+        plan["debts"] = pd.DataFrame({
+            "name": text("name"), "category": text("category"), "balance": bal, "rate": rate, "payment": pay,
+            "payoff_month": plan["payoff_month"], "payoff_date": [month_label(m) for m in plan["payoff_month"]],
+            "interest": plan["interest"].sum(axis=-1)})
+    return plan
+
+
+def cached_plan(user_id, df_l, strategy="minimum", extra=0.0, months=SCHEDULE_MONTHS, fx_key="", scale=1.0):
+    """debt_plan through the per-user result cache; liability edits bump the user's version."""
+    key = f"debts:{strategy}:{float(extra):.2f}:{months}:{fx_key}"
+    return cache_manager.results.get_or_compute(user_id, key, lambda: debt_plan(df_l, strategy, extra, months, scale))
@@ -1,60 +1,514 @@
 
+import hashlib
+import os
+import threading
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
-def predict_future_nw(history_df, months_ahead=[6, 12, 24]):
+import networth_engine
+
+# Annual (expected return, volatility) per asset category, used by the Monte Carlo engine
+CATEGORY_RETURN_ASSUMPTIONS = {
+    "Stocks": (0.07, 0.18),
+    "ETF": (0.065, 0.15),
+    "Bonds": (0.03, 0.06),
+    "Crypto": (0.15, 0.70),
+    "Real Estate": (0.04, 0.10),
+    "Commodities": (0.03, 0.15),
+    "Cash": (0.01, 0.005),
+}
+DEFAULT_RETURN_ASSUMPTION = (0.05, 0.12)
+CATEGORY_CORRELATION = 0.3
+MC_CHUNK_PATHS = 5000
+
+# --- FORECAST MODELS ---
+# Every model fits net worth against days since the first point of the series:
+#   ols        straight line, prediction intervals from the t distribution
+#   holt       Holt's linear trend (exponential smoothing) on a daily grid
+#   loglinear  constant growth rate (OLS on log net worth, positive series only)
+# The model with the lowest rolling-origin backtest error is used. Fits are kept
+# per key and updated with only the new points while the older ones are unchanged.
+FORECAST_MODELS = ("ols", "holt", "loglinear")
+FORECAST_LEVEL_Z = 1.959964  # 95% prediction intervals
+DAYS_PER_MONTH = 365.25 / 12
+BACKTEST_ORIGINS = 5
+BACKTEST_MIN_POINTS = 10
+BACKTEST_REFRESH = 30  # new points before the model is re-selected and Holt re-tuned
+HOLT_ALPHAS = np.array([0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 0.9])
+HOLT_BETAS = np.array([0.01, 0.03, 0.1, 0.2, 0.4])
+FORECAST_CACHE_SIZE = 1024
+
+_forecast_cache = OrderedDict()
+_forecast_lock = threading.Lock()
+
+
+def _t_quantile(df, z=FORECAST_LEVEL_Z):
+    """Student t quantile matching the normal quantile z (Cornish-Fisher expansion)."""
+    df = np.maximum(np.asarray(df, dtype=float), 1.0)
+    return z + (z ** 3 + z) / (4 * df) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+
+def _series(history_df):
+    """(days, net_worth) sorted by date, one point per day (the last one wins)."""
+    if history_df is None or history_df.empty:
+        return np.array([], dtype="datetime64[D]"), np.array([])
+    d = pd.to_datetime(history_df['date'], errors='coerce').to_numpy(dtype="datetime64[D]")
+    y = pd.to_numeric(history_df['net_worth'], errors='coerce').to_numpy(dtype=float)
+    ok = ~(np.isnat(d) | np.isnan(y))
+    d, y = d[ok], y[ok]
+    order = np.argsort(d, kind="stable")
+    d, y = d[order], y[order]
+    last = np.r_[d[1:] != d[:-1], True]
+    return d[last], y[last]
+
+# --- OLS (sufficient statistics) ---
+def _ols_stats(x, y):
+    return np.array([len(x), x.sum(), y.sum(), x @ x, x @ y, y @ y], dtype=float)
+
+def _ols_solve(s):
+    """(intercept, slope, residual variance, mean x, centered Sxx, n) from summed statistics."""
+    n, sx, sy, sxx, sxy, syy = s
+    xbar, ybar = sx / n, sy / n
+    cxx, cxy, cyy = sxx - n * xbar ** 2, sxy - n * xbar * ybar, syy - n * ybar ** 2
+    b = cxy / cxx if cxx > 0 else 0.0
+    s2 = max(cyy - b * cxy, 0.0) / (n - 2) if n > 2 else 0.0
+    return ybar - b * xbar, b, s2, xbar, cxx, n
+
+def _ols_predict(fit, x0):
+    a, b, s2, xbar, cxx, n = fit
+    mean = a + b * x0
+    lever = (x0 - xbar) ** 2 / cxx if cxx > 0 else 0.0
+    half = _t_quantile(n - 2) * np.sqrt(s2 * (1 + 1 / n + lever))
+    return mean, mean - half, mean + half
+
+# --- HOLT ---
+def _daily_grid(x, y, x_from=0.0, y_from=None):
+    """Linear interpolation of (x, y) onto whole days after x_from (or from it when y_from is None)."""
+    first = x_from if y_from is None else x_from + 1
+    grid = np.arange(first, x[-1] + 1)
+    if y_from is not None:
+        x, y = np.r_[x_from, x], np.r_[y_from, y]
+    return np.interp(grid, x, y)
+
+def _holt_run(y, alpha, beta, level, trend, record=False):
     """
-    Performs Linear Regression on Net Worth history.
-    Returns a dictionary: {month_offset: predicted_value}
+    Runs the Holt recursion over y for every (alpha, beta) pair at once.
+    Returns (level, trend, sse, levels, trends); levels/trends are per step when record=True.
     """
-    if history_df.empty or len(history_df) < 2:
-        return {m: None for m in months_ahead}, 0
-    
-    # Prepare data
-    # We convert dates to ordinal numbers for regression
-    try:
-        df = history_df.copy()
-        df['date'] = pd.to_datetime(df['date'])
-        df['ordinal'] = df['date'].map(datetime.toordinal)
-        x = df['ordinal'].values
-        y = df['net_worth'].values
-        
-        # Fit Line (y = mx + c)
-        slope, intercept = np.polyfit(x, y, 1)
-        
-        predictions = {}
-        last_date = df['date'].max()
-        
-        for m in months_ahead:
-            future_date = last_date + pd.DateOffset(months=m)
-            future_ordinal = future_date.toordinal()
-            pred = slope * future_ordinal + intercept
-            predictions[m] = pred
-            
-        return predictions, slope # Return slope to know daily growth rate
-    except Exception as e:
-        print(f"Forecast Error: {e}")
+    alpha, beta = np.asarray(alpha, dtype=float), np.asarray(beta, dtype=float)
+    level = np.broadcast_to(np.asarray(level, dtype=float), alpha.shape).copy()
+    trend = np.broadcast_to(np.asarray(trend, dtype=float), alpha.shape).copy()
+    sse = np.zeros(alpha.shape)
+    levels = np.empty((len(y),) + alpha.shape) if record else None
+    trends = np.empty((len(y),) + alpha.shape) if record else None
+    for t, obs in enumerate(y):
+        f = level + trend
+        sse += (obs - f) ** 2
+        new_level = alpha * obs + (1 - alpha) * f
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        level = new_level
+        if record:
+            levels[t], trends[t] = level, trend
+    return level, trend, sse, levels, trends
+
+def _holt_predict(h, fit):
+    """Forecast h days ahead; variance grows by alpha^2 (1 + j beta)^2 per step."""
+    h = np.asarray(h, dtype=float)
+    mean = fit["level"] + h * fit["trend"]
+    k = np.maximum(h - 1, 0)
+    a, b = fit["alpha"], fit["beta"]
+    steps = k + 2 * b * k * (k + 1) / 2 + b ** 2 * k * (k + 1) * (2 * k + 1) / 6
+    s2 = fit["sse"] / max(fit["n"] - 2, 1)
+    half = _t_quantile(fit["n"] - 2) * np.sqrt(s2 * (1 + a ** 2 * steps))
+    return mean, mean - half, mean + half
+
+def _holt_tune(y, cutoff):
+    """Grid search of (alpha, beta) by one-step SSE over the first `cutoff` days."""
+    aa, bb = np.meshgrid(HOLT_ALPHAS, HOLT_BETAS, indexing="ij")
+    trend0 = y[1] - y[0] if len(y) > 1 else 0.0
+    _, _, sse, _, _ = _holt_run(y[1:max(cutoff, 2)], aa.ravel(), bb.ravel(), y[0], trend0)
+    best = int(np.argmin(sse))
+    return float(aa.ravel()[best]), float(bb.ravel()[best]), trend0
+
+# --- BACKTEST ---
+def backtest_models(x, y, origins=BACKTEST_ORIGINS):
+    """
+    Rolling-origin evaluation: each model is fitted on the points up to an
+    origin and scored on the next ~20% of the series; origins run from 50% to
+    90% of it. Returns ({model: mean absolute error}, holt parameters).
+    OLS and log-linear prefix fits come from cumulative sums in one pass,
+    Holt states at every day from one recorded run.
+    """
+    n = len(x)
+    idx = np.unique((np.linspace(0.5, 0.9, origins) * n).astype(int) - 1)
+    idx = idx[(idx >= 2) & (idx < n - 1)]
+    span = max(1, n // 5)
+    grid = _daily_grid(x, y)
+    alpha, beta, trend0 = _holt_tune(grid, int(x[idx[0]]) + 1 if len(idx) else len(grid))
+    _, _, _, levels, trends = _holt_run(grid[1:], alpha, beta, grid[0], trend0, record=True)
+    levels, trends = np.r_[grid[0], levels], np.r_[trend0, trends]
+
+    positive = bool(np.all(y > 0))
+    ly = np.log(y) if positive else None
+    cum = np.cumsum(np.column_stack([np.ones(n), x, y, x * x, x * y, y * y]), axis=0)
+    lcum = np.cumsum(np.column_stack([np.ones(n), x, ly, x * x, x * ly, ly * ly]), axis=0) if positive else None
+
+    errors = {m: [] for m in FORECAST_MODELS}
+    for o in idx:
+        test = slice(o + 1, min(n, o + 1 + span))
+        xt, yt = x[test], y[test]
+        errors["ols"].append(np.abs(_ols_predict(_ols_solve(cum[o]), xt)[0] - yt).mean())
+        g = int(x[o])
+        errors["holt"].append(np.abs(levels[g] + (xt - g) * trends[g] - yt).mean())
+        if positive:
+            errors["loglinear"].append(np.abs(np.exp(_ols_predict(_ols_solve(lcum[o]), xt)[0]) - yt).mean())
+    scores = {m: float(np.mean(e)) if e else float("inf") for m, e in errors.items()}
+    return scores, (alpha, beta, trend0)
+
+# --- FIT / UPDATE ---
+def _digest(d, y):
+    """Fingerprint of every (day, value) point a state was fitted on."""
+    return hashlib.blake2b(d.tobytes() + y.tobytes(), digest_size=16).digest()
+
+def _fit_full(d, y):
+    x = (d - d[0]).astype(float)
+    state = {"d0": d[0], "last_day": d[-1], "n": len(d), "y_last": y[-1], "digest": _digest(d, y),
+             "ols": _ols_stats(x, y), "log": _ols_stats(x, np.log(y)) if np.all(y > 0) else None}
+    grid = _daily_grid(x, y)
+    if len(d) >= BACKTEST_MIN_POINTS:
+        scores, (alpha, beta, trend0) = backtest_models(x, y)
+    else:
+        scores, (alpha, beta, trend0) = {"ols": 0.0}, _holt_tune(grid, len(grid))
+    level, trend, sse, _, _ = _holt_run(grid[1:], alpha, beta, grid[0], trend0)
+    state["holt"] = {"alpha": alpha, "beta": beta, "level": float(level), "trend": float(trend),
+                     "sse": float(sse), "n": len(grid)}
+    state["scores"] = scores
+    state["model"] = min(scores, key=scores.get)
+    state["tuned_n"] = len(d)
+    return state
+
+def _fit_update(state, d, y):
+    """Adds points after state['last_day'] to a fitted state without touching older ones."""
+    x = (d - state["d0"]).astype(float)
+    state = dict(state, holt=dict(state["holt"]))
+    state["ols"] = state["ols"] + _ols_stats(x, y)
+    if state["log"] is not None:
+        state["log"] = state["log"] + _ols_stats(x, np.log(y)) if np.all(y > 0) else None
+    x_last = float((state["last_day"] - state["d0"]).astype(float))
+    h = state["holt"]
+    grid = _daily_grid(x, y, x_last, state["y_last"])
+    level, trend, sse, _, _ = _holt_run(grid, h["alpha"], h["beta"], h["level"], h["trend"])
+    h.update(level=float(level), trend=float(trend), sse=h["sse"] + float(sse), n=h["n"] + len(grid))
+    state.update(last_day=d[-1], n=state["n"] + len(d), y_last=y[-1])
+    if state["log"] is None and state["model"] == "loglinear":
+        state["model"] = "ols"
+    return state
+
+def fit_forecast(history_df, key=None):
+    """
+    Fitted forecast state for a net worth series (columns date, net_worth),
+    or None with fewer than 2 points. With a `key` the state is cached and,
+    when the series only gained points after the last fitted day, updated
+    incrementally; every BACKTEST_REFRESH new points the model is re-selected.
+    Any change to an already fitted point (a revised or removed row) refits.
+    The series should only grow at its end (e.g. completed-day snapshots):
+    a window that slides refits on every call.
+    """
+    d, y = _series(history_df)
+    if len(d) < 2:
+        return None
+    with _forecast_lock:
+        state = _forecast_cache.get(key) if key is not None else None
+    if state is not None:
+        upto = np.searchsorted(d, state["last_day"], side="right")
+        same_prefix = upto == state["n"] and _digest(d[:upto], y[:upto]) == state["digest"]
+        if not same_prefix or len(d) - state["tuned_n"] >= BACKTEST_REFRESH:
+            state = None
+        elif upto < len(d):
+            state = _fit_update(state, d[upto:], y[upto:])
+            state["digest"] = _digest(d, y)
+    if state is None:
+        state = _fit_full(d, y)
+    if key is not None:
+        with _forecast_lock:
+            _forecast_cache[key] = state
+            _forecast_cache.move_to_end(key)
+            while len(_forecast_cache) > FORECAST_CACHE_SIZE:
+                _forecast_cache.popitem(last=False)
+    return state
+
+def forecast_nw(history_df, months_ahead=(6, 12, 24), key=None, model=None, scale=1.0):
+    """
+    Net worth forecast with 95% prediction intervals.
+    Returns None with fewer than 2 points, else a dict: model, scores
+    (backtest MAE per model), months, mean, lower, upper (arrays, one per
+    horizon, counted from the last point) and slope (net worth per day at the end).
+    `scale` converts the output (e.g. pivot -> base currency) so the cached
+    fit does not depend on exchange rates.
+    """
+    state = fit_forecast(history_df, key)
+    if state is None:
+        return None
+    model = model or state["model"]
+    months = np.asarray(months_ahead, dtype=float)
+    x_last = float((state["last_day"] - state["d0"]).astype(float))
+    x0 = x_last + months * DAYS_PER_MONTH
+    if model == "holt":
+        mean, lo, hi = _holt_predict(months * DAYS_PER_MONTH, state["holt"])
+        slope = state["holt"]["trend"]
+    elif model == "loglinear" and state["log"] is not None:
+        fit = _ols_solve(state["log"])
+        mean, lo, hi = (np.exp(v) for v in _ols_predict(fit, x0))
+        slope = fit[1] * np.exp(fit[0] + fit[1] * x_last)
+    else:
+        model = "ols"
+        fit = _ols_solve(state["ols"])
+        mean, lo, hi = _ols_predict(fit, x0)
+        slope = fit[1]
+    return {"model": model, "scores": state["scores"], "months": months, "mean": mean * scale,
+            "lower": lo * scale, "upper": hi * scale, "slope": float(slope) * scale}
+
+def predict_future_nw(history_df, months_ahead=[6, 12, 24], key=None):
+    """
+    Net worth forecast from the history with the backtest-selected model.
+    Returns a dictionary: {month_offset: predicted_value} and the daily slope.
+    """
+    fc = forecast_nw(history_df, months_ahead, key)
+    if fc is None:
         return {m: None for m in months_ahead}, 0
+    return {m: float(v) for m, v in zip(months_ahead, fc["mean"])}, fc["slope"]
+
+# --- TIME TO TARGET ---
+# Assets compound at the real monthly rate g = 1 + (return - inflation)/1200 and
+# receive the monthly contribution c after growth, like project_wealth:
+#   A(m) = g^m A0 + c (g^m - 1) / (g - 1)        (A0 + c m when g == 1)
+# Without debts A(m) = T solves in closed form: m = ln((T + K) / (A0 + K)) / ln g
+# with K = c / (g - 1). Liabilities amortize on their own schedule
+# (networth_engine.loan_balance) and are deflated by inflation; net worth is
+# then solved by a yearly scan plus bisection over whole months, run on every
+# input at once.
+MAX_TARGET_MONTHS = 1200
+TARGET_SCAN_MONTHS = 12
+
+def stack_liabilities(frames):
+    """
+    Pads the liabilities DataFrames of several users (or what-if rows) into
+    (balance, payment, annual_rate_pct) arrays of shape (len(frames), max debts),
+    the `liabilities` argument of solve_time_to_target. Missing debts are zero.
+    """
+    width = max([len(df) for df in frames if df is not None] + [1])
+    out = np.zeros((3, len(frames), width))
+    for i, df in enumerate(frames):
+        if df is None or df.empty:
+            continue
+        for j, col in enumerate(("remaining_balance", "monthly_payment", "interest_rate")):
+            out[j, i, :len(df)] = pd.to_numeric(df[col], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+    return out[0], out[1], out[2]
+
+def _assets_at(a0, c, g, m):
+    growth = np.power(g, m)
+    step = np.where(g == 1.0, m, (growth - 1.0) / np.where(g == 1.0, 1.0, g - 1.0))
+    return growth * a0 + c * step
+
+def solve_time_to_target(assets, monthly_contrib, target=1000000, annual_return=0.0, inflation=0.0,
+                         liabilities=None, max_months=MAX_TARGET_MONTHS, debt_schedule=None):
+    """
+    Months until net worth reaches `target` (in today's money).
+    assets, monthly_contrib, target, annual_return and inflation (annual %)
+    broadcast together: one entry per user or per what-if combination.
+    liabilities: optional (balance, payment, annual_rate_pct) arrays whose last
+    axis lists the debts (see stack_liabilities); the other axes broadcast
+    with the inputs. Debts are subtracted as they amortize.
+    debt_schedule: alternatively, total nominal debt by month (column 0 = today,
+    e.g. a debt_engine payoff plan), shared by every input; the last value
+    carries on past its end.
+    Returns a float array: fractional months from the closed form without
+    liabilities, whole months with them (the first month at or above target); 0 when already reached
+    and inf when not reached within max_months.
+    """
+    a0, c, target, ret, infl = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in
+                                                     (assets, monthly_contrib, target, annual_return, inflation)))
+    g = 1.0 + (ret - infl) / 1200.0
+
+    if liabilities is None and debt_schedule is None:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            k = c / (g - 1.0)
+            months = np.where(g == 1.0, (target - a0) / c, np.log((target + k) / (a0 + k)) / np.log(g))
+        months = np.where(np.isfinite(months) & (months >= 0), months, np.inf)
+        months = np.where(months > max_months, np.inf, months)
+        return np.where(a0 >= target, 0.0, months)
+
+    deflate = 1.0 + infl / 1200.0
+    if debt_schedule is not None:
+        path = np.asarray(debt_schedule, dtype=float)
+        debt_at = lambda m: path[np.minimum(m, len(path) - 1).astype(int)]
+        debt_shape = ()
+    else:
+        bal, pay, rate = (np.asarray(v, dtype=float) for v in liabilities)
+        debt_at = lambda m: networth_engine.loan_balance(bal, pay, rate, m[..., None]).sum(axis=-1)
+        debt_shape = bal.shape[:-1]
+
+    def gap(m):
+        return _assets_at(a0, c, g, m) - debt_at(m) / np.power(deflate, m) - target
+
+    # Yearly scan brackets the first crossing (debts whose payment does not
+    # cover the interest can pull net worth back under the target later on),
+    # then bisection narrows the bracket to the month
+    shape = np.broadcast_shapes(a0.shape, debt_shape)
+    grid = np.append(np.arange(0, max_months, TARGET_SCAN_MONTHS), max_months).astype(float)
+    above = gap(np.broadcast_to(grid.reshape((-1,) + (1,) * len(shape)), grid.shape + shape)) >= 0
+    first = np.argmax(above, axis=0)
+    reached = above[0]
+    never = ~above.any(axis=0)
+    hi = grid[first]
+    lo = grid[np.maximum(first - 1, 0)]
+    # Invariant: gap(lo) < 0 <= gap(hi)
+    while np.any(hi - lo > 1):
+        mid = np.floor((lo + hi) / 2)
+        ok = gap(mid) >= 0
+        hi = np.where(ok, mid, hi)
+        lo = np.where(ok, lo, mid)
+    return np.where(reached, 0.0, np.where(never, np.inf, hi))
 
 def calculate_time_to_target(current_nw, monthly_saving, target=1000000, growth_rate_annual=0.0):
     """
-    Calculates months to reach target.
-    If growth_rate is 0, assumes linear accumulation.
+    Months to reach target for a single user; growth_rate_annual in %.
+    See solve_time_to_target for debts, inflation and array inputs.
     """
-    if current_nw >= target:
-        return 0
-    
-    if monthly_saving <= 0:
-        return float('inf') # Never reach if we don't save or burn cash
-    
-    # Simple calculation: (Target - Current) / Monthly
-    # Ignoring compound interest on assets for this specific 'Velocity' metric unless specified.
-    # User said "based on current savings rate". Let's assume linear for simplicity (Cashflow adds to NW).
-    
-    needed = target - current_nw
-    months = needed / monthly_saving
-    return months
+    return float(solve_time_to_target(current_nw, monthly_saving, target, growth_rate_annual))
+
+def project_wealth(start, contrib, rates, inflation=0.0, months=120):
+    """
+    Vectorized compound projection for any number of scenarios at once.
+    - start: starting wealth (scalar or one per scenario)
+    - contrib: monthly contribution, scalar or schedule of length `months`
+      (or shape (scenarios, months) for per-scenario schedules)
+    - rates: annual returns in % (one per scenario), inflation: annual %
+    Each month grows by the real monthly rate, then adds the contribution.
+    Returns an array of shape (scenarios, months + 1); column 0 is `start`.
+    """
+    rates = np.atleast_1d(np.asarray(rates, dtype=float))
+    n = rates.shape[0]
+    g = 1.0 + (rates - inflation) / 100.0 / 12.0
+    w0 = np.broadcast_to(np.asarray(start, dtype=float), (n,))
+    c = np.broadcast_to(np.asarray(contrib, dtype=float), (n, months)) if months else np.zeros((n, 0))
+
+    out = np.empty((n, months + 1))
+    out[:, 0] = w0
+    if months == 0:
+        return out
+
+    if np.all(g > 0.5):
+        # W_m = g^m * (W_0 + sum_{k<=m} c_k * g^-k)
+        k = np.arange(1, months + 1)
+        growth = g[:, None] ** k
+        out[:, 1:] = growth * (w0[:, None] + np.cumsum(c / growth, axis=1))
+    else:
+        # Extreme negative rates make g^-k overflow: fall back to the recurrence
+        for m in range(months):
+            out[:, m + 1] = out[:, m] * g + c[:, m]
+    return out
+
+def portfolio_return_params(df_assets, assumptions=CATEGORY_RETURN_ASSUMPTIONS, correlation=CATEGORY_CORRELATION):
+    """
+    Annual (expected return, volatility) of the user's asset mix.
+    Categories are weighted by market value and share a constant correlation.
+    """
+    if df_assets is None or df_assets.empty:
+        return DEFAULT_RETURN_ASSUMPTION
+    values = (df_assets['quantity'] * df_assets['current_price']).groupby(df_assets['category']).sum()
+    values = values[values > 0]
+    if values.empty:
+        return DEFAULT_RETURN_ASSUMPTION
+
+    w = (values / values.sum()).to_numpy()
+    params = np.array([assumptions.get(cat, DEFAULT_RETURN_ASSUMPTION) for cat in values.index])
+    mu, vol = params[:, 0], params[:, 1]
+    corr = np.full((len(w), len(w)), correlation)
+    np.fill_diagonal(corr, 1.0)
+    cov = corr * np.outer(vol, vol)
+    return float(w @ mu), float(np.sqrt(w @ cov @ w))
+
+def _simulate_chunk(seed_seq, n_paths, start, contrib, log_mu, log_sigma, step, target):
+    """Simulates one block of paths. Returns (recorded wealth, first month hitting target)."""
+    rng = np.random.default_rng(seed_seq)
+    months = contrib.shape[0]
+    # float32 halves memory traffic; precision is far below the model's own noise
+    shocks = rng.standard_normal((n_paths, months), dtype=np.float32)
+    shocks *= np.float32(log_sigma)
+    shocks += np.float32(log_mu)
+    growth = np.exp(np.cumsum(shocks, axis=1, out=shocks), out=shocks)
+    # W_m = G_m * (W_0 + sum_{k<=m} c_k / G_k), with G the cumulative growth
+    wealth = np.cumsum(contrib.astype(np.float32) / growth, axis=1)
+    wealth += np.float32(start)
+    wealth *= growth
+
+    first_hit = np.full(n_paths, -1, dtype=np.int32)
+    if target is not None:
+        if start >= target:
+            first_hit[:] = 0
+        else:
+            reached = wealth >= target
+            hit_any = reached.any(axis=1)
+            first_hit[hit_any] = reached[hit_any].argmax(axis=1) + 1
+
+    recorded = np.empty((n_paths, months // step + 1), dtype=np.float32)
+    recorded[:, 0] = start
+    recorded[:, 1:] = wealth[:, step - 1::step]
+    return recorded, first_hit
+
+def simulate_wealth_paths(start, monthly_contrib, mu, sigma, months, n_paths=10000, inflation=0.0,
+                          target=None, seed=None, workers=1, step=1, percentiles=(5, 50, 95)):
+    """
+    Monte Carlo projection of wealth over `months` with lognormal monthly returns.
+    - mu, sigma: annual expected return / volatility (fractions, e.g. 0.07)
+    - monthly_contrib: scalar or per-month schedule, inflation in % like project_wealth
+    - step: record every `step` months (bands have months // step + 1 points)
+    Paths are generated in fixed blocks with independent seeds spawned from `seed`,
+    so results are identical whatever the number of `workers` (process pool).
+    Returns a dict with 'months', one band per percentile ('p5', 'p50', ...),
+    'prob_target' (probability of reaching target within the horizon) and
+    'prob_by_month' (same probability at every recorded month).
+    """
+    if months % step:
+        raise ValueError("months must be a multiple of step")
+    contrib = np.broadcast_to(np.asarray(monthly_contrib, dtype=float), (months,)).copy()
+
+    # Annual arithmetic mean/vol -> monthly real log-return parameters
+    log_var = np.log1p(sigma ** 2 / (1 + mu) ** 2)
+    log_mu = (np.log1p(mu) - log_var / 2 - np.log1p(inflation / 100)) / 12
+    log_sigma = np.sqrt(log_var / 12)
+
+    sizes = [MC_CHUNK_PATHS] * (n_paths // MC_CHUNK_PATHS)
+    if n_paths % MC_CHUNK_PATHS:
+        sizes.append(n_paths % MC_CHUNK_PATHS)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(sq, n, float(start), contrib, log_mu, log_sigma, step, target) for sq, n in zip(seeds, sizes)]
+
+    if workers and workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            results = list(pool.map(_simulate_chunk, *zip(*jobs)))
+    else:
+        results = [_simulate_chunk(*job) for job in jobs]
+
+    recorded = np.concatenate([r[0] for r in results])
+    first_hit = np.concatenate([r[1] for r in results])
+
+    out = {"months": np.arange(0, months + 1, step)}
+    bands = np.percentile(recorded, percentiles, axis=0)
+    for p, band in zip(percentiles, bands):
+        out[f"p{p}"] = band
+
+    hits = first_hit[first_hit >= 0]
+    hit_counts = np.bincount(hits, minlength=months + 1)
+    prob_by_month = np.cumsum(hit_counts) / n_paths
+    out["prob_by_month"] = prob_by_month[::step]
+    out["prob_target"] = float(prob_by_month[-1]) if target is not None else None
+    return out
+
+def default_workers():
+    return max(1, (os.cpu_count() or 1) - 1)
 
 def analyze_trajectory(history_df):
     """
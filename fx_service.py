@@ -0,0 +1,273 @@
+import csv
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import database_manager as dbm
+import queries as q
+
+
+# Every rate is stored as units of the pivot per 1 unit of the currency
+PIVOT_CURRENCY = "EUR"
+CURRENCIES = ["EUR", "USD", "GBP", "CHF", "BTC", "ETH"]
+CRYPTO_CURRENCIES = ("BTC", "ETH")
+CURRENCY_SYMBOLS = {"EUR": "€", "USD": "$", "GBP": "£", "CHF": "CHF", "BTC": "₿", "ETH": "Ξ"}
+
+FX_TTL_SECONDS = float(os.getenv("KAIROS_FX_TTL", "3600"))
+FX_SYNC_INTERVAL = float(os.getenv("KAIROS_FX_SYNC_INTERVAL", "3600"))
+# A currency the provider did not answer is not asked for again before this (doubling per miss, up to the TTL)
+FX_MISS_BACKOFF = float(os.getenv("KAIROS_FX_MISS_BACKOFF", "60"))
+FX_PROVIDER = os.getenv("KAIROS_FX_PROVIDER", "yahoo")
+
+
+def symbol(currency):
+    return CURRENCY_SYMBOLS.get(currency, currency)
+
+
+# --- PROVIDERS ---
+class YahooFxProvider:
+    """Last close of <CUR><PIVOT>=X (fiat) or <CUR>-<PIVOT> (crypto) from Yahoo Finance."""
+    name = "yahoo"
+
+    def fetch(self, currencies):
+        import yfinance as yf
+
+        tickers = {(f"{c}-{PIVOT_CURRENCY}" if c in CRYPTO_CURRENCIES else f"{c}{PIVOT_CURRENCY}=X"): c for c in currencies}
+        data = yf.download(" ".join(tickers), period="5d", group_by="ticker", threads=True, progress=False)
+        rates = {}
+        if data is None or data.empty:
+            return rates
+        multi = isinstance(data.columns, pd.MultiIndex)
+        for t, cur in tickers.items():
+            try:
+                close = (data[t]["Close"] if multi else data["Close"]).dropna()
+            except KeyError:
+                continue
+            if not close.empty:
+                rates[cur] = float(close.iloc[-1])
+        return rates
+
+
+class CsvFxProvider:
+    """
+    Local fixture feed for offline runs and tests.
+    CSV columns: currency, rate (units of the pivot per 1 unit). Re-read on every fetch.
+    """
+    name = "csv"
+
+    def __init__(self, path):
+        self.path = path
+
+    def fetch(self, currencies):
+        wanted = set(currencies)
+        rates = {}
+        with open(self.path, newline="") as f:
+            for row in csv.DictReader(f):
+                c = (row.get("currency") or "").strip().upper()
+                if c in wanted and row.get("rate"):
+                    rates[c] = float(row["rate"])
+        return rates
+
+
+def provider_from_env(spec=FX_PROVIDER):
+    """'yahoo' or 'csv:/path/to/rates.csv'"""
+    if spec.startswith("csv:"):
+        return CsvFxProvider(spec[4:])
+    return YahooFxProvider()
+
+
+# --- SERVICE ---
+class FxService:
+    """
+    Rates to the pivot currency, cached in memory and in the `fx_rates` table
+    with a TTL. Request paths only read the caches: a rate never seen is
+    queued for the background worker, which also refreshes the currencies in
+    use. Currencies the provider did not answer back off before the next try.
+    An expired rate is still served when the provider fails.
+    """
+
+    def __init__(self, provider=None, ttl=FX_TTL_SECONDS, miss_backoff=FX_MISS_BACKOFF):
+        self.provider = provider or provider_from_env()
+        self.ttl = ttl
+        self.miss_backoff = miss_backoff
+        self._rates = {PIVOT_CURRENCY: (1.0, float("inf"))}  # currency -> (rate, expires_at)
+        self._misses = {}  # currency -> (retry_at, backoff)
+        self._requested = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._interval = 0.0
+        self.version = 0  # bumped whenever a rate changes, for cache keys
+        self.stats = {"fetches": 0, "failures": 0, "db_loads": 0, "requested": 0, "backed_off": 0}
+
+    def _load_db(self, currencies):
+        with dbm.db_connection() as conn:
+            rows = conn.execute(q.FX_RATES.format(marks=q.marks(len(currencies))), tuple(currencies)).fetchall()
+        self.stats["db_loads"] += 1
+        with self._lock:
+            for cur, rate, expires in rows:
+                if self._rates.get(cur, (None,))[0] != rate:
+                    self.version += 1
+                self._rates[cur] = (rate, expires)
+
+    def _backing_off(self, currency, now):
+        return self._misses.get(currency, (0, 0))[0] > now
+
+    def _missed(self, currencies, now):
+        with self._lock:
+            for c in currencies:
+                backoff = min(self._misses[c][1] * 2, self.ttl) if c in self._misses else self.miss_backoff
+                self._misses[c] = (now + backoff, backoff)
+
+    def refresh(self, currencies, force=False):
+        """Fetches expired or unknown rates (not those backing off after a miss). Returns the currencies updated."""
+        now = time.time()
+        with self._lock:
+            todo = sorted(c for c in set(currencies) if c != PIVOT_CURRENCY
+                          and (force or (self._rates.get(c, (None, 0))[1] <= now and not self._backing_off(c, now))))
+        if not todo:
+            return []
+        self.stats["fetches"] += 1
+        try:
+            fetched = self.provider.fetch(todo)
+        except Exception as e:
+            self.stats["failures"] += 1
+            print(f"FX fetch failed ({self.provider.name}): {e}")
+            fetched = {}
+        self._missed([c for c in todo if c not in fetched], now)
+        if not fetched:
+            return []
+        rows = [(c, r, now, now + self.ttl) for c, r in fetched.items()]
+        with dbm.db_connection() as conn:
+            conn.executemany('''INSERT INTO fx_rates (currency, rate, fetched_at, expires_at) VALUES (?, ?, ?, ?)
+                                ON CONFLICT(currency) DO UPDATE SET rate = excluded.rate,
+                                    fetched_at = excluded.fetched_at, expires_at = excluded.expires_at''', rows)
+            conn.commit()
+        with self._lock:
+            for c, r, _, expires in rows:
+                self._rates[c] = (r, expires)
+                self._misses.pop(c, None)
+            self.version += 1
+        return sorted(fetched)
+
+    def rates(self, currencies, request_missing=True):
+        """
+        {currency: units of pivot per unit}. Currencies without any known rate
+        are left out and, with request_missing, queued for the background worker.
+        """
+        currencies = {c for c in currencies if isinstance(c, str) and c}
+        with self._lock:
+            unknown = [c for c in currencies if c not in self._rates]
+        if unknown:
+            self._load_db(unknown)
+            with self._lock:
+                unknown = [c for c in unknown if c not in self._rates]
+            if unknown and request_missing:
+                self.request(unknown)
+        with self._lock:
+            return {c: self._rates[c][0] for c in currencies if c in self._rates}
+
+    def factors(self, currencies, base, request_missing=True):
+        """
+        {currency: multiplier to `base`} for every requested currency (plus the
+        pivot, which liabilities and cashflow are recorded in). NaN where no rate is known.
+        """
+        wanted = {c.strip().upper() for c in currencies if isinstance(c, str) and c.strip()} | {PIVOT_CURRENCY, base}
+        rates = self.rates(wanted, request_missing)
+        base_rate = rates.get(base, np.nan)
+        return {c: rates.get(c, np.nan) / base_rate for c in wanted}
+
+    def base_factors(self, currencies, base, request_missing=True):
+        """factors() for `base`, falling back to the pivot when `base` itself has no rate. Returns (base, factors)."""
+        f = self.factors(currencies, base, request_missing)
+        if np.isnan(f[PIVOT_CURRENCY]):
+            print(f"No FX rate for base currency {base}, reporting in {PIVOT_CURRENCY}")
+            return PIVOT_CURRENCY, self.factors(currencies, PIVOT_CURRENCY, request_missing)
+        return base, f
+
+    # --- BACKGROUND WORKER ---
+    def currencies_in_use(self):
+        with dbm.db_connection() as conn:
+            used = {r[0] for r in conn.execute("SELECT DISTINCT currency FROM assets WHERE currency IS NOT NULL")}
+            used |= {r[0] for r in conn.execute("SELECT DISTINCT base_currency FROM users WHERE base_currency IS NOT NULL")}
+        return sorted(c.strip().upper() for c in used if c and c.strip())
+
+    def request(self, currencies):
+        """
+        Queues currencies for the background worker (started on demand if the
+        periodic refresh is off) and returns at once. Returns the currencies queued.
+        """
+        now = time.time()
+        with self._lock:
+            todo = sorted(c for c in set(currencies) if c != PIVOT_CURRENCY and not self._backing_off(c, now))
+            self.stats["backed_off"] += len(set(currencies)) - len(todo)
+            if not todo:
+                return []
+            self._requested.update(todo)
+            self.stats["requested"] += len(todo)
+        self._start_thread()
+        self._wake.set()
+        return todo
+
+    def _loop(self):
+        next_full = time.monotonic()
+        while not self._stop.is_set():
+            self._wake.clear()
+            with self._lock:
+                requested, self._requested = sorted(self._requested), set()
+            try:
+                if requested:
+                    self.refresh(requested)
+                if self._interval > 0 and time.monotonic() >= next_full:
+                    self.refresh(self.currencies_in_use())
+                    next_full = time.monotonic() + self._interval
+            except Exception as e:
+                print(f"FX sync error: {e}")
+            self._wake.wait(max(0.0, next_full - time.monotonic()) if self._interval > 0 else None)
+
+    def _start_thread(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="kairos-fx-sync", daemon=True)
+            self._thread.start()
+
+    def start(self, interval=FX_SYNC_INTERVAL):
+        """Starts the periodic refresh every `interval` seconds (<= 0: requested currencies only)."""
+        if interval <= 0:
+            return
+        self._interval = interval
+        self._start_thread()
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+
+def conversion_factors(currency_column, factors):
+    """
+    Vectorized join of a currency column against {currency: factor}.
+    Empty currencies are taken as the pivot (legacy rows); unknown ones give NaN.
+    """
+    # Normalize and look up the few distinct codes, then broadcast back by position
+    codes, uniques = pd.factorize(pd.Series(currency_column, copy=False).astype(object), use_na_sentinel=True)
+    keys = pd.Series(uniques, dtype=object).astype(str).str.strip().str.upper().replace("", PIVOT_CURRENCY)
+    lookup = np.append(keys.map(factors).to_numpy(dtype=float, na_value=np.nan), factors.get(PIVOT_CURRENCY, np.nan))
+    return lookup[codes]  # code -1 (missing) picks the pivot slot
+
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = FxService()
+        return _service
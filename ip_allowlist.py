@@ -0,0 +1,60 @@
+import os
+import threading
+
+
+IP_FLUSH_INTERVAL = float(os.getenv("KAIROS_IP_FLUSH_INTERVAL", "30"))
+
+
+class LastUsedBuffer:
+    """
+    Write-behind `last_used` for the login path. Device statuses are always
+    read from `allowed_ips` (one indexed lookup per login); only the touch is
+    deferred: touches are buffered per (user_id, ip) and written in one batch
+    by flush().
+    """
+
+    def __init__(self):
+        self._touched = {}   # (user_id, ip) -> last_used
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"touches": 0, "flushed": 0}
+
+    def touch(self, user_id, ip, when):
+        with self._lock:
+            self._touched[(user_id, ip)] = when
+            self.stats["touches"] += 1
+
+    def drain(self):
+        """Pending touches as (last_used, user_id, ip) rows; the buffer is emptied."""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        return [(when, uid, ip) for (uid, ip), when in touched.items()]
+
+    def requeue(self, rows):
+        """Puts back rows whose flush failed, keeping any newer touch."""
+        with self._lock:
+            for when, uid, ip in rows:
+                self._touched.setdefault((uid, ip), when)
+
+    def pending(self):
+        with self._lock:
+            return len(self._touched)
+
+    # --- BACKGROUND FLUSHER ---
+    def _loop(self, flush, interval):
+        while not self._stop.wait(interval):
+            try:
+                flush()
+            except Exception as e:
+                print(f"IP last_used flush error: {e}")
+
+    def start(self, flush, interval=IP_FLUSH_INTERVAL):
+        if interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(flush, interval), name="kairos-ip-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
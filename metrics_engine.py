@@ -0,0 +1,26 @@
+import cashflow_engine as cfe
+import fx_service as fx
+import portfolio_engine as pe
+
+
+def compute_metrics(snapshot, portfolio=None, fx_factors=None, currency=fx.PIVOT_CURRENCY):
+    """
+    Headline figures for one user from a load_user_snapshot() dict
+    (needs assets, liabilities, cashflow). No UI dependencies, so the
+    app and the batch report job share it. Pass an analyze_portfolio()
+    result to avoid recomputing it, and fx_factors to report in `currency`
+    (liabilities and cashflow are recorded in the pivot currency).
+    """
+    df_l = snapshot["liabilities"]
+    
+    pf = (portfolio or pe.analyze_portfolio(snapshot["assets"], fx_factors))["totals"]
+    pivot = fx_factors.get(fx.PIVOT_CURRENCY, 1.0) if fx_factors else 1.0
+    tot_a = pf["market_value"]
+    tot_l = (df_l['remaining_balance'].sum() if not df_l.empty else 0.0) * pivot
+    nw = tot_a - tot_l
+    
+    cf = cfe.summarize_cashflow(snapshot["cashflow"])
+    
+    return {"net_worth": nw, "assets": tot_a, "liabilities": tot_l, "cashflow": cf["net"] * pivot, "freedom_index": cf["freedom_index"],
+            "cost_basis": pf["cost_basis"], "unrealized_pnl": pf["unrealized_pnl"], "return_pct": pf["return_pct"],
+            "currency": currency, "missing_fx": pf["missing_fx"]}
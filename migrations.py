@@ -0,0 +1,323 @@
+"""
+Versioned schema migrations for the Kairos SQLite store.
+Each migration runs once, in order, inside its own transaction and is
+recorded in `schema_version`. Every step is idempotent so databases created
+by the old ad-hoc init_db/migrate_db upgrade cleanly.
+
+    python migrations.py            # apply pending migrations
+    python migrations.py --check    # fail if a hot query falls back to a SCAN
+"""
+import sys
+from datetime import datetime
+
+import queries as q
+
+
+def _columns(conn, table):
+    return {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+
+def _add_column(conn, table, column, ddl):
+    if column not in _columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+# --- MIGRATIONS ---
+def m001_baseline_tables(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, username TEXT UNIQUE, password_hash BLOB, created_at TIMESTAMP, role TEXT DEFAULT 'USER')''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS allowed_ips (id INTEGER PRIMARY KEY, user_id INTEGER, ip_address TEXT, device_name TEXT, status TEXT, last_used TIMESTAMP)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS assets (id INTEGER PRIMARY KEY, user_id INTEGER, name TEXT, category TEXT, ticker TEXT, quantity REAL, avg_price REAL, current_price REAL, currency TEXT DEFAULT 'EUR')''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS liabilities (id INTEGER PRIMARY KEY, user_id INTEGER, name TEXT, category TEXT, remaining_balance REAL, monthly_payment REAL, interest_rate REAL)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS cashflow (id INTEGER PRIMARY KEY, user_id INTEGER, type TEXT, category TEXT, name TEXT, amount REAL, frequency TEXT DEFAULT 'Monthly')''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS routine (id INTEGER PRIMARY KEY, user_id INTEGER, time_slot TEXT, monday TEXT, tuesday TEXT, wednesday TEXT, thursday TEXT, friday TEXT, saturday TEXT, sunday TEXT)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS history_snapshots (id INTEGER PRIMARY KEY, user_id INTEGER, date TEXT, total_assets REAL, total_liabilities REAL, net_worth REAL)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS career_skills (id INTEGER PRIMARY KEY, user_id INTEGER, skill_name TEXT, current_level INTEGER, target_level INTEGER, category TEXT)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS career_wins (id INTEGER PRIMARY KEY, user_id INTEGER, date TEXT, description TEXT, impact TEXT)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS goals (id INTEGER PRIMARY KEY, user_id INTEGER, name TEXT, target_amount REAL, current_amount REAL, deadline TEXT, status TEXT DEFAULT 'ACTIVE')''')
+
+def m002_users_role(conn):
+    _add_column(conn, "users", "role", "TEXT DEFAULT 'USER'")
+
+def m003_history_daily_unique(conn):
+    _add_column(conn, "history_snapshots", "granularity", "TEXT DEFAULT 'D'")
+    # One snapshot per user per day: drop duplicates before the unique index
+    conn.execute('''DELETE FROM history_snapshots WHERE id NOT IN (SELECT MAX(id) FROM history_snapshots GROUP BY user_id, date)''')
+    conn.execute('''CREATE UNIQUE INDEX IF NOT EXISTS idx_history_user_date ON history_snapshots(user_id, date)''')
+
+def m004_prices_table(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS prices (ticker TEXT PRIMARY KEY, price REAL, currency TEXT, fetched_at REAL, expires_at REAL)''')
+
+def m005_access_pattern_indexes(conn):
+    # Per-user reads (snapshots, metrics, editors) and per-user deletes
+    for table in ("assets", "liabilities", "cashflow", "routine", "career_skills", "career_wins", "goals"):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_user ON {table}(user_id)")
+    # Login device check and device count
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_allowed_ips_user_ip ON allowed_ips(user_id, ip_address)")
+    # Security queue
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_allowed_ips_status ON allowed_ips(status)")
+    # Price fan-out matches on the trimmed ticker
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_assets_ticker ON assets(TRIM(ticker))")
+
+def m006_fx_rates(conn):
+    # Units of the pivot currency (EUR) per 1 unit of `currency`
+    conn.execute('''CREATE TABLE IF NOT EXISTS fx_rates (currency TEXT PRIMARY KEY, rate REAL, fetched_at REAL, expires_at REAL)''')
+    _add_column(conn, "users", "base_currency", "TEXT DEFAULT 'EUR'")
+
+def m007_price_history(conn):
+    # Clustered on (ticker, date): a ticker's range is one contiguous b-tree read
+    conn.execute('''CREATE TABLE IF NOT EXISTS price_history (ticker TEXT NOT NULL, date TEXT NOT NULL, close REAL,
+                    PRIMARY KEY (ticker, date)) WITHOUT ROWID''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS price_splits (ticker TEXT NOT NULL, date TEXT NOT NULL, ratio REAL,
+                    PRIMARY KEY (ticker, date)) WITHOUT ROWID''')
+    # Range already fetched per ticker; missing days inside it are known gaps
+    conn.execute('''CREATE TABLE IF NOT EXISTS price_history_coverage (ticker TEXT PRIMARY KEY, first_date TEXT, last_date TEXT, updated_at REAL)''')
+
+# Fleet-wide summaries kept current by triggers: every row written to a source
+# table adds (or, for OLD rows, subtracts) its contribution to one summary row.
+# {r} is NEW / OLD inside triggers and the source table in rebuild_fleet_summaries.
+FLEET_SUMMARIES = {
+    "assets": ("fleet_assets", {
+        "category": "COALESCE({r}.category, 'Uncategorized')",
+        "currency": "UPPER(TRIM(COALESCE(NULLIF(TRIM({r}.currency), ''), 'EUR')))",
+    }, {
+        "positions": "1",
+        "market_value": "COALESCE({r}.quantity * {r}.current_price, 0)",
+        "priced_positions": "({r}.avg_price IS NOT NULL)",
+        "priced_value": "CASE WHEN {r}.avg_price IS NOT NULL THEN COALESCE({r}.quantity * {r}.current_price, 0) ELSE 0 END",
+        "cost_basis": "COALESCE({r}.quantity * {r}.avg_price, 0)",
+    }),
+    "liabilities": ("fleet_liabilities", {
+        "category": "COALESCE({r}.category, 'Uncategorized')",
+    }, {
+        "debts": "1",
+        "balance": "COALESCE({r}.remaining_balance, 0)",
+        "payments": "COALESCE({r}.monthly_payment, 0)",
+        "rate_weighted": "COALESCE({r}.remaining_balance * {r}.interest_rate, 0)",
+    }),
+    "cashflow": ("fleet_cashflow", {
+        "type": "COALESCE({r}.type, '')",
+        "category": "COALESCE({r}.category, 'Uncategorized')",
+        "frequency": "COALESCE(TRIM({r}.frequency), '')",
+    }, {
+        "entries": "1",
+        "amount": "COALESCE({r}.amount, 0)",
+    }),
+}
+
+def _fleet_prune(summary, keys, values, key_sql):
+    # Drops a summary row once its count (first value column) is back to zero
+    return f"DELETE FROM {summary} WHERE {' AND '.join(f'{k} = {e}' for k, e in zip(keys, key_sql))} AND {next(iter(values))} = 0"
+
+def _fleet_delta(summary, keys, values, row, sign):
+    cols = list(keys) + list(values)
+    exprs = [e.format(r=row) for e in keys.values()] + [f"{sign}{e.format(r=row)}" for e in values.values()]
+    return (f"INSERT INTO {summary} ({', '.join(cols)}) VALUES ({', '.join(exprs)}) "
+            f"ON CONFLICT({', '.join(keys)}) DO UPDATE SET {', '.join(f'{c} = {c} + excluded.{c}' for c in values)};\n"
+            f"{_fleet_prune(summary, keys, values, [e.format(r=row) for e in keys.values()])};")
+
+def _fleet_user_delta(row, sign):
+    return (f"INSERT INTO fleet_users (user_id, row_count) SELECT {row}.user_id, {sign}1 WHERE {row}.user_id IS NOT NULL "
+            f"ON CONFLICT(user_id) DO UPDATE SET row_count = row_count + excluded.row_count;")
+
+FLEET_USERS_PRUNE = "DELETE FROM fleet_users WHERE user_id = {user_id}"
+
+def rebuild_fleet_summaries(conn):
+    """Recomputes every fleet summary from its source table with one GROUP BY each (caller commits)."""
+    for table, (summary, keys, values) in FLEET_SUMMARIES.items():
+        conn.execute(f"DELETE FROM {summary}")
+        key_sql = ", ".join(e.format(r=table) for e in keys.values())
+        val_sql = ", ".join(f"SUM({e.format(r=table)})" for e in values.values())
+        conn.execute(f"INSERT INTO {summary} ({', '.join(list(keys) + list(values))}) SELECT {key_sql}, {val_sql} FROM {table} GROUP BY {key_sql}")
+    conn.execute("DELETE FROM fleet_users")
+    conn.execute('''INSERT INTO fleet_users (user_id, row_count) SELECT user_id, COUNT(*) FROM
+                    (SELECT user_id FROM assets UNION ALL SELECT user_id FROM liabilities UNION ALL SELECT user_id FROM cashflow)
+                    WHERE user_id IS NOT NULL GROUP BY user_id''')
+    conn.execute("INSERT OR REPLACE INTO fleet_counters (name, value) VALUES ('active_users', (SELECT COUNT(*) FROM fleet_users))")
+    conn.execute("INSERT OR REPLACE INTO fleet_counters (name, value) VALUES ('users', (SELECT COUNT(*) FROM users))")
+
+def m008_fleet_summaries(conn):
+    for table, (summary, keys, values) in FLEET_SUMMARIES.items():
+        conn.execute(f'''CREATE TABLE IF NOT EXISTS {summary} ({', '.join(f'{k} TEXT NOT NULL' for k in keys)},
+                         {', '.join(f'{v} REAL NOT NULL DEFAULT 0' for v in values)}, PRIMARY KEY ({', '.join(keys)})) WITHOUT ROWID''')
+    # Users holding at least one asset, liability or cashflow row, and O(1) counters
+    conn.execute('''CREATE TABLE IF NOT EXISTS fleet_users (user_id INTEGER PRIMARY KEY, row_count INTEGER NOT NULL)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS fleet_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)''')
+
+    for table, (summary, keys, values) in FLEET_SUMMARIES.items():
+        watched = ", ".join(sorted({c for e in list(keys.values()) + list(values.values()) for c in _columns(conn, table) if f"{{r}}.{c}" in e}))
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {summary}_ins AFTER INSERT ON {table} BEGIN
+                         {_fleet_delta(summary, keys, values, "NEW", "")} {_fleet_user_delta("NEW", "")} END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {summary}_del AFTER DELETE ON {table} BEGIN
+                         {_fleet_delta(summary, keys, values, "OLD", "-")} {_fleet_user_delta("OLD", "-")} END''')
+        # Price fan-outs only touch current_price: the trigger skips columns no summary reads
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {summary}_upd AFTER UPDATE OF {watched} ON {table} BEGIN
+                         {_fleet_delta(summary, keys, values, "OLD", "-")} {_fleet_delta(summary, keys, values, "NEW", "")} END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {summary}_owner AFTER UPDATE OF user_id ON {table} BEGIN
+                         {_fleet_user_delta("NEW", "")} {_fleet_user_delta("OLD", "-")} END''')
+
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS fleet_users_added AFTER INSERT ON fleet_users WHEN NEW.row_count > 0 BEGIN
+                    UPDATE fleet_counters SET value = value + 1 WHERE name = 'active_users'; END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS fleet_users_emptied AFTER UPDATE OF row_count ON fleet_users WHEN NEW.row_count <= 0 BEGIN
+                    {FLEET_USERS_PRUNE.format(user_id="NEW.user_id")};
+                    UPDATE fleet_counters SET value = value - 1 WHERE name = 'active_users'; END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS fleet_users_registered AFTER INSERT ON users BEGIN
+                    UPDATE fleet_counters SET value = value + 1 WHERE name = 'users'; END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS fleet_users_removed AFTER DELETE ON users BEGIN
+                    UPDATE fleet_counters SET value = value - 1 WHERE name = 'users'; END''')
+    rebuild_fleet_summaries(conn)
+
+def m009_admin_list_indexes(conn):
+    # Keyset pagination of the user list on (sort column, id); NULLs would break the cursor order
+    conn.execute("UPDATE users SET role = 'USER' WHERE role IS NULL")
+    conn.execute("UPDATE users SET created_at = '' WHERE created_at IS NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_users_role_id ON users(role, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_users_created_id ON users(created_at, id)")
+    # Security queue search by IP prefix
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_allowed_ips_status_ip ON allowed_ips(status, ip_address)")
+
+
+# Per-user tables whose writes invalidate the user's cached results in every process
+DATA_VERSION_TABLES = ("assets", "liabilities", "cashflow", "routine", "history_snapshots",
+                       "career_skills", "career_wins", "goals")
+DATA_VERSION_BUMP = "UPDATE users SET data_version = data_version + 1 WHERE id IN ({ids})"
+
+def m010_user_data_version(conn):
+    # Bumped by triggers inside the writing transaction, whichever process or job writes
+    _add_column(conn, "users", "data_version", "INTEGER NOT NULL DEFAULT 0")
+    for table in DATA_VERSION_TABLES:
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_version_ins AFTER INSERT ON {table} BEGIN
+                         {DATA_VERSION_BUMP.format(ids="NEW.user_id")}; END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_version_del AFTER DELETE ON {table} BEGIN
+                         {DATA_VERSION_BUMP.format(ids="OLD.user_id")}; END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_version_upd AFTER UPDATE ON {table} BEGIN
+                         {DATA_VERSION_BUMP.format(ids="OLD.user_id, NEW.user_id")}; END''')
+
+
+MIGRATIONS = [
+    (1, "baseline tables", m001_baseline_tables),
+    (2, "users.role", m002_users_role),
+    (3, "history_snapshots daily unique", m003_history_daily_unique),
+    (4, "prices table", m004_prices_table),
+    (5, "access pattern indexes", m005_access_pattern_indexes),
+    (6, "fx_rates table + users.base_currency", m006_fx_rates),
+    (7, "price_history, price_splits, price_history_coverage", m007_price_history),
+    (8, "fleet summary tables + triggers", m008_fleet_summaries),
+    (9, "admin list pagination indexes", m009_admin_list_indexes),
+    (10, "users.data_version + write triggers", m010_user_data_version),
+]
+
+
+# --- RUNNER ---
+def current_version(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY, name TEXT, applied_at TIMESTAMP)''')
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+def run_migrations(conn, migrations=MIGRATIONS):
+    """Applies pending migrations in order. Returns the list of versions applied."""
+    applied = []
+    for version, name, fn in sorted(migrations, key=lambda m: m[0]):
+        if version <= current_version(conn):
+            continue
+        # IMMEDIATE: concurrent workers serialize here and re-check the version
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if version <= current_version(conn):
+                conn.rollback()
+                continue
+            fn(conn)
+            conn.execute("INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)", (version, name, datetime.now()))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+        print(f"MIGRATION {version:03d} APPLIED: {name}")
+    return applied
+
+
+# --- QUERY PLAN REGRESSION ---
+def _hot(sql):
+    # Plans do not depend on the values: one placeholder value per parameter
+    return sql, (1,) * sql.count("?")
+
+def _hot_queries():
+    """Hot per-request queries from queries.py, expanded for every table / sort / filter they run with."""
+    hot = {
+        "login_credentials": q.USER_CREDENTIALS,
+        "login_ip_status": q.IP_STATUS,
+        "login_ip_touch": q.IP_TOUCH,
+        "login_ip_count": q.IP_COUNT,
+        "data_version": q.DATA_VERSION,
+        "base_currency": q.BASE_CURRENCY,
+        "record_snapshot_assets": q.SNAPSHOT_ASSETS,
+        "record_snapshot_liabilities": q.SNAPSHOT_LIABILITIES,
+        "record_snapshot_day": q.SNAPSHOT_DAY,
+        "user_tickers": q.USER_TICKERS,
+        "fresh_prices": q.FRESH_PRICES.format(marks=q.marks(2)),
+        "fanout_prices": q.PRICES.format(marks=q.marks(2)),
+        "fanout_users": q.TICKER_HOLDERS.format(marks=q.marks(2)),
+        "fanout_update": q.FAN_OUT_PRICE,
+        "user_price_update": q.USER_PRICE,
+        "fx_rates": q.FX_RATES.format(marks=q.marks(2)),
+        "history_range": q.HISTORY_RANGE,
+        "history_splits": q.HISTORY_SPLITS.format(marks=q.marks(2)),
+        "history_coverage": q.HISTORY_COVERAGE.format(marks=q.marks(2)),
+        "pending_ips": q.PENDING_IPS.format(search="", after="", limit=""),
+        "approve_all_pending": q.APPROVE_ALL_PENDING,
+        "bulk_ip_status": q.SET_IP_STATUS,
+        "users_search": q.USERS_COUNT.format(search=q.USERNAME_PREFIX),
+        "users_counter": q.USERS_COUNTER,
+        "pending_ips_search": q.PENDING_IPS_COUNT.format(search=q.IP_PREFIX),
+    }
+    for table in DATA_VERSION_TABLES:
+        hot[f"snapshot_{table}"] = q.USER_ROWS.format(table=table, order=q.USER_ROWS_ORDER.get(table, ""))
+        hot[f"editor_delete_{table}"] = q.EDITOR_DELETE.format(table=table)
+        hot[f"editor_update_{table}"] = q.EDITOR_UPDATE.format(table=table, sets="user_id = ?")
+    for table in ("allowed_ips", "assets", "liabilities", "cashflow"):
+        hot[f"admin_delete_{table}"] = q.DELETE_USER_ROWS.format(table=table)
+    for sort in q.USER_SORT_COLUMNS:
+        for desc in (False, True):
+            for step in q.USERS_PAGE_STEPS:
+                for search in (False, True):
+                    hot[f"users_page_{sort}_{'desc' if desc else 'asc'}_{step}{'_search' if search else ''}"] = q.users_page(sort, desc, step, search)
+    for search in (False, True):
+        for after in (False, True):
+            hot[f"pending_ips_page{'_search' if search else ''}{'_after' if after else ''}"] = q.pending_ips_page(search, after)
+    # Statements run by the triggers on every write
+    for summary, keys, values in FLEET_SUMMARIES.values():
+        hot[f"{summary}_prune"] = _fleet_prune(summary, keys, values, ["?"] * len(keys))
+    hot["fleet_users_prune"] = FLEET_USERS_PRUNE.format(user_id="?")
+    hot["data_version_bump"] = DATA_VERSION_BUMP.format(ids="?, ?")
+    return {name: _hot(sql) for name, sql in hot.items()}
+
+HOT_QUERIES = _hot_queries()
+
+def explain(conn, sql, params=()):
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+def find_scans(conn, queries=None):
+    """
+    Returns {query_name: plan} for every hot query whose plan contains a full SCAN.
+    An ordered walk that needs no sort step and stops at LIMIT (a first page) is bounded, not a scan.
+    """
+    offenders = {}
+    for name, (sql, params) in (queries or HOT_QUERIES).items():
+        plan = explain(conn, sql, params)
+        bounded = " LIMIT " in sql and not any("TEMP B-TREE" in step for step in plan)
+        if not bounded and any(step.startswith("SCAN") for step in plan):
+            offenders[name] = plan
+    return offenders
+
+
+if __name__ == "__main__":
+    import database_manager as dbm
+
+    with dbm.db_connection() as conn:
+        run_migrations(conn)
+        print(f"SCHEMA VERSION: {current_version(conn)}")
+        if "--check" in sys.argv:
+            offenders = find_scans(conn)
+            for name, plan in offenders.items():
+                print(f"[SCAN] {name}: {' | '.join(plan)}")
+            print("QUERY PLANS OK" if not offenders else f"{len(offenders)} HOT QUERIES FALL BACK TO SCAN")
+            sys.exit(1 if offenders else 0)
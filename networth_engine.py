@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+import cache_manager
+import fx_service as fx
+import price_history
+
+
+DAYS_PER_MONTH = 365.25 / 12
+SERIES_COLUMNS = ["date", "total_assets", "total_liabilities", "net_worth"]
+
+
+def _days(start, end):
+    return np.arange(np.datetime64(pd.Timestamp(start).date(), "D"), np.datetime64(pd.Timestamp(end).date(), "D") + 1)
+
+
+def amortize_balances(balance, payment, annual_rate_pct, months):
+    """
+    Closed-form loan balance `months` away from today (negative = in the past)
+    for every liability at once. balance/payment/annual_rate_pct have one entry
+    per liability, months one per date; returns shape (liabilities, dates).
+    """
+    return loan_balance(np.asarray(balance, dtype=float)[:, None], np.asarray(payment, dtype=float)[:, None],
+                        np.asarray(annual_rate_pct, dtype=float)[:, None], np.asarray(months, dtype=float)[None, :])
+
+
+def loan_balance(balance, payment, annual_rate_pct, months):
+    """
+    Elementwise form of amortize_balances: all four inputs broadcast together.
+    B(k) = (B0 - M/r)(1+r)^k + M/r, or B0 - kM without interest. The past
+    runs the recurrence backwards (payments added back, interest removed);
+    future balances stop at zero once the debt is repaid.
+    """
+    b = np.nan_to_num(np.asarray(balance, dtype=float))
+    m = np.nan_to_num(np.asarray(payment, dtype=float))
+    r = np.nan_to_num(np.asarray(annual_rate_pct, dtype=float)) / 1200
+    k = np.asarray(months, dtype=float)
+    safe_r = np.where(r > 0, r, 1.0)
+    with np.errstate(over="ignore", invalid="ignore"):
+        compound = (b - m / safe_r) * np.power(1 + safe_r, k) + m / safe_r
+    out = np.where(r > 0, compound, b - k * m)
+    return np.where(k > 0, np.maximum(out, 0.0), out)
+
+
+def reconstruct_networth(df_a, df_l, start, end, fx_factors=None, today=None, history=None):
+    """
+    Daily net worth for [start, end] rebuilt from today's holdings:
+    current quantities marked to the stored price history (last close
+    carried over weekends and holidays) and liabilities amortized from
+    remaining_balance / monthly_payment / interest_rate.
+    Positions with no close known yet on a day (no ticker, no history,
+    or before their first close) are valued at current_price.
+    Past quantities are not stored, so the series shows market moves and
+    debt paydown, not past contributions.
+    fx_factors converts to the base currency at today's rates (see fx_service).
+    Returns a DataFrame with SERIES_COLUMNS, one row per calendar day.
+    """
+    days = _days(start, end)
+    n_days = len(days)
+    if n_days == 0:
+        return pd.DataFrame(columns=SERIES_COLUMNS)
+    today = np.datetime64(pd.Timestamp(today or pd.Timestamp.now()).date(), "D")
+
+    # --- ASSETS: positions x dates collapsed to tickers x dates ---
+    assets = np.zeros(n_days)
+    if not df_a.empty:
+        qty = pd.to_numeric(df_a["quantity"], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+        cur_price = pd.to_numeric(df_a["current_price"], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+        if fx_factors is not None:
+            qty = qty * np.nan_to_num(fx.conversion_factors(df_a["currency"] if "currency" in df_a.columns else [None] * len(df_a), fx_factors))
+        tickers = (df_a["ticker"] if "ticker" in df_a.columns else pd.Series([""] * len(df_a))).fillna("").astype(str).str.strip()
+        has_ticker = (tickers != "").to_numpy()
+        assets += (qty * cur_price)[~has_ticker].sum()
+
+        if has_ticker.any():
+            codes, uniq = pd.factorize(tickers[has_ticker])
+            k = len(uniq)
+            weight = np.bincount(codes, weights=qty[has_ticker], minlength=k)
+            fallback = np.bincount(codes, weights=(qty * cur_price)[has_ticker], minlength=k)
+
+            hist = history or price_history.get_service()
+            # Closes from before `start` seed the carry-forward on the first days
+            _, trade_days, closes = hist.matrix(list(uniq), pd.Timestamp(days[0] - 10), pd.Timestamp(days[-1]))
+            if trade_days.size:
+                col = np.searchsorted(trade_days, days, side="right") - 1
+                marked = closes[:, np.clip(col, 0, None)]
+                marked[:, col < 0] = np.nan
+                assets += np.where(np.isnan(marked), fallback[:, None], weight[:, None] * marked).sum(axis=0)
+            else:
+                assets += fallback.sum()
+
+    # --- LIABILITIES: closed-form amortization, liabilities x dates ---
+    liabilities = np.zeros(n_days)
+    if not df_l.empty:
+        months = np.trunc((days - today).astype(float) / DAYS_PER_MONTH)
+        liabilities = amortize_balances(df_l["remaining_balance"], df_l["monthly_payment"], df_l["interest_rate"], months).sum(axis=0)
+        if fx_factors is not None:
+            liabilities = liabilities * fx_factors.get(fx.PIVOT_CURRENCY, 1.0)
+
+    return pd.DataFrame({"date": days.astype("datetime64[ns]"), "total_assets": assets,
+                         "total_liabilities": liabilities, "net_worth": assets - liabilities}, columns=SERIES_COLUMNS)
+
+
+def cached_networth(user_id, df_a, df_l, start, end, fx_factors=None, fx_key=""):
+    """
+    reconstruct_networth through the per-user result cache, keyed by the date
+    range, the FX key and the price history version. Portfolio writes bump the
+    user's cache version, so edited holdings are never served stale.
+    """
+    start, end = pd.Timestamp(start).strftime("%Y-%m-%d"), pd.Timestamp(end).strftime("%Y-%m-%d")
+    key = f"networth:{start}:{end}:{fx_key}:{price_history.get_service().version}"
+    return cache_manager.results.get_or_compute(
+        user_id, key, lambda: reconstruct_networth(df_a, df_l, start, end, fx_factors))
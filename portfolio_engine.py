@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+import fx_service as fx
+
+
+POSITION_COLUMNS = ["market_value", "cost_basis", "unrealized_pnl", "return_pct", "weight"]
+CATEGORY_COLUMNS = ["category", "positions", "market_value", "cost_basis", "unrealized_pnl", "return_pct", "weight"]
+
+
+def _col(df, name):
+    if name not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+
+def _pct(num, den):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den > 0, num / den * 100, np.nan)
+
+
+def analyze_portfolio(df_a, fx_factors=None):
+    """
+    Market value, cost basis, unrealized P&L, return % and allocation weight
+    per position and per category, in one vectorized pass over the assets table.
+    Positions without an avg_price have no cost basis: they count towards value
+    and weights but not towards P&L or returns.
+    fx_factors ({currency: multiplier}, see fx_service.FxService.factors)
+    converts every position to the base currency before aggregating; positions
+    in a currency without a rate are left out and listed in totals["missing_fx"].
+    Returns a dict: positions (df_a plus POSITION_COLUMNS), by_category
+    (CATEGORY_COLUMNS, largest first) and totals.
+    """
+    n = len(df_a)
+    qty = np.nan_to_num(_col(df_a, "quantity"))
+    price = np.nan_to_num(_col(df_a, "current_price"))
+    avg = _col(df_a, "avg_price")
+    missing_fx = []
+    if fx_factors is not None and n:
+        factor = fx.conversion_factors(df_a["currency"] if "currency" in df_a.columns else [None] * n, fx_factors)
+        unconverted = np.isnan(factor)
+        if unconverted.any():
+            missing_fx = sorted(set(df_a["currency"].astype(str).to_numpy()[unconverted]))
+            factor = np.where(unconverted, 0.0, factor)
+        price = price * factor
+        avg = avg * factor
+
+    value = qty * price
+    has_cost = ~np.isnan(avg)
+    cost = np.where(has_cost, qty * np.nan_to_num(avg), np.nan)
+    pnl = np.where(has_cost, value - np.nan_to_num(cost), np.nan)
+    total_value = value.sum()
+    weight = value / total_value * 100 if total_value > 0 else np.zeros(n)
+
+    positions = df_a.assign(market_value=value, cost_basis=cost, unrealized_pnl=pnl,
+                            return_pct=_pct(pnl, cost), weight=weight)
+
+    # Category roll-up with factorize + bincount (no Python-level groupby)
+    cats = df_a["category"].fillna("Uncategorized") if "category" in df_a.columns else pd.Series(["Uncategorized"] * n)
+    codes, labels = pd.factorize(cats, sort=False)
+    k = len(labels)
+    cat_value = np.bincount(codes, weights=value, minlength=k)
+    cat_cost = np.bincount(codes, weights=np.where(has_cost, cost, 0.0), minlength=k)
+    cat_pnl = np.bincount(codes, weights=np.where(has_cost, pnl, 0.0), minlength=k)
+    cat_priced = np.bincount(codes, weights=has_cost.astype(float), minlength=k)
+    by_category = pd.DataFrame({
+        "category": np.asarray(labels, dtype=object),
+        "positions": np.bincount(codes, minlength=k),
+        "market_value": cat_value,
+        "cost_basis": np.where(cat_priced > 0, cat_cost, np.nan),
+        "unrealized_pnl": np.where(cat_priced > 0, cat_pnl, np.nan),
+        "return_pct": _pct(cat_pnl, cat_cost),
+        "weight": cat_value / total_value * 100 if total_value > 0 else np.zeros(k),
+    }, columns=CATEGORY_COLUMNS).sort_values("market_value", ascending=False, ignore_index=True)
+
+    total_cost = float(cat_cost.sum())
+    total_pnl = float(cat_pnl.sum())
+    totals = {
+        "market_value": float(total_value),
+        "cost_basis": total_cost,
+        "unrealized_pnl": total_pnl,
+        "return_pct": total_pnl / total_cost * 100 if total_cost > 0 else 0.0,
+        "positions": n,
+        "priced_positions": int(has_cost.sum()),
+        "missing_fx": missing_fx,
+    }
+    return {"positions": positions, "by_category": by_category, "totals": totals}
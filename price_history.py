@@ -0,0 +1,351 @@
+"""
+KAIROS PRICE HISTORY
+Daily closes per (ticker, date) in the `price_history` table, clustered on
+its primary key so a ticker's range is one contiguous read. Splits are kept
+as events and applied when reading, so history never has to be re-downloaded
+after a split. `price_history_coverage` records the range already fetched per
+ticker: days without a close inside it (weekends, holidays, halts) are known
+gaps and are never requested again.
+
+    python price_history.py backfill --start 2020-01-01 [--end 2024-12-31] [--tickers AAPL,MSFT]
+    python price_history.py append        # from each ticker's last covered day up to yesterday
+    python price_history.py coverage
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import database_manager as dbm
+import queries as q
+import price_service
+from rate_limiter import TokenBucket
+
+
+HISTORY_PROVIDER = os.getenv("KAIROS_HISTORY_PROVIDER", "yahoo")
+HISTORY_BATCH_SIZE = int(os.getenv("KAIROS_HISTORY_BATCH_SIZE", "20"))
+HISTORY_SYNC_INTERVAL = float(os.getenv("KAIROS_HISTORY_SYNC_INTERVAL", "86400"))
+
+HISTORY_COLUMNS = ["ticker", "date", "close", "split"]
+
+
+def _day(d):
+    return d if isinstance(d, str) else d.strftime("%Y-%m-%d")
+
+def _shift(d, days):
+    return _day(datetime.strptime(d, "%Y-%m-%d") + timedelta(days=days))
+
+
+# --- PROVIDERS ---
+# fetch_history(tickers, start, end) -> DataFrame[HISTORY_COLUMNS], dates inclusive as YYYY-MM-DD,
+# split = ratio (new shares per old share) on its effective day, NaN otherwise.
+# A ticker without rows is asked again on the next run (a failed or partial download looks the
+# same), unless the provider lists it in df.attrs["answered"]: known, but no close in the range.
+class YahooHistoryProvider:
+    """Unadjusted daily closes and split events from Yahoo Finance, one download per batch."""
+    name = "yahoo"
+
+    def fetch_history(self, tickers, start, end):
+        import yfinance as yf
+
+        data = yf.download(" ".join(tickers), start=start, end=_shift(end, 1), group_by="ticker",
+                           actions=True, auto_adjust=False, threads=True, progress=False)
+        if data is None or data.empty:
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+        multi = isinstance(data.columns, pd.MultiIndex)
+        frames = []
+        for t in tickers:
+            try:
+                part = data[t] if multi else data
+                close = part["Close"]
+            except KeyError:
+                continue
+            splits = part["Stock Splits"] if "Stock Splits" in part.columns else pd.Series(0.0, index=part.index)
+            frames.append(pd.DataFrame({"ticker": t, "date": part.index.strftime("%Y-%m-%d"),
+                                        "close": close.to_numpy(), "split": splits.replace(0.0, np.nan).to_numpy()}))
+        if not frames:
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+        return pd.concat(frames, ignore_index=True).dropna(subset=["close"])
+
+
+class FileHistoryProvider:
+    """
+    Local stand-in feed for offline runs and tests: a .csv or .parquet file
+    with columns ticker, date, close[, split]. Loaded once and filtered per request.
+    """
+    name = "file"
+
+    def __init__(self, path):
+        self.path = path
+        self._data = None
+
+    def _load(self):
+        if self._data is None:
+            df = pd.read_parquet(self.path) if self.path.endswith(".parquet") else pd.read_csv(self.path)
+            if "split" not in df.columns:
+                df["split"] = np.nan
+            df["ticker"] = df["ticker"].astype(str).str.strip()
+            df["date"] = pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d")
+            self._data = df[HISTORY_COLUMNS]
+            self._tickers = set(df["ticker"])
+        return self._data
+
+    def fetch_history(self, tickers, start, end):
+        df = self._load()
+        mask = df["ticker"].isin(tickers).to_numpy() & (df["date"] >= start).to_numpy() & (df["date"] <= end).to_numpy()
+        out = df[mask].reset_index(drop=True)
+        out.attrs["answered"] = sorted(self._tickers.intersection(tickers))
+        return out
+
+
+def provider_from_env(spec=HISTORY_PROVIDER):
+    """'yahoo', 'csv:/path/history.csv' or 'parquet:/path/history.parquet'"""
+    kind, _, path = spec.partition(":")
+    if kind in ("csv", "parquet", "file"):
+        return FileHistoryProvider(path)
+    return YahooHistoryProvider()
+
+
+# --- SERVICE ---
+class PriceHistoryService:
+    """
+    Backfills arbitrary ranges in batched, rate-limited downloads (tickers
+    that miss the same range share a request), appends new days
+    incrementally and serves aligned ticker x date matrices.
+    """
+
+    def __init__(self, provider=None, batch_size=HISTORY_BATCH_SIZE,
+                 batches_per_sec=price_service.PRICE_BATCHES_PER_SEC, retries=price_service.PRICE_RETRIES):
+        self.provider = provider or provider_from_env()
+        self.batch_size = batch_size
+        self.retries = retries
+        self.limiter = TokenBucket(batches_per_sec, capacity=1)
+        self.stats = {"batches": 0, "failures": 0, "rows": 0, "skipped_covered": 0, "unanswered": 0}
+        self.version = 0  # bumped on every store, for cache keys
+        self._sync_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- COVERAGE ---
+    def coverage(self, tickers=None):
+        """{ticker: (first_date, last_date)} of the ranges already fetched."""
+        with dbm.db_connection() as conn:
+            if tickers is None:
+                rows = conn.execute("SELECT ticker, first_date, last_date FROM price_history_coverage").fetchall()
+            else:
+                rows = []
+                for part in price_service._chunks(list(tickers)):
+                    rows += conn.execute(q.HISTORY_COVERAGE.format(marks=q.marks(len(part))), part).fetchall()
+        return {t: (first, last) for t, first, last in rows}
+
+    @staticmethod
+    def missing_ranges(covered, start, end):
+        """
+        Ranges to fetch so the covered (first, last) range reaches [start, end].
+        Coverage is one range per ticker, so a request that does not touch it
+        is stretched to meet it: the days in between are fetched too.
+        """
+        if start > end:
+            return []
+        if covered is None:
+            return [(start, end)]
+        first, last = covered
+        gaps = []
+        if start < first:
+            gaps.append((start, _shift(first, -1)))
+        if end > last:
+            gaps.append((_shift(last, 1), end))
+        return gaps
+
+    # --- FETCH / STORE ---
+    def _fetch_batch(self, batch, start, end):
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            self.stats["batches"] += 1
+            try:
+                return self.provider.fetch_history(batch, start, end)
+            except Exception as e:
+                self.stats["failures"] += 1
+                print(f"History fetch failed ({self.provider.name}, attempt {attempt + 1}): {e}")
+                if attempt < self.retries:
+                    time.sleep(min(2 ** attempt, 30))
+        return None
+
+    def store(self, df, tickers, start, end):
+        """
+        Writes closes and splits and extends the coverage to [start, end] of the
+        `tickers` the download answered (rows in df, or listed in df.attrs["answered"]).
+        Returns the tickers left uncovered.
+        """
+        now = time.time()
+        answered = set(df["ticker"]).union(df.attrs.get("answered", ()))
+        covered = [t for t in tickers if t in answered]
+        closes = df[["ticker", "date", "close"]].itertuples(index=False, name=None)
+        splits = df.loc[df["split"].notna() & (df["split"] > 0), ["ticker", "date", "split"]].itertuples(index=False, name=None)
+        with dbm.db_connection() as conn:
+            conn.executemany('''INSERT INTO price_history (ticker, date, close) VALUES (?, ?, ?)
+                                ON CONFLICT(ticker, date) DO UPDATE SET close = excluded.close''', closes)
+            conn.executemany('''INSERT INTO price_splits (ticker, date, ratio) VALUES (?, ?, ?)
+                                ON CONFLICT(ticker, date) DO UPDATE SET ratio = excluded.ratio''', splits)
+            # missing_ranges() only yields ranges adjacent to the covered one, so the union stays contiguous
+            conn.executemany('''INSERT INTO price_history_coverage (ticker, first_date, last_date, updated_at) VALUES (?, ?, ?, ?)
+                                ON CONFLICT(ticker) DO UPDATE SET first_date = MIN(first_date, excluded.first_date),
+                                    last_date = MAX(last_date, excluded.last_date), updated_at = excluded.updated_at''',
+                             [(t, start, end, now) for t in covered])
+            conn.commit()
+        self.stats["rows"] += len(df)
+        self.stats["unanswered"] += len(tickers) - len(covered)
+        self.version += 1
+        return [t for t in tickers if t not in answered]
+
+    def backfill(self, tickers, start, end=None):
+        """Fetches whatever part of [start, end] is not covered yet. Returns rows stored."""
+        end = _day(end or date.today() - timedelta(days=1))
+        start = _day(start)
+        tickers = sorted(set(tickers))
+        with self._sync_lock:
+            covered = self.coverage(tickers)
+            # Tickers missing the same range share downloads
+            jobs = {}
+            for t in tickers:
+                gaps = self.missing_ranges(covered.get(t), start, end)
+                if not gaps:
+                    self.stats["skipped_covered"] += 1
+                for gap in gaps:
+                    jobs.setdefault(gap, []).append(t)
+            rows = 0
+            for (gap_start, gap_end), group in sorted(jobs.items()):
+                for i in range(0, len(group), self.batch_size):
+                    batch = group[i:i + self.batch_size]
+                    df = self._fetch_batch(batch, gap_start, gap_end)
+                    if df is None:
+                        continue  # coverage untouched: retried on the next run
+                    missing = self.store(df, batch, gap_start, gap_end)
+                    if missing:
+                        print(f"No history for {', '.join(missing)} ({gap_start} - {gap_end}): retried on the next run")
+                    rows += len(df)
+            return rows
+
+    def append_daily(self, tickers=None, end=None):
+        """Extends every covered ticker up to `end` (yesterday by default). Returns rows stored."""
+        end = _day(end or date.today() - timedelta(days=1))
+        covered = self.coverage(tickers)
+        if tickers is not None:
+            covered = {t: covered.get(t) for t in tickers}
+        by_start = {}
+        for t, cov in covered.items():
+            start = _shift(cov[1], 1) if cov else _shift(end, -365)
+            by_start.setdefault(start, []).append(t)
+        return sum(self.backfill(group, start, end) for start, group in by_start.items())
+
+    # --- READ ---
+    def matrix(self, tickers, start, end, adjusted=True, ffill=True):
+        """
+        Aligned closes for a date range. Returns (tickers, dates, values):
+        dates is the union of trading days (datetime64[D]) and values a float
+        array of shape (len(tickers), len(dates)), NaN where no close is known.
+        adjusted=True divides closes before each split by its ratio; ffill
+        carries the last close over gaps (never backwards).
+        """
+        tickers = list(dict.fromkeys(tickers))
+        start, end = _day(start), _day(end)
+        counts, days, closes, splits = [], [], [], []
+        with dbm.db_connection() as conn:
+            # One primary key range scan per ticker; rows carry no ticker column
+            for t in tickers:
+                rows = conn.execute(q.HISTORY_RANGE, (t, start, end)).fetchall()
+                counts.append(len(rows))
+                if rows:
+                    d, c = zip(*rows)
+                    days += d
+                    closes += c
+            if adjusted:
+                for part in price_service._chunks(tickers):
+                    splits += conn.execute(q.HISTORY_SPLITS.format(marks=q.marks(len(part))), (*part, start)).fetchall()
+        if not days:
+            return tickers, np.array([], dtype="datetime64[D]"), np.empty((len(tickers), 0))
+
+        pos = {t: i for i, t in enumerate(tickers)}
+        dates, col = np.unique(np.array(days, dtype="datetime64[D]"), return_inverse=True)
+        values = np.full((len(tickers), len(dates)), np.nan)
+        values[np.repeat(np.arange(len(tickers)), counts), col] = np.array(closes, dtype=float)
+
+        if splits:
+            # ratio r on day d: closes strictly before d are divided by r (reverse cumulative product)
+            r = np.ones((len(tickers), len(dates) + 1))
+            s_rows = np.fromiter((pos[t] for t, _, _ in splits), dtype=np.intp, count=len(splits))
+            s_cols = np.searchsorted(dates, np.array([d for _, d, _ in splits], dtype="datetime64[D]"), side="left")
+            np.multiply.at(r, (s_rows, s_cols), np.array([x for _, _, x in splits], dtype=float))
+            factor = np.cumprod(r[:, :0:-1], axis=1)[:, ::-1]
+            values = values / factor
+
+        if ffill:
+            idx = np.where(np.isnan(values), 0, np.arange(values.shape[1]))
+            np.maximum.accumulate(idx, axis=1, out=idx)
+            filled = values[np.arange(values.shape[0])[:, None], idx]
+            # Leading gaps stay NaN: index 0 is only valid where the first close exists
+            values = np.where(np.isnan(values[:, :1]) & (idx == 0), np.nan, filled)
+        return tickers, dates, values
+
+    # --- BACKGROUND WORKER ---
+    def _loop(self, interval):
+        while not self._stop.is_set():
+            try:
+                self.append_daily(price_service.get_service().tracked_tickers())
+            except Exception as e:
+                print(f"History sync error: {e}")
+            self._stop.wait(interval)
+
+    def start(self, interval=HISTORY_SYNC_INTERVAL):
+        if interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(interval,), name="kairos-history-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = PriceHistoryService()
+        return _service
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kairos price history: backfill, daily append and coverage")
+    parser.add_argument("command", choices=["backfill", "append", "coverage"])
+    parser.add_argument("--start", default=None, help="first day (YYYY-MM-DD), backfill only")
+    parser.add_argument("--end", default=None, help="last day (default yesterday)")
+    parser.add_argument("--tickers", default="", help="comma separated (default: every ticker held in assets)")
+    args = parser.parse_args()
+
+    with dbm.db_connection() as conn:
+        dbm.migrations.run_migrations(conn)
+    service = get_service()
+    tickers = [t.strip() for t in args.tickers.split(",") if t.strip()] or price_service.get_service().tracked_tickers()
+    t0 = time.perf_counter()
+    if args.command == "coverage":
+        cov = service.coverage(tickers)
+        for t in tickers:
+            print(f"{t:<12} {' -> '.join(cov[t]) if t in cov else 'not covered'}")
+    else:
+        if args.command == "backfill":
+            if not args.start:
+                parser.error("backfill needs --start")
+            rows = service.backfill(tickers, args.start, args.end)
+        else:
+            rows = service.append_daily(tickers, args.end)
+        s = service.stats
+        print(f"{rows} rows stored for {len(tickers)} tickers in {time.perf_counter() - t0:.1f} s "
+              f"({s['batches']} requests, {s['failures']} failed, {s['skipped_covered']} already covered)")
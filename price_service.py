@@ -0,0 +1,262 @@
+import csv
+import os
+import threading
+import time
+
+import pandas as pd
+
+import cache_manager
+import database_manager as dbm
+import queries as q
+from rate_limiter import TokenBucket
+
+
+PRICE_TTL_SECONDS = float(os.getenv("KAIROS_PRICE_TTL", "900"))
+PRICE_BATCH_SIZE = int(os.getenv("KAIROS_PRICE_BATCH_SIZE", "50"))
+PRICE_BATCHES_PER_SEC = float(os.getenv("KAIROS_PRICE_RATE", "0.5"))
+PRICE_RETRIES = int(os.getenv("KAIROS_PRICE_RETRIES", "3"))
+PRICE_SYNC_INTERVAL = float(os.getenv("KAIROS_PRICE_SYNC_INTERVAL", "900"))
+PRICE_PROVIDER = os.getenv("KAIROS_PRICE_PROVIDER", "yahoo")
+
+
+SQL_IN_CHUNK = 500
+
+
+def _chunks(items, size=SQL_IN_CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# --- PROVIDERS ---
+class YahooPriceProvider:
+    """Last close from Yahoo Finance (one download per batch)."""
+    name = "yahoo"
+
+    def fetch(self, tickers):
+        import yfinance as yf
+
+        data = yf.download(" ".join(tickers), period="1d", group_by="ticker", threads=True, progress=False)
+        quotes = {}
+        if data is None or data.empty:
+            return quotes
+        multi = isinstance(data.columns, pd.MultiIndex)
+        for t in tickers:
+            try:
+                if multi:
+                    if t not in data.columns.get_level_values(0):
+                        continue
+                    close = data[t]["Close"].dropna()
+                else:
+                    close = data["Close"].dropna()
+            except KeyError:
+                continue
+            if not close.empty:
+                quotes[t] = (float(close.iloc[-1]), None)
+        return quotes
+
+
+class CsvPriceProvider:
+    """
+    Local stand-in feed for offline runs and tests.
+    CSV columns: ticker, price[, currency]. The file is re-read on every fetch.
+    """
+    name = "csv"
+
+    def __init__(self, path):
+        self.path = path
+
+    def fetch(self, tickers):
+        wanted = set(tickers)
+        quotes = {}
+        with open(self.path, newline="") as f:
+            for row in csv.DictReader(f):
+                t = (row.get("ticker") or "").strip()
+                if t in wanted and row.get("price"):
+                    quotes[t] = (float(row["price"]), (row.get("currency") or None))
+        return quotes
+
+
+def provider_from_env(spec=PRICE_PROVIDER):
+    """'yahoo' or 'csv:/path/to/prices.csv'"""
+    if spec.startswith("csv:"):
+        return CsvPriceProvider(spec[4:])
+    return YahooPriceProvider()
+
+
+# --- SERVICE ---
+class PriceService:
+    """
+    Shared quote cache for every user's tickers.
+    Unique tickers are fetched in bounded, rate-limited batches with retries,
+    stored in the `prices` table with a TTL and fanned out to `assets`.
+    """
+
+    def __init__(self, provider=None, ttl=PRICE_TTL_SECONDS, batch_size=PRICE_BATCH_SIZE,
+                 batches_per_sec=PRICE_BATCHES_PER_SEC, retries=PRICE_RETRIES):
+        self.provider = provider or provider_from_env()
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.retries = retries
+        self.limiter = TokenBucket(batches_per_sec, capacity=1)
+        self.stats = {"batches": 0, "failures": 0, "quotes": 0, "skipped_fresh": 0, "requested": 0}
+        self._sync_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._interval = 0.0
+        self._requested = set()
+
+    # --- QUERIES ---
+    def tracked_tickers(self, user_id=None):
+        sql, params = (q.TRACKED_TICKERS, ()) if user_id is None else (q.USER_TICKERS, (user_id,))
+        with dbm.db_connection() as conn:
+            return sorted(r[0] for r in conn.execute(sql, params))
+
+    def stale_tickers(self, tickers, now=None):
+        if not tickers:
+            return []
+        now = now or time.time()
+        fresh = set()
+        with dbm.db_connection() as conn:
+            for part in _chunks(tickers):
+                fresh.update(r[0] for r in conn.execute(q.FRESH_PRICES.format(marks=q.marks(len(part))), (now, *part)))
+        return [t for t in tickers if t not in fresh]
+
+    # --- FETCH ---
+    def _fetch_batch(self, batch):
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            self.stats["batches"] += 1
+            try:
+                return self.provider.fetch(batch)
+            except Exception as e:
+                self.stats["failures"] += 1
+                print(f"Price fetch failed ({self.provider.name}, attempt {attempt + 1}): {e}")
+                if attempt < self.retries:
+                    time.sleep(min(2 ** attempt, 30))
+        return {}
+
+    def fetch(self, tickers):
+        quotes = {}
+        for i in range(0, len(tickers), self.batch_size):
+            quotes.update(self._fetch_batch(tickers[i:i + self.batch_size]))
+        return quotes
+
+    def store(self, quotes, now=None):
+        if not quotes:
+            return
+        now = now or time.time()
+        rows = [(t, p, cur, now, now + self.ttl) for t, (p, cur) in quotes.items()]
+        with dbm.db_connection() as conn:
+            conn.executemany('''INSERT INTO prices (ticker, price, currency, fetched_at, expires_at) VALUES (?, ?, ?, ?, ?)
+                                ON CONFLICT(ticker) DO UPDATE SET price = excluded.price, currency = COALESCE(excluded.currency, prices.currency),
+                                    fetched_at = excluded.fetched_at, expires_at = excluded.expires_at''', rows)
+            conn.commit()
+
+    def fan_out(self, tickers, user_id=None):
+        """
+        Copies cached quotes into every asset holding the tickers, or only into
+        `user_id`'s assets when given (request path: one user's rows and snapshot).
+        Returns affected user ids.
+        """
+        if not tickers:
+            return []
+        quotes, users = [], set()
+        with dbm.db_connection() as conn:
+            for part in _chunks(list(tickers)):
+                marks = q.marks(len(part))
+                quotes += conn.execute(q.PRICES.format(marks=marks), part).fetchall()
+                if user_id is None:
+                    users.update(r[0] for r in conn.execute(q.TICKER_HOLDERS.format(marks=marks), part))
+            if user_id is None:
+                conn.executemany(q.FAN_OUT_PRICE, quotes)
+            else:
+                users = {user_id} if quotes else set()
+                conn.executemany(q.USER_PRICE, [(p, t, user_id) for p, t in quotes])
+            conn.commit()
+        users = sorted(users)
+        for uid in users:
+            dbm.record_snapshot(uid)
+            cache_manager.bump_version(uid)
+        return users
+
+    def sync(self, tickers=None, force=False):
+        """Refreshes stale quotes (all tracked tickers by default). Returns the tickers refreshed."""
+        with self._sync_lock:
+            tickers = sorted(set(tickers)) if tickers is not None else self.tracked_tickers()
+            todo = tickers if force else self.stale_tickers(tickers)
+            self.stats["skipped_fresh"] += len(tickers) - len(todo)
+            quotes = self.fetch(todo)
+            self.store(quotes)
+            self.stats["quotes"] += len(quotes)
+            if quotes:
+                self.fan_out(sorted(quotes))
+            return sorted(quotes)
+
+    # --- BACKGROUND WORKER ---
+    def request_sync(self, tickers):
+        """
+        Queues tickers for the background worker (started on demand if the
+        periodic sync is off) and returns at once. Returns the tickers queued.
+        """
+        tickers = sorted(set(tickers))
+        if not tickers:
+            return []
+        with self._thread_lock:
+            self._requested.update(tickers)
+            self.stats["requested"] += len(tickers)
+        self._start_thread()
+        self._wake.set()
+        return tickers
+
+    def pending_requests(self):
+        with self._thread_lock:
+            return len(self._requested)
+
+    def _loop(self):
+        next_full = time.monotonic()
+        while not self._stop.is_set():
+            self._wake.clear()
+            with self._thread_lock:
+                requested, self._requested = sorted(self._requested), set()
+            try:
+                # Requested tickers first: a user is waiting on them
+                if requested:
+                    self.sync(requested)
+                if self._interval > 0 and time.monotonic() >= next_full:
+                    self.sync()
+                    next_full = time.monotonic() + self._interval
+            except Exception as e:
+                print(f"Price sync error: {e}")
+            self._wake.wait(max(0.0, next_full - time.monotonic()) if self._interval > 0 else None)
+
+    def _start_thread(self):
+        with self._thread_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="kairos-price-sync", daemon=True)
+            self._thread.start()
+
+    def start(self, interval=PRICE_SYNC_INTERVAL):
+        """Starts the periodic sync every `interval` seconds (<= 0: requested syncs only)."""
+        if interval <= 0:
+            return
+        self._interval = interval
+        self._start_thread()
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = PriceService()
+        return _service
@@ -0,0 +1,76 @@
+"""
+SQL of the hot per-request queries. The modules that run them and the
+EXPLAIN QUERY PLAN check (migrations.HOT_QUERIES) share these strings, so the
+plans checked are the plans served.
+{marks} takes marks(n); other {fields} are table / column names or fragments
+from this module, never user input.
+"""
+
+
+def marks(n):
+    return ",".join("?" * n)
+
+
+# --- LOGIN ---
+USER_CREDENTIALS = "SELECT id, password_hash, role FROM users WHERE username = ?"
+IP_STATUS = "SELECT id, status FROM allowed_ips WHERE user_id = ? AND ip_address = ?"
+IP_TOUCH = "UPDATE allowed_ips SET last_used = ? WHERE user_id = ? AND ip_address = ?"
+IP_COUNT = "SELECT COUNT(*) FROM allowed_ips WHERE user_id = ?"
+
+# --- USER DATA ---
+DATA_VERSION = "SELECT data_version FROM users WHERE id = ?"
+USER_ROWS = "SELECT * FROM {table} WHERE user_id = ?{order}"
+# Deterministic row order where pages rely on it (charts, forecasts)
+USER_ROWS_ORDER = {"history_snapshots": " ORDER BY date"}
+EDITOR_DELETE = "DELETE FROM {table} WHERE id = ? AND user_id = ?"
+EDITOR_UPDATE = "UPDATE {table} SET {sets} WHERE id = ? AND user_id = ?"
+BASE_CURRENCY = "SELECT base_currency FROM users WHERE id = ?"
+SNAPSHOT_ASSETS = """SELECT UPPER(TRIM(COALESCE(NULLIF(TRIM(currency), ''), 'EUR'))), COALESCE(SUM(quantity * current_price), 0)
+                     FROM assets WHERE user_id = ? GROUP BY 1"""
+SNAPSHOT_LIABILITIES = "SELECT COALESCE(SUM(remaining_balance), 0) FROM liabilities WHERE user_id = ?"
+SNAPSHOT_DAY = "SELECT 1 FROM history_snapshots WHERE user_id = ? AND date = ?"
+
+# --- PRICES + FX ---
+TRACKED_TICKERS = "SELECT DISTINCT TRIM(ticker) FROM assets WHERE ticker IS NOT NULL AND TRIM(ticker) != ''"
+USER_TICKERS = TRACKED_TICKERS + " AND user_id = ?"
+FRESH_PRICES = "SELECT ticker FROM prices WHERE expires_at > ? AND ticker IN ({marks})"
+PRICES = "SELECT price, ticker FROM prices WHERE ticker IN ({marks})"
+TICKER_HOLDERS = "SELECT DISTINCT user_id FROM assets WHERE TRIM(ticker) IN ({marks})"
+FAN_OUT_PRICE = "UPDATE assets SET current_price = ? WHERE TRIM(ticker) = ?"
+USER_PRICE = FAN_OUT_PRICE + " AND user_id = ?"
+FX_RATES = "SELECT currency, rate, expires_at FROM fx_rates WHERE currency IN ({marks})"
+HISTORY_RANGE = "SELECT date, close FROM price_history WHERE ticker = ? AND date BETWEEN ? AND ?"
+HISTORY_SPLITS = "SELECT ticker, date, ratio FROM price_splits WHERE ticker IN ({marks}) AND date > ?"
+HISTORY_COVERAGE = "SELECT ticker, first_date, last_date FROM price_history_coverage WHERE ticker IN ({marks})"
+
+# --- ADMIN ---
+PENDING_IPS = """SELECT allowed_ips.id, users.username, allowed_ips.ip_address, allowed_ips.device_name, allowed_ips.last_used
+                 FROM allowed_ips JOIN users ON allowed_ips.user_id = users.id
+                 WHERE allowed_ips.status = 'PENDING'{search}{after} ORDER BY allowed_ips.id{limit}"""
+PENDING_IPS_COUNT = "SELECT COUNT(*) FROM allowed_ips WHERE allowed_ips.status = 'PENDING'{search}"
+IP_PREFIX = " AND allowed_ips.ip_address >= ? AND allowed_ips.ip_address < ?"
+APPROVE_ALL_PENDING = "UPDATE allowed_ips SET status='APPROVED' WHERE status='PENDING'"
+SET_IP_STATUS = "UPDATE allowed_ips SET status = ? WHERE id = ?"
+DELETE_USER_ROWS = "DELETE FROM {table} WHERE user_id = ?"
+
+USER_SORT_COLUMNS = ("id", "username", "role", "created_at")
+USERS_PAGE = ("SELECT id, username, role, created_at, {sort} AS sort_key FROM users WHERE {cond}{search} "
+              "ORDER BY {sort} {order}, id {order} LIMIT ?")
+USERNAME_PREFIX = " AND username >= ? AND username < ?"
+USERS_COUNT = "SELECT COUNT(*) FROM users WHERE 1{search}"
+USERS_COUNTER = "SELECT value FROM fleet_counters WHERE name = 'users'"
+# Keyset steps of a user page: first page, rest of the cursor's sort value, values after it
+USERS_PAGE_STEPS = ("first", "tie", "after")
+
+
+def users_page(sort, descending=False, step="first", search=False):
+    """USERS_PAGE for one sort column, direction and keyset step."""
+    op, order = ("<", "DESC") if descending else (">", "ASC")
+    cond = {"first": "1",
+            "tie": f"id {op} ?" if sort == "id" else f"{sort} = ? AND id {op} ?",
+            "after": f"{sort} {op} ?"}[step]
+    return USERS_PAGE.format(sort=sort, order=order, cond=cond, search=USERNAME_PREFIX if search else "")
+
+
+def pending_ips_page(search=False, after=False):
+    return PENDING_IPS.format(search=IP_PREFIX if search else "", after=" AND allowed_ips.id > ?" if after else "", limit=" LIMIT ?")
@@ -1,9 +1,127 @@
 
+import io
+import os
+import unicodedata
+import zlib
+
+import fpdf
 from fpdf import FPDF
 from datetime import datetime
 import pandas as pd
+import cache_manager
+import cashflow_engine as cfe
+import debt_engine as de
+import portfolio_engine as pe
+import fx_service as fx
+
+# Bump when the layout changes so cached PDFs are not served for the new design
+REPORT_LAYOUT_VERSION = 6
+
+# TrueType fonts for full Unicode output (core PDF fonts are latin-1 only). DejaVu Sans ships
+# in fonts/; KAIROS_REPORT_FONT / KAIROS_REPORT_BOLD_FONT point at other .ttf files.
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts")
+REPORT_FONT_PATH = os.getenv("KAIROS_REPORT_FONT") or os.path.join(FONT_DIR, "DejaVuSans.ttf")
+REPORT_BOLD_FONT_PATH = os.getenv("KAIROS_REPORT_BOLD_FONT") or (
+    REPORT_FONT_PATH if os.getenv("KAIROS_REPORT_FONT") else os.path.join(FONT_DIR, "DejaVuSans-Bold.ttf"))
+UNICODE_FAMILY = "kairosuni"
+_font_warning = None
+
+
+def font_warning():
+    """Why reports fall back to latin-1 core fonts, or None while the Unicode font loads."""
+    if _font_warning is None:
+        missing = [p for p in (REPORT_FONT_PATH, REPORT_BOLD_FONT_PATH) if not os.path.isfile(p)]
+        if missing:
+            return f"Report font {missing[0]} not found; non-latin-1 text is printed as '?'"
+    return _font_warning
+
+# Common characters outside latin-1 and their closest core-font spelling
+LATIN1_FALLBACKS = {
+    "\u20ac": "EUR", "\u2018": "'", "\u2019": "'", "\u201c": '"', "\u201d": '"',
+    "\u2013": "-", "\u2014": "-", "\u2026": "...", "\u2022": "*", "\u00a0": " ",
+}
+
+def to_latin1(text):
+    """Best-effort latin-1 spelling of `text` (accents kept, symbols spelled out, the rest '?')."""
+    try:
+        text.encode("latin-1")
+        return text
+    except UnicodeEncodeError:
+        pass
+    out = []
+    for ch in text:
+        if ord(ch) < 256:
+            out.append(ch)
+        elif ch in LATIN1_FALLBACKS:
+            out.append(LATIN1_FALLBACKS[ch])
+        else:
+            base = unicodedata.normalize("NFKD", ch).encode("latin-1", "ignore").decode("latin-1")
+            out.append(base or "?")
+    return "".join(out)
+
 
 class PDFReport(FPDF):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.unicode_font = False
+        # Amounts are printed in `currency`; cashflow is recorded in the FX pivot and scaled by pivot_factor
+        self.currency = fx.PIVOT_CURRENCY
+        self.pivot_factor = 1.0
+        global _font_warning
+        try:
+            self.add_font(UNICODE_FAMILY, "", REPORT_FONT_PATH, uni=True)
+            self.add_font(UNICODE_FAMILY, "B", REPORT_BOLD_FONT_PATH, uni=True)
+            self.unicode_font = True
+            _font_warning = None
+        except Exception as e:
+            # Forget any face that did load so the fallback document embeds none of them
+            for path in (REPORT_FONT_PATH, REPORT_BOLD_FONT_PATH):
+                self.font_files.pop(path, None)
+            for key in [k for k in self.fonts if k.startswith(UNICODE_FAMILY)]:
+                del self.fonts[key]
+                self.font_files.pop(key, None)
+            warning = f"Report fonts unavailable ({e}); non-latin-1 text is printed as '?'"
+            if warning != _font_warning:
+                print(f"WARNING: {warning}")
+            _font_warning = warning
+
+    def set_font(self, family, style='', size=0):
+        # With a Unicode font loaded every text family maps onto it
+        if self.unicode_font and family.lower() in ('arial', 'helvetica', 'courier', 'times'):
+            # No oblique face is loaded (each face is subset and embedded): italic is set upright
+            family, style = UNICODE_FAMILY, style.upper().replace('I', '')
+        super().set_font(family, style, size)
+
+    def normalize_text(self, txt):
+        txt = super().normalize_text(txt)
+        if not self.unifontsubset and isinstance(txt, str):
+            txt = to_latin1(txt)
+        return txt
+
+    def table(self, headers, rows, widths, aligns=None, row_h=6):
+        """
+        Writes `rows` (any iterable of sequences, consumed lazily) under a bold
+        header row; the header is repeated at the top of every new page.
+        """
+        aligns = aligns or ['L'] * len(headers)
+
+        def header_row():
+            self.set_font('Arial', 'B', 8)
+            self.set_fill_color(240, 240, 240)
+            for h, w, al in zip(headers, widths, aligns):
+                self.cell(w, row_h, str(h), 1, 0, al, 1)
+            self.ln(row_h)
+            self.set_font('Arial', '', 8)
+
+        header_row()
+        for row in rows:
+            if self.get_y() + row_h > self.page_break_trigger:
+                self.add_page()
+                header_row()
+            for v, w, al in zip(row, widths, aligns):
+                self.cell(w, row_h, str(v), 1, 0, al)
+            self.ln(row_h)
+
     def footer(self):
         self.set_y(-15)
         self.set_font('Arial', 'I', 8)
@@ -18,7 +136,7 @@ class PDFReport(FPDF):
         self.line(10, self.get_y(), 200, self.get_y())
         self.ln(10)
 
-    def cover_page(self, username, net_worth):
+    def cover_page(self, username, net_worth, period=None):
         self.add_page()
         # Logo/Brand
         self.set_font('Arial', 'B', 24)
@@ -34,15 +152,17 @@ class PDFReport(FPDF):
         self.set_text_color(100)
         self.cell(0, 10, f"Prepared for Operator: {username}", 0, 1, 'C')
         self.cell(0, 10, f"Date: {datetime.now().strftime('%B %d, %Y')}", 0, 1, 'C')
+        if period:
+            self.cell(0, 10, f"Closing Period: {period}", 0, 1, 'C')
         
         self.ln(30)
         self.set_font('Arial', 'B', 16)
         self.set_text_color(0)
         self.cell(0, 10, "CURRENT NET WORTH", 0, 1, 'C')
         self.set_font('Arial', 'B', 40)
-        self.cell(0, 20, f"EUR {net_worth:,.2f}", 0, 1, 'C')
+        self.cell(0, 20, f"{self.currency} {net_worth:,.2f}", 0, 1, 'C')
 
-    def financial_page(self, metrics, df_c, df_a, df_l):
+    def financial_page(self, metrics, df_c, df_a, df_l, portfolio=None):
         self.add_page()
         self.chapter_title("1. FINANCIAL OVERVIEW")
         
@@ -52,22 +172,16 @@ class PDFReport(FPDF):
         
         self.set_font('Arial', '', 10)
         # Calculate totals from metrics or df
-        inc = 0
-        exp = 0
-        if not df_c.empty:
-            # Re-calculate to be sure or use metrics passed? 
-            # metrics['cashflow'] is net. We need gross.
-            # Let's recalculate simply here to be safe and independent
-            calc_df = df_c.copy()
-            calc_df['m'] = calc_df.apply(lambda x: x['amount']/12 if x['frequency']=='Yearly' else x['amount'], axis=1)
-            inc = calc_df[calc_df['type']=='Income']['m'].sum()
-            exp = calc_df[calc_df['type']=='Expense']['m'].sum()
+        # metrics['cashflow'] is net. We need gross.
+        cf = cfe.summarize_cashflow(df_c)
+        inc = cf['income'] * self.pivot_factor
+        exp = cf['expense'] * self.pivot_factor
             
         self.set_fill_color(240, 240, 240)
         self.cell(100, 8, "Total Monthly Income", 1, 0, 'L', 1)
-        self.cell(50, 8, f"EUR {inc:,.2f}", 1, 1, 'R')
+        self.cell(50, 8, f"{self.currency} {inc:,.2f}", 1, 1, 'R')
         self.cell(100, 8, "Total Monthly Expenses", 1, 0, 'L', 1)
-        self.cell(50, 8, f"EUR {exp:,.2f}", 1, 1, 'R')
+        self.cell(50, 8, f"{self.currency} {exp:,.2f}", 1, 1, 'R')
         
         self.set_font('Arial', 'B', 10)
         self.cell(100, 8, "NET CASHFLOW", 1, 0, 'L', 1)
@@ -75,7 +189,7 @@ class PDFReport(FPDF):
             self.set_text_color(0, 150, 0)
         else:
              self.set_text_color(200, 0, 0)
-        self.cell(50, 8, f"EUR {inc-exp:,.2f}", 1, 1, 'R')
+        self.cell(50, 8, f"{self.currency} {inc-exp:,.2f}", 1, 1, 'R')
         self.set_text_color(0)
         
         self.ln(10)
@@ -89,40 +203,83 @@ class PDFReport(FPDF):
         self.cell(100, 8, "ASSETS", 1, 1, 'L', 1)
         self.set_font('Arial', '', 10)
         
-        total_a = 0
-        if not df_a.empty:
-            # Group by category
-            if 'current_price' in df_a.columns:
-                 df_a['val'] = df_a['quantity'] * df_a['current_price']
-                 cats = df_a.groupby('category')['val'].sum()
-                 for cat, val in cats.items():
-                     self.cell(100, 8, f"  - {cat}", 1, 0)
-                     self.cell(50, 8, f"{val:,.2f}", 1, 1, 'R')
-                     total_a += val
+        portfolio = portfolio or pe.analyze_portfolio(df_a)
+        total_a = portfolio['totals']['market_value']
+        for cat, val in zip(portfolio['by_category']['category'], portfolio['by_category']['market_value']):
+            self.cell(100, 8, f"  - {cat}", 1, 0)
+            self.cell(50, 8, f"{val:,.2f}", 1, 1, 'R')
         
         self.set_font('Arial', 'B', 10)
         self.cell(100, 8, "TOTAL ASSETS", 1, 0)
-        self.cell(50, 8, f"EUR {total_a:,.2f}", 1, 1, 'R')
+        self.cell(50, 8, f"{self.currency} {total_a:,.2f}", 1, 1, 'R')
         
         self.ln(5)
         
-        # Liabilities
+        # Liabilities, with each debt's contractual payoff
         self.cell(100, 8, "LIABILITIES", 1, 1, 'L', 1)
-        self.set_font('Arial', '', 10)
         total_l = metrics['liabilities']
-        self.cell(100, 8, "  - Total Debt Load", 1, 0)
-        self.cell(50, 8, f"EUR {total_l:,.2f}", 1, 1, 'R')
+        plan = de.debt_plan(df_l, "minimum", scale=self.pivot_factor)
+        debts = plan["debts"]
+        if not debts.empty:
+            rows = zip(debts["name"].str.slice(0, 32), (f"{v:.2f}" for v in debts["rate"]),
+                       (f"{v:,.2f}" for v in debts["payment"]), debts["payoff_date"],
+                       (f"{v:,.2f}" for v in debts["interest"]), (f"{v:,.2f}" for v in debts["balance"]))
+            self.table(["DEBT", "RATE %", "PAYMENT", "PAID OFF", "INTEREST LEFT", "BALANCE"], rows,
+                       [60, 18, 26, 24, 30, 32], ['L', 'R', 'R', 'L', 'R', 'R'])
+        self.set_font('Arial', 'B', 10)
+        self.cell(100, 8, "TOTAL DEBT LOAD", 1, 0)
+        self.cell(50, 8, f"{self.currency} {total_l:,.2f}", 1, 1, 'R')
+        if not debts.empty:
+            avalanche = de.debt_plan(df_l, "avalanche", scale=self.pivot_factor)
+            self.set_font('Arial', 'I', 8)
+            self.cell(0, 6, f"Debt-free {de.month_label(plan['debt_free_month'])} with {self.currency} "
+                            f"{plan['total_interest']:,.2f} interest at the current payments.", 0, 1)
+            self.cell(0, 6, f"Rolling repaid payments into the highest-rate debt (avalanche): debt-free "
+                            f"{de.month_label(avalanche['debt_free_month'])}, {self.currency} "
+                            f"{plan['total_interest'] - avalanche['total_interest']:,.2f} less interest.", 0, 1)
         
         self.ln(5)
         
         # Equity
         self.set_font('Arial', 'B', 10)
         self.cell(100, 8, "TOTAL EQUITY (Net Worth)", 1, 0, 'L', 1)
-        self.cell(50, 8, f"EUR {total_a - total_l:,.2f}", 1, 1, 'R')
+        self.cell(50, 8, f"{self.currency} {total_a - total_l:,.2f}", 1, 1, 'R')
+
+    def portfolio_page(self, portfolio):
+        self.add_page()
+        self.chapter_title("2. PORTFOLIO PERFORMANCE")
+        t = portfolio['totals']
+
+        self.set_font('Arial', '', 10)
+        self.set_fill_color(240, 240, 240)
+        cur = self.currency
+        for label, val in (("Market Value", f"{cur} {t['market_value']:,.2f}"),
+                           ("Cost Basis", f"{cur} {t['cost_basis']:,.2f}"),
+                           ("Unrealized P&L", f"{cur} {t['unrealized_pnl']:,.2f} ({t['return_pct']:+.2f}%)")):
+            self.cell(100, 8, label, 1, 0, 'L', 1)
+            self.cell(60, 8, val, 1, 1, 'R')
+        if t['priced_positions'] < t['positions']:
+            self.set_font('Arial', 'I', 8)
+            self.cell(0, 6, f"{t['positions'] - t['priced_positions']} positions without an average cost are excluded from P&L.", 0, 1)
+        if t.get('missing_fx'):
+            self.set_font('Arial', 'I', 8)
+            self.cell(0, 6, f"No exchange rate for {', '.join(t['missing_fx'])}: those positions are excluded from totals.", 0, 1)
+        self.ln(8)
+
+        def fmt(v, spec):
+            return "-" if pd.isna(v) else format(v, spec)
+
+        cats = portfolio['by_category']
+        rows = zip(cats['category'].astype(str), cats['positions'],
+                   (fmt(v, ",.2f") for v in cats['market_value']), (fmt(v, ",.2f") for v in cats['cost_basis']),
+                   (fmt(v, ",.2f") for v in cats['unrealized_pnl']), (fmt(v, "+.2f") for v in cats['return_pct']),
+                   (fmt(v, ".1f") for v in cats['weight']))
+        self.table(["CATEGORY", "POS.", f"VALUE ({cur})", f"COST ({cur})", f"P&L ({cur})", "RETURN %", "WEIGHT %"], rows,
+                   [40, 14, 32, 32, 30, 22, 20], ['L', 'R', 'R', 'R', 'R', 'R', 'R'])
 
     def strategy_page(self, freedom_index):
         self.add_page()
-        self.chapter_title("2. STRATEGIC INSIGHT (THE ORACLE)")
+        self.chapter_title("3. STRATEGIC INSIGHT (THE ORACLE)")
         
         self.set_font('Arial', '', 12)
         self.cell(0, 10, f"FREEDOM INDEX SCORE: {freedom_index:.1f}%", 0, 1)
@@ -153,13 +310,194 @@ class PDFReport(FPDF):
         self.set_font('Arial', 'I', 10)
         self.multi_cell(0, 10, "This report was generated by Kairos Financial OS. \nDecisions should be based on professional financial advice.")
 
-def generate_report(user_id, username, metrics, df_a, df_l, df_c):
-    pdf = PDFReport()
-    pdf.cover_page(username, metrics['net_worth'])
-    pdf.financial_page(metrics, df_c, df_a, df_l)
+    def holdings_appendix(self, df_a, portfolio=None):
+        """Per-position detail, one row per asset, paginated."""
+        self.add_page()
+        self.chapter_title("A. HOLDINGS DETAIL")
+        if df_a.empty:
+            self.set_font('Arial', '', 10)
+            self.cell(0, 8, "No positions recorded.", 0, 1)
+            return
+        pos = (portfolio or pe.analyze_portfolio(df_a))['positions']
+        pnl = pos['unrealized_pnl'].to_numpy()
+        rows = zip(pos['name'].fillna('').astype(str).str.slice(0, 32),
+                   pos['category'].fillna('').astype(str).str.slice(0, 14),
+                   pos['ticker'].fillna('').astype(str) if 'ticker' in pos.columns else [''] * len(pos),
+                   (f"{q:,.4f}" for q in pos['quantity'].to_numpy(dtype=float, na_value=0.0)),
+                   (f"{p:,.2f}" for p in pos['current_price'].to_numpy(dtype=float, na_value=0.0)),
+                   (f"{v:,.2f}" for v in pos['market_value'].to_numpy()),
+                   ("-" if v != v else f"{v:,.2f}" for v in pnl))
+        self.table(["ASSET", "CATEGORY", "TICKER", "QTY", "PRICE", f"VALUE ({self.currency})", f"P&L ({self.currency})"], rows,
+                   [50, 24, 18, 22, 22, 27, 27], ['L', 'L', 'L', 'R', 'R', 'R', 'R'])
+
+
+class StreamingPDFReport(PDFReport):
+    """
+    PDFReport that writes every finished page to `sink` (a binary file-like
+    object) as soon as the next one starts, so memory holds one page instead
+    of the whole document. Object layout matches FPDF's: 1 = Pages root,
+    2 = Resources, then page/content pairs from 3. alias_nb_pages() is not
+    supported since earlier pages are already written.
+    """
+
+    # The overrides below replace FPDF internals as they are in this release
+    FPDF_VERSION = "1.7.2"
+
+    def __init__(self, sink, *args, **kwargs):
+        if fpdf.__version__ != self.FPDF_VERSION:
+            raise RuntimeError(f"StreamingPDFReport needs fpdf=={self.FPDF_VERSION} (installed: {fpdf.__version__})")
+        super().__init__(*args, **kwargs)
+        self.sink = sink
+        self.bytes_written = 0
+
+    def _drain(self):
+        if self.buffer:
+            data = self.buffer.encode('latin-1')
+            self.sink.write(data)
+            self.bytes_written += len(data)
+            self.buffer = ''
+
+    def _offset(self):
+        return self.bytes_written + len(self.buffer)
+
+    def _newobj(self):
+        self.n += 1
+        self.offsets[self.n] = self._offset()
+        self._out(str(self.n) + ' 0 obj')
+
+    def _beginpage(self, orientation):
+        if self.page == 0:
+            self._putheader()
+        else:
+            self._putpage(self.page)
+        super()._beginpage(orientation)
+
+    def _putpage(self, n):
+        w_pt, h_pt = (self.fw_pt, self.fh_pt) if self.def_orientation == 'P' else (self.fh_pt, self.fw_pt)
+        self._newobj()
+        self._out('<</Type /Page')
+        self._out('/Parent 1 0 R')
+        if n in self.orientation_changes:
+            self._out('/MediaBox [0 0 %.2f %.2f]' % (h_pt, w_pt))
+        self._out('/Resources 2 0 R')
+        if self.page_links and n in self.page_links:
+            annots = '/Annots ['
+            for pl in self.page_links[n]:
+                rect = '%.2f %.2f %.2f %.2f' % (pl[0], pl[1], pl[0] + pl[2], pl[1] - pl[3])
+                annots += '<</Type /Annot /Subtype /Link /Rect [' + rect + '] /Border [0 0 0] '
+                if isinstance(pl[4], str):
+                    annots += '/A <</S /URI /URI ' + self._textstring(pl[4]) + '>>>>'
+                else:
+                    l = self.links[pl[4]]
+                    h = w_pt if l[0] in self.orientation_changes else h_pt
+                    annots += '/Dest [%d 0 R /XYZ 0 %.2f null]>>' % (1 + 2 * l[0], h - l[1] * self.k)
+            self._out(annots + ']')
+        if self.pdf_version > '1.3':
+            self._out('/Group <</Type /Group /S /Transparency /CS /DeviceRGB>>')
+        self._out('/Contents ' + str(self.n + 1) + ' 0 R>>')
+        self._out('endobj')
+        content = self.pages[n]
+        if self.compress:
+            content = zlib.compress(content.encode('latin-1'))
+        self._newobj()
+        self._out('<<' + ('/Filter /FlateDecode ' if self.compress else '') + '/Length ' + str(len(content)) + '>>')
+        self._putstream(content)
+        self._out('endobj')
+        self.pages[n] = ''  # page body is on the sink now
+        self._drain()
+
+    def _putresources(self):
+        self._putfonts()
+        self._putimages()
+        self.offsets[2] = self._offset()
+        self._out('2 0 obj')
+        self._out('<<')
+        self._putresourcedict()
+        self._out('>>')
+        self._out('endobj')
+
+    def _enddoc(self):
+        self._putpage(self.page)
+        w_pt, h_pt = (self.fw_pt, self.fh_pt) if self.def_orientation == 'P' else (self.fh_pt, self.fw_pt)
+        nb = self.page
+        # Pages root
+        self.offsets[1] = self._offset()
+        self._out('1 0 obj')
+        self._out('<</Type /Pages')
+        self._out('/Kids [' + ''.join(str(3 + 2 * i) + ' 0 R ' for i in range(nb)) + ']')
+        self._out('/Count ' + str(nb))
+        self._out('/MediaBox [0 0 %.2f %.2f]' % (w_pt, h_pt))
+        self._out('>>')
+        self._out('endobj')
+        self._putresources()
+        # Info
+        self._newobj()
+        self._out('<<')
+        self._putinfo()
+        self._out('>>')
+        self._out('endobj')
+        # Catalog
+        self._newobj()
+        self._out('<<')
+        self._putcatalog()
+        self._out('>>')
+        self._out('endobj')
+        # Cross-ref
+        o = self._offset()
+        self._out('xref')
+        self._out('0 ' + str(self.n + 1))
+        self._out('0000000000 65535 f ')
+        for i in range(1, self.n + 1):
+            self._out('%010d 00000 n ' % self.offsets[i])
+        # Trailer
+        self._out('trailer')
+        self._out('<<')
+        self._puttrailer()
+        self._out('>>')
+        self._out('startxref')
+        self._out(o)
+        self._out('%%EOF')
+        self._drain()
+        self.state = 3
+
+
+def stream_report(sink, username, metrics, df_a, df_l, df_c, period=None, holdings=True, fx_factors=None):
+    """
+    Writes the statement to `sink` page by page. Returns the page count.
+    Amounts are in metrics['currency'], converted with fx_factors (see fx_service).
+    """
+    portfolio = pe.analyze_portfolio(df_a, fx_factors)
+    pdf = StreamingPDFReport(sink)
+    pdf.currency = metrics.get('currency', fx.PIVOT_CURRENCY)
+    if fx_factors is not None:
+        pdf.pivot_factor = fx_factors[fx.PIVOT_CURRENCY]
+    pdf.cover_page(username, metrics['net_worth'], period)
+    pdf.financial_page(metrics, df_c, df_a, df_l, portfolio)
+    pdf.portfolio_page(portfolio)
     pdf.strategy_page(metrics['freedom_index'])
-    
-    try:
-        return pdf.output(dest='S').encode('latin-1')
-    except:
-        return pdf.output(dest='S').encode('latin-1', errors='replace')
+    if holdings:
+        pdf.holdings_appendix(df_a, portfolio)
+    pdf.close()
+    return pdf.page_no()
+
+def render_report(username, metrics, df_a, df_l, df_c, period=None, holdings=True, fx_factors=None):
+    """Builds the statement in memory. Returns (pdf_bytes, page_count)."""
+    sink = io.BytesIO()
+    pages = stream_report(sink, username, metrics, df_a, df_l, df_c, period, holdings, fx_factors)
+    return sink.getvalue(), pages
+
+def generate_report(user_id, username, metrics, df_a, df_l, df_c):
+    return render_report(username, metrics, df_a, df_l, df_c)[0]
+
+def cached_report(username, metrics, df_a, df_l, df_c, period=None, fx_factors=None):
+    """
+    generate_report through the shared disk cache. The key covers the data,
+    the operator, the period, the cover date and the currency with its rates,
+    so a hit has the same content as a fresh render. Misses are streamed
+    straight into the cache file. Returns the path of the cached PDF.
+    """
+    rates = sorted((fx_factors or {}).items())
+    key = cache_manager.fingerprint((df_a, df_l, df_c), username, period, datetime.now().strftime('%Y-%m-%d'),
+                                    metrics.get('currency'), rates, REPORT_LAYOUT_VERSION)
+    return cache_manager.reports.get_or_write(
+        key, lambda f: stream_report(f, username, metrics, df_a, df_l, df_c, period, fx_factors=fx_factors))
@@ -0,0 +1,58 @@
+"""
+One-time, process-wide startup stage: schema migrations, admin bootstrap, the
+device allowlist and background services. A file lock next to the database
+serializes workers that start at the same time; every later call in the
+process is a no-op.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+import database_manager as dbm
+import fx_service
+import price_history
+import price_service
+
+LOCK_FILE = dbm.DB_FILE + ".startup.lock"
+
+_started = False
+_lock = threading.Lock()
+
+
+@contextmanager
+def file_lock(path):
+    with open(path, "a+") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def run():
+    """Runs the startup stage once per process. Returns True on the call that did the work."""
+    global _started
+    if _started:
+        return False
+    with _lock:
+        if _started:
+            return False
+        with file_lock(LOCK_FILE):
+            dbm.init_db()
+        dbm.start_ip_flusher()
+        price_service.get_service().start()
+        fx_service.get_service().start()
+        price_history.get_service().start()
+        _started = True
+        return True
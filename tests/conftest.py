@@ -0,0 +1,28 @@
+import itertools
+import os
+import sys
+import tempfile
+
+# database_manager reads DB_PATH at import: point it at a throwaway database first
+_TMP_DIR = tempfile.mkdtemp(prefix="kairos_test_")
+os.environ["DB_PATH"] = os.path.join(_TMP_DIR, "kairos.db")
+os.environ.setdefault("KAIROS_REPORT_CACHE_DIR", os.path.join(_TMP_DIR, "report_cache"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import database_manager as dbm
+
+_user_ids = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def db():
+    dbm.migrate_db()
+    return dbm
+
+
+@pytest.fixture
+def user_id(db):
+    """A fresh user per test, so tests never see each other's rows."""
+    return db.register_user(f"test_user_{os.getpid()}_{next(_user_ids)}", b"x")
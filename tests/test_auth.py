@@ -0,0 +1,45 @@
+import bcrypt
+import pytest
+
+import auth_manager as auth
+
+
+def stored_hash(user_id):
+    with auth.dbm.db_connection() as conn:
+        return conn.execute("SELECT password_hash FROM users WHERE id = ?", (user_id,)).fetchone()[0]
+
+
+@pytest.fixture
+def fast_hasher(monkeypatch):
+    monkeypatch.setattr(auth.hasher, "rounds", 4)
+
+
+def test_reset_passwords_salts_each_user(db, user_id, fast_hasher):
+    ids = [user_id] + [db.register_user(f"peer_{i}_of_{user_id}", b"x") for i in range(2)]
+    auth.reset_passwords(ids, "Reset123!")
+    hashes = [stored_hash(i) for i in ids]
+    assert len(set(hashes)) == 3
+    assert all(bcrypt.checkpw(b"Reset123!", h) for h in hashes)
+
+
+def test_reset_passwords_writes_nothing_when_busy(user_id, fast_hasher, monkeypatch):
+    def busy(password):
+        raise auth.HashingBusy("HASH QUEUE FULL")
+    monkeypatch.setattr(auth.hasher, "hash", busy)
+    with pytest.raises(auth.HashingBusy):
+        auth.reset_passwords([user_id], "Reset123!")
+    assert stored_hash(user_id) == b"x"
+
+
+def test_create_user_reports_busy_hasher(monkeypatch):
+    def busy(password):
+        raise auth.HashingBusy("HASH TIMEOUT")
+    monkeypatch.setattr(auth.hasher, "hash", busy)
+    created, msg = auth.create_user("busy_signup", "pw")
+    assert not created and "RETRY" in msg
+
+
+def test_dummy_hash_is_made_on_first_use(monkeypatch, fast_hasher):
+    monkeypatch.setattr(auth, "_dummy_hash", None)
+    assert auth.verify_credentials("no_such_user", "pw") == (None, None)
+    assert auth._dummy_hash is not None
@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta
+
+import database_manager as dbm
+
+
+def add_days(user_id, first, n):
+    start = datetime.strptime(first, "%Y-%m-%d")
+    rows = [(user_id, (start + timedelta(days=i)).strftime("%Y-%m-%d"), float(i)) for i in range(n)]
+    with dbm.db_connection() as conn:
+        conn.executemany("INSERT INTO history_snapshots (user_id, date, total_assets, total_liabilities, net_worth, granularity) "
+                         "VALUES (?, ?, 0, 0, ?, 'D')", rows)
+        conn.commit()
+
+
+def snapshots(user_id):
+    with dbm.db_connection() as conn:
+        return conn.execute("SELECT date, net_worth, granularity FROM history_snapshots WHERE user_id = ? ORDER BY date",
+                            (user_id,)).fetchall()
+
+
+def test_week_across_new_year_is_one_bucket(user_id):
+    add_days(user_id, "2024-12-30", 14)  # Monday 2024-12-30 .. Sunday 2025-01-12
+    dbm.compact_snapshots(user_id, today=datetime(2025, 6, 1), daily_days=90, weekly_days=3650)
+    assert snapshots(user_id) == [("2025-01-05", 6.0, "W"), ("2025-01-12", 13.0, "W")]
+
+
+def test_months_keep_their_last_row(user_id):
+    add_days(user_id, "2024-01-20", 20)  # 2024-01-20 .. 2024-02-08
+    dbm.compact_snapshots(user_id, today=datetime(2025, 6, 1), daily_days=3650, weekly_days=60)
+    assert snapshots(user_id) == [("2024-01-31", 11.0, "M"), ("2024-02-08", 19.0, "M")]
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import forecast_engine as fe
+
+
+@pytest.fixture
+def full_fits(monkeypatch):
+    calls = []
+    real = fe._fit_full
+
+    def counting(d, y):
+        calls.append(len(d))
+        return real(d, y)
+    monkeypatch.setattr(fe, "_fit_full", counting)
+    return calls
+
+
+def series(n, start="2025-01-01"):
+    rng = np.random.default_rng(1)
+    return pd.DataFrame({"date": pd.date_range(start, periods=n).strftime("%Y-%m-%d"),
+                         "net_worth": 1e5 + np.cumsum(rng.normal(30, 400, n))})
+
+
+def test_growing_series_updates_in_place(full_fits):
+    df = series(60)
+    fe.forecast_nw(df.iloc[:40], key="grow")
+    for n in range(41, 60):
+        fe.forecast_nw(df.iloc[:n], key="grow")
+    assert full_fits == [40]
+
+
+def test_revised_inner_point_refits(full_fits):
+    df = series(40)
+    fe.forecast_nw(df, key="revised")
+    revised = df.copy()
+    revised.loc[10, "net_worth"] += 1.0  # same first day, same last value
+    fe.forecast_nw(pd.concat([revised, series(1, "2025-02-10")]), key="revised")
+    assert full_fits == [40, 41]
+
+
+def test_scale_converts_the_output():
+    df = series(40)
+    base = fe.forecast_nw(df, key="scaled")
+    doubled = fe.forecast_nw(df, key="scaled", scale=2.0)
+    assert np.allclose(doubled["mean"], 2 * base["mean"])
+    assert np.allclose(doubled["upper"], 2 * base["upper"])
+    assert doubled["slope"] == pytest.approx(2 * base["slope"])
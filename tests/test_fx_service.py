@@ -0,0 +1,63 @@
+import threading
+import time
+
+import pytest
+
+import fx_service as fx
+
+
+class SlowProvider:
+    """Answers only the currencies in `known`, after `delay` seconds; counts calls per thread."""
+    name = "slow"
+
+    def __init__(self, known, delay=0.0):
+        self.known, self.delay = known, delay
+        self.calls = []
+
+    def fetch(self, currencies):
+        self.calls.append((threading.current_thread().name, sorted(currencies)))
+        time.sleep(self.delay)
+        return {c: self.known[c] for c in currencies if c in self.known}
+
+
+def wait_for(cond, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not cond() and time.monotonic() < end:
+        time.sleep(0.01)
+    return cond()
+
+
+@pytest.fixture
+def service(db):
+    services = []
+
+    def make(provider, **kw):
+        svc = fx.FxService(provider=provider, **kw)
+        services.append(svc)
+        return svc
+    yield make
+    for svc in services:
+        svc.stop()
+
+
+def test_unknown_rate_is_fetched_off_the_request_thread(service):
+    provider = SlowProvider({"ZZA": 0.5}, delay=0.3)
+    svc = service(provider)
+    t0 = time.perf_counter()
+    assert svc.rates(["ZZA"]) == {}
+    assert time.perf_counter() - t0 < 0.2
+    assert wait_for(lambda: svc.rates(["ZZA"]) == {"ZZA": 0.5})
+    assert [name for name, _ in provider.calls] == ["kairos-fx-sync"]
+
+
+def test_missing_rate_backs_off(service):
+    provider = SlowProvider({})
+    svc = service(provider, miss_backoff=60)
+    svc.rates(["ZZB"])
+    assert wait_for(lambda: len(provider.calls) == 1)
+    for _ in range(5):
+        assert svc.rates(["ZZB"]) == {}
+    time.sleep(0.1)
+    assert len(provider.calls) == 1
+    assert svc.stats["backed_off"] == 5
+    assert svc.refresh(["ZZB"]) == [] and len(provider.calls) == 1
@@ -0,0 +1,26 @@
+import database_manager as dbm
+
+
+def set_status(user_id, ip, status):
+    # Another worker's write: straight to the table
+    with dbm.db_connection() as conn:
+        conn.execute("UPDATE allowed_ips SET status = ? WHERE user_id = ? AND ip_address = ?", (status, user_id, ip))
+        conn.commit()
+
+
+def test_status_changes_apply_on_the_next_login(user_id):
+    assert dbm.check_ip_status(user_id, "10.0.0.1") is None
+    assert dbm.count_ips(user_id) == 0
+    dbm.register_ip(user_id, "10.0.0.1")
+    assert dbm.check_ip_status(user_id, "10.0.0.1") == ("PENDING",)
+    for status in ("APPROVED", "REJECTED", "APPROVED"):
+        set_status(user_id, "10.0.0.1", status)
+        assert dbm.check_ip_status(user_id, "10.0.0.1") == (status,)
+    assert dbm.count_ips(user_id) == 1
+
+
+def test_deleted_user_has_no_devices(user_id):
+    dbm.register_ip(user_id, "10.0.0.2", status="APPROVED")
+    dbm.admin_delete_users([user_id])
+    assert dbm.check_ip_status(user_id, "10.0.0.2") is None
+    assert dbm.count_ips(user_id) == 0
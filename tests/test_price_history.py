@@ -0,0 +1,86 @@
+import itertools
+
+import pandas as pd
+import pytest
+
+import price_history
+
+_prefixes = itertools.count(1)
+
+
+class CountingProvider(price_history.FileHistoryProvider):
+    """File provider that records the tickers of every request."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.requests = []
+
+    def fetch_history(self, tickers, start, end):
+        self.requests.append(sorted(tickers))
+        return super().fetch_history(tickers, start, end)
+
+
+class FailingProvider:
+    """Behaves like a failed Yahoo download: an empty frame, no exception."""
+    name = "failing"
+
+    def fetch_history(self, tickers, start, end):
+        return pd.DataFrame(columns=price_history.HISTORY_COLUMNS)
+
+
+@pytest.fixture
+def tickers(db):
+    # Coverage is shared by the whole test database: fresh ticker names per test
+    p = f"T{next(_prefixes)}"
+    return {"listed": f"{p}LISTED", "late": f"{p}LATE", "unknown": f"{p}UNKNOWN"}
+
+
+@pytest.fixture
+def history_file(tmp_path, tickers):
+    days = pd.date_range("2024-01-01", "2024-01-10").strftime("%Y-%m-%d")
+    rows = [(tickers["listed"], d, 100.0 + i) for i, d in enumerate(days)]
+    rows.append((tickers["late"], "2024-03-01", 50.0))  # known ticker, no close in January
+    path = tmp_path / "history.csv"
+    pd.DataFrame(rows, columns=["ticker", "date", "close"]).to_csv(path, index=False)
+    return str(path)
+
+
+def service(provider):
+    return price_history.PriceHistoryService(provider=provider, batches_per_sec=1000, retries=0)
+
+
+def test_ticker_left_out_of_the_download_is_not_covered(history_file, tickers):
+    provider = CountingProvider(history_file)
+    svc = service(provider)
+    all_tickers = sorted(tickers.values())
+    assert svc.backfill(all_tickers, "2024-01-01", "2024-01-10") == 10
+
+    coverage = svc.coverage(all_tickers)
+    assert coverage[tickers["listed"]] == ("2024-01-01", "2024-01-10")
+    assert coverage[tickers["late"]] == ("2024-01-01", "2024-01-10")
+    assert tickers["unknown"] not in coverage
+
+    provider.requests.clear()
+    svc.backfill(all_tickers, "2024-01-01", "2024-01-10")
+    assert provider.requests == [[tickers["unknown"]]]
+
+
+def test_failed_download_leaves_coverage_untouched(tickers):
+    svc = service(FailingProvider())
+    assert svc.backfill([tickers["listed"]], "2024-01-01", "2024-01-10") == 0
+    assert svc.coverage([tickers["listed"]]) == {}
+
+
+def test_disjoint_backfill_fetches_the_bridge(tmp_path, tickers):
+    t = tickers["listed"]
+    days = pd.date_range("2015-01-01", "2024-12-31", freq="MS").strftime("%Y-%m-%d")
+    path = tmp_path / "decade.csv"
+    pd.DataFrame({"ticker": t, "date": days, "close": range(len(days))}).to_csv(path, index=False)
+    provider = CountingProvider(str(path))
+    svc = service(provider)
+    svc.backfill([t], "2024-01-01", "2024-12-31")
+    svc.backfill([t], "2015-01-01", "2015-12-31")
+    assert svc.coverage([t])[t] == ("2015-01-01", "2024-12-31")
+
+    _, _, values = svc.matrix([t], "2018-01-01", "2018-01-10", ffill=False)
+    assert values.size == 1
@@ -0,0 +1,38 @@
+import time
+
+import pandas as pd
+
+import database_manager as dbm
+
+
+def hold(user_id, ticker, price):
+    dbm.save_editor_changes(pd.DataFrame([{"name": ticker, "category": "Stock", "ticker": ticker, "quantity": 1.0,
+                                           "avg_price": price, "current_price": price, "currency": "EUR"}]), "assets", user_id)
+
+
+def current_price(user_id):
+    with dbm.db_connection() as conn:
+        return conn.execute("SELECT current_price FROM assets WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+
+def snapshot_count(user_id):
+    with dbm.db_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM history_snapshots WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+
+def test_sync_button_updates_only_the_clicking_user(user_id, db):
+    ticker = f"SYNC{user_id}"
+    other = db.register_user(f"holder_of_{ticker}", b"x")
+    hold(user_id, ticker, 10.0)
+    hold(other, ticker, 10.0)
+    with dbm.db_connection() as conn:
+        conn.execute("DELETE FROM history_snapshots WHERE user_id IN (?, ?)", (user_id, other))
+        conn.execute("INSERT INTO prices (ticker, price, currency, fetched_at, expires_at) VALUES (?, 12.5, NULL, ?, ?)",
+                     (ticker, time.time(), time.time() + 900))
+        conn.commit()
+
+    assert dbm.update_asset_prices(user_id) == (1, 0)
+    assert current_price(user_id) == 12.5
+    assert snapshot_count(user_id) == 1
+    assert current_price(other) == 10.0
+    assert snapshot_count(other) == 0
@@ -0,0 +1,35 @@
+import sqlite3
+
+import pytest
+
+import migrations
+import queries
+
+# Shared queries that are not per-request (background jobs over the whole fleet)
+NOT_HOT = {"TRACKED_TICKERS"}
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "plans.db")
+    migrations.run_migrations(conn)
+    yield conn
+    conn.close()
+
+
+def test_hot_queries_use_indexes(conn):
+    assert migrations.find_scans(conn) == {}
+
+
+def test_full_scan_is_reported(conn):
+    offenders = migrations.find_scans(conn, {"by_name": ("SELECT * FROM assets WHERE name = ?", ("x",))})
+    assert list(offenders) == ["by_name"]
+
+
+def test_every_shared_query_is_checked():
+    hot = [sql for sql, _ in migrations.HOT_QUERIES.values()]
+    shared = {name: sql for name, sql in vars(queries).items()
+              if name.isupper() and isinstance(sql, str) and sql.lstrip().startswith(("SELECT", "UPDATE", "DELETE"))}
+    unchecked = [name for name, sql in shared.items()
+                 if name not in NOT_HOT and not any(h.startswith(sql.split("{")[0]) for h in hot)]
+    assert unchecked == []
@@ -0,0 +1,33 @@
+import pandas as pd
+import pytest
+
+import database_manager as dbm
+import fx_service
+
+
+@pytest.fixture
+def requested(monkeypatch):
+    calls = []
+    monkeypatch.setattr(fx_service.get_service(), "request", lambda currencies: calls.append(sorted(currencies)) or [])
+    return calls
+
+
+def hold(user_id, currency, value):
+    dbm.save_editor_changes(pd.DataFrame([{"name": f"{currency} cash", "category": "Cash", "ticker": None, "quantity": 1.0,
+                                           "avg_price": value, "current_price": value, "currency": currency}]), "assets", user_id)
+
+
+def day_row(user_id, day):
+    with dbm.db_connection() as conn:
+        return conn.execute("SELECT net_worth FROM history_snapshots WHERE user_id = ? AND date = ?", (user_id, day)).fetchone()
+
+
+def test_currency_without_rate_skips_the_snapshot(user_id, requested):
+    hold(user_id, "EUR", 100.0)
+    assert dbm.record_snapshot(user_id, day="2030-01-01") is True
+    hold(user_id, "ZZQ", 50.0)  # replaces the EUR row with a currency that has no rate
+    assert dbm.record_snapshot(user_id, day="2030-01-01") is False
+    assert dbm.record_snapshot(user_id, day="2030-01-02") is False
+    assert day_row(user_id, "2030-01-01") == (100.0,)
+    assert day_row(user_id, "2030-01-02") is None
+    assert ["ZZQ"] in requested
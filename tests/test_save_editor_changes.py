@@ -0,0 +1,120 @@
+import pandas as pd
+import pytest
+
+import database_manager as dbm
+
+CASHFLOW_ROWS = [
+    {"type": "Income", "category": "Job", "name": "Salary", "amount": 3000.0, "frequency": "Monthly"},
+    {"type": "Expense", "category": "Housing", "name": "Rent", "amount": 900.0, "frequency": "Monthly"},
+]
+
+
+def stored(user_id, table="cashflow"):
+    with dbm.db_connection() as conn:
+        return pd.read_sql(f"SELECT * FROM {table} WHERE user_id = ? ORDER BY id", conn, params=(user_id,))
+
+
+def data_version(user_id):
+    with dbm.db_connection() as conn:
+        return conn.execute("SELECT data_version FROM users WHERE id = ?", (user_id,)).fetchone()[0]
+
+
+def seed(user_id, rows=CASHFLOW_ROWS):
+    dbm.save_editor_changes(pd.DataFrame(rows), "cashflow", user_id)
+    return dbm.load_user_snapshot(user_id, ("cashflow",), use_cache=False)["cashflow"]
+
+
+def test_new_rows_are_inserted(user_id):
+    res = dbm.save_editor_changes(pd.DataFrame(CASHFLOW_ROWS), "cashflow", user_id)
+    assert res == {"inserted": 2, "updated": 0, "deleted": 0}
+    assert stored(user_id)["name"].tolist() == ["Salary", "Rent"]
+
+
+def test_changed_cells_update_only_their_rows(user_id):
+    df = seed(user_id)
+    df.loc[df["name"] == "Rent", "amount"] = 950.0
+    res = dbm.save_editor_changes(df, "cashflow", user_id)
+    assert res == {"inserted": 0, "updated": 1, "deleted": 0}
+    assert stored(user_id)["amount"].tolist() == [3000.0, 950.0]
+
+
+def test_missing_rows_are_deleted(user_id):
+    df = seed(user_id)
+    res = dbm.save_editor_changes(df[df["name"] == "Salary"], "cashflow", user_id)
+    assert res == {"inserted": 0, "updated": 0, "deleted": 1}
+    assert stored(user_id)["name"].tolist() == ["Salary"]
+
+
+def test_empty_frame_deletes_every_row(user_id):
+    df = seed(user_id)
+    res = dbm.save_editor_changes(df.iloc[0:0], "cashflow", user_id)
+    assert res == {"inserted": 0, "updated": 0, "deleted": 2}
+    assert stored(user_id).empty
+
+
+def test_insert_update_delete_in_one_save(user_id):
+    df = seed(user_id)
+    df.loc[df["name"] == "Salary", "amount"] = 3100.0
+    df = pd.concat([df[df["name"] == "Salary"],
+                    pd.DataFrame([{"type": "Expense", "category": "Food", "name": "Groceries", "amount": 400.0, "frequency": "Monthly"}])],
+                   ignore_index=True)
+    res = dbm.save_editor_changes(df, "cashflow", user_id)
+    assert res == {"inserted": 1, "updated": 1, "deleted": 1}
+    assert stored(user_id)[["name", "amount"]].values.tolist() == [["Salary", 3100.0], ["Groceries", 400.0]]
+
+
+def test_derived_columns_are_ignored(user_id):
+    dbm.save_editor_changes(pd.DataFrame([{"name": "ETF", "category": "Stock", "ticker": "VWCE", "quantity": 2.0,
+                                           "avg_price": 100.0, "current_price": 110.0, "currency": "EUR"}]), "assets", user_id)
+    df = dbm.load_user_snapshot(user_id, ("assets",), use_cache=False)["assets"]
+    df["total_value"] = df["quantity"] * df["current_price"]
+    res = dbm.save_editor_changes(df, "assets", user_id)
+    assert res == {"inserted": 0, "updated": 0, "deleted": 0}
+    assert "total_value" not in stored(user_id, "assets").columns
+
+
+def test_only_unexpected_columns_are_reported(user_id, capsys):
+    dbm.save_editor_changes(pd.DataFrame([{"name": "ETF", "category": "Stock", "ticker": "VWCE", "quantity": 2.0,
+                                           "avg_price": 100.0, "current_price": 110.0, "currency": "EUR"}]), "assets", user_id)
+    df = dbm.load_user_snapshot(user_id, ("assets",), use_cache=False)["assets"]
+    df["market_value"] = df["quantity"] * df["current_price"]
+    dbm.save_editor_changes(df, "assets", user_id, derived=("market_value",))
+    assert capsys.readouterr().out == ""
+    df["typo_column"] = 1
+    dbm.save_editor_changes(df, "assets", user_id, derived=("market_value",))
+    out = capsys.readouterr().out
+    assert "typo_column" in out and "market_value" not in out
+
+
+def test_round_trip_writes_nothing(user_id):
+    df = seed(user_id)
+    before = data_version(user_id)
+    res = dbm.save_editor_changes(df, "cashflow", user_id)
+    assert res == {"inserted": 0, "updated": 0, "deleted": 0}
+    assert data_version(user_id) == before
+
+
+def test_other_users_rows_are_untouched(user_id, db):
+    other = db.register_user(f"other_of_{user_id}", b"x")
+    seed(other)
+    dbm.save_editor_changes(pd.DataFrame(), "cashflow", user_id)
+    assert len(stored(other)) == 2
+
+
+def test_failed_save_rolls_back_and_raises(user_id):
+    df = seed(user_id)
+    df.loc[df["name"] == "Rent", "amount"] = 1.0
+    with dbm.db_connection() as conn:
+        conn.execute("CREATE TRIGGER reject_update BEFORE UPDATE ON cashflow BEGIN SELECT RAISE(ABORT, 'rejected'); END")
+    try:
+        with pytest.raises(Exception, match="rejected"):
+            dbm.save_editor_changes(df, "cashflow", user_id)
+    finally:
+        with dbm.db_connection() as conn:
+            conn.execute("DROP TRIGGER IF EXISTS reject_update")
+    assert stored(user_id)["amount"].tolist() == [3000.0, 900.0]
+
+
+def test_unknown_table_is_rejected(user_id):
+    with pytest.raises(ValueError):
+        dbm.save_editor_changes(pd.DataFrame(CASHFLOW_ROWS), "users", user_id)
@@ -1,9 +1,15 @@
 
 import streamlit as st
 
-def render_hud(metrics):
+def render_hud(metrics, sym="€"):
     liab_class = "alert" if metrics['liabilities'] > 0 else "success"
     cf_class = "success" if metrics['cashflow'] >= 0 else "alert"
+    pnl = metrics.get('unrealized_pnl', 0.0)
+    if metrics.get('cost_basis'):
+        pnl_delta = f"{'▲' if pnl >= 0 else '▼'} P&L {sym} {pnl:,.2f} ({metrics['return_pct']:+.2f}%)"
+        pnl_color = "#00ff41" if pnl >= 0 else "#ff0055"
+    else:
+        pnl_delta, pnl_color = "ACTIVE PORTFOLIO", "#00f0ff"
     
     html_content = f"""
 <style>
@@ -20,22 +26,22 @@ def render_hud(metrics):
 <div class="hud-container">
     <div class="hud-card">
         <div class="hud-label">NET WORTH</div>
-        <div class="hud-value">€ {metrics['net_worth']:,.2f}</div>
+        <div class="hud-value">{sym} {metrics['net_worth']:,.2f}</div>
         <div class="hud-delta" style="color: #00ff41;">▲ LIVE TRACKING</div>
     </div>
     <div class="hud-card">
         <div class="hud-label">ASSETS DEPLOYED</div>
-        <div class="hud-value">€ {metrics['assets']:,.2f}</div>
-        <div class="hud-delta" style="color: #00f0ff;">ACTIVE PORTFOLIO</div>
+        <div class="hud-value">{sym} {metrics['assets']:,.2f}</div>
+        <div class="hud-delta" style="color: {pnl_color};">{pnl_delta}</div>
     </div>
     <div class="hud-card {liab_class}">
         <div class="hud-label">LIABILITIES</div>
-        <div class="hud-value">€ {metrics['liabilities']:,.2f}</div>
+        <div class="hud-value">{sym} {metrics['liabilities']:,.2f}</div>
         <div class="hud-delta">DEBT LOAD</div>
     </div>
     <div class="hud-card {cf_class}">
         <div class="hud-label">MONTHLY FLOW</div>
-        <div class="hud-value">€ {metrics['cashflow']:,.2f}</div>
+        <div class="hud-value">{sym} {metrics['cashflow']:,.2f}</div>
         <div class="hud-delta">P&L MONTHLY</div>
     </div>
 </div>
@@ -72,7 +78,15 @@ def render_skill_card(skill_name, current, target, category):
     """
     return textwrap.dedent(html)
 
-def render_portfolio_metrics(tot_a, tot_l, net_worth):
+def render_portfolio_metrics(tot_a, tot_l, net_worth, pnl=None, return_pct=None, sym="€"):
+    pnl_card = ""
+    if pnl is not None:
+        pnl_cls = "net" if pnl >= 0 else "liab"
+        pnl_card = f"""
+        <div class="pf-card {pnl_cls}">
+            <div class="pf-label">UNREALIZED P&L ({return_pct:+.2f}%)</div>
+            <div class="pf-value">{sym} {pnl:,.2f}</div>
+        </div>"""
     st.markdown(f"""
     <style>
         .pf-metric-container {{ display: flex; gap: 20px; margin-bottom: 30px; }}
@@ -86,34 +100,36 @@ def render_portfolio_metrics(tot_a, tot_l, net_worth):
     <div class="pf-metric-container">
         <div class="pf-card">
             <div class="pf-label">GROSS ASSETS</div>
-            <div class="pf-value">€ {tot_a:,.2f}</div>
+            <div class="pf-value">{sym} {tot_a:,.2f}</div>
         </div>
         <div class="pf-card liab">
             <div class="pf-label">TOTAL LIABILITIES</div>
-            <div class="pf-value">€ {tot_l:,.2f}</div>
+            <div class="pf-value">{sym} {tot_l:,.2f}</div>
         </div>
         <div class="pf-card net">
             <div class="pf-label">LIQUID EQUITY</div>
-            <div class="pf-value">€ {net_worth:,.2f}</div>
-        </div>
+            <div class="pf-value">{sym} {net_worth:,.2f}</div>
+        </div>{pnl_card}
     </div>
     """, unsafe_allow_html=True)
 
-def render_oracle_terminal(slope, traj_msg, pred_6m, pred_12m, target_nw, monthly_save, freedom_date):
+def render_oracle_terminal(slope, traj_msg, pred_6m, pred_12m, target_nw, monthly_save, freedom_date, sym="€", model=None, assumptions=None):
     st.markdown(f"""
     <div style="font-family:'JetBrains Mono'; color:#00ff41; background:#050509; padding:20px; border:1px solid #333; border-radius:8px; margin-bottom:20px; box-shadow:0 0 20px rgba(0, 255, 65, 0.1);">
         <div style="margin-bottom:10px; color:#555;">// NEURAL_LINK_ESTABLISHED :: ACCESSING_CORE_MEMORY</div>
         <div>> ANALYZING HISTORICAL DATAPOINTS... [OK]</div>
-        <div>> COMPUTING LINEAR REGRESSION SLOPE... {slope:.2f} / DAY</div>
+        <div>> BACKTESTING MODELS... [{model or 'INSUFFICIENT DATA'}]</div>
+        <div>> COMPUTING TREND SLOPE... {slope:.2f} / DAY</div>
         <div>> TRAJECTORY STATUS: <span style="color:#fff; font-weight:bold;">{traj_msg}</span></div>
         <br>
-        <div style="color:#00f0ff;">>> PREDICTION MATRIX (AI_MODEL_V1):</div>
+        <div style="color:#00f0ff;">>> PREDICTION MATRIX (AI_MODEL_V2):</div>
         <div style="margin-left:20px;">+ 6 MONTHS:  <span style="color:#fff">{pred_6m}</span></div>
         <div style="margin-left:20px;">+ 12 MONTHS: <span style="color:#fff">{pred_12m}</span></div>
         <br>
         <div style="color:#bc13fe;">>> ESCAPE VELOCITY CALCULATION:</div>
-        <div style="margin-left:20px;">TARGET: € {target_nw:,.0f} | CURRENT FLOW: € {monthly_save:,.0f}/mo</div>
+        <div style="margin-left:20px;">TARGET: {sym} {target_nw:,.0f} | CURRENT FLOW: {sym} {monthly_save:,.0f}/mo</div>
         <div style="margin-left:20px;">ESTIMATED FREEDOM DATE: <span style="background:#bc13fe; color:#fff; padding:2px 8px;">{freedom_date}</span></div>
+        <div style="margin-left:20px; color:#555;">{assumptions or 'LINEAR ACCUMULATION'}</div>
         <div style="margin-top:10px; animation: blink 1s infinite;">_</div>
     </div>
     """, unsafe_allow_html=True)